@@ -3,6 +3,10 @@ ASGI config for FG_copilot project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn FG_copilot.asgi:application``)
+so streamed chat answers (``/api/finance/chat/stream/``) wait on the LLM
+without holding a worker thread; under WSGI they stream from a thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -103,17 +103,58 @@ DATABASES = {
     }
 }
 
-# Cache Configuration (Using Database Cache - No Redis needed!)
-CACHES = {
-    'default': {
+# Cache Configuration (No Redis needed!)
+# A per-process LRU (core.cache_backends.TwoTierCache) sits in front of a shared
+# cache so most reads never reach the database. CACHE_SHARED_BACKEND selects the
+# shared tier (database/file/locmem); set CACHE_TWO_TIER=false to use it directly.
+SHARED_CACHE_BACKENDS = {
+    'database': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'cache_table',
         'TIMEOUT': 300,  # 5 minutes default cache timeout
         'OPTIONS': {
             'MAX_ENTRIES': 10000
         }
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_FILE_LOCATION', str(BASE_DIR / '.cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000
+        }
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fg-copilot-shared',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000
+        }
+    },
+}
+
+CACHE_SHARED_BACKEND = os.getenv('CACHE_SHARED_BACKEND', 'database')
+CACHE_TWO_TIER = os.getenv('CACHE_TWO_TIER', 'true').lower() == 'true'
+
+CACHES = {
+    'shared': SHARED_CACHE_BACKENDS[CACHE_SHARED_BACKEND],
 }
+if CACHE_TWO_TIER:
+    CACHES['default'] = {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '60')),
+            # Cache version counters change in place and must be read from the
+            # shared tier so every worker sees invalidations immediately
+            'LOCAL_BYPASS_PREFIXES': ['cache_version:', 'llm_cache_stats:'],
+        }
+    }
+else:
+    CACHES['default'] = CACHES['shared']
 
 
 
@@ -172,8 +213,60 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',  # Default requires auth
         # Override with AllowAny on specific views like /me/ for demo mode
     ),
+    # Keyset pagination; views set `ordering` and may opt in to `max_page_size`
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
 
+# AI jobs: LLM calls run in the run_ai_jobs worker, never in a request thread.
+# AI_LLM_BACKEND is 'openai' (LangChain) or 'fake' (canned responses, no network).
+AI_LLM_BACKEND = os.getenv('AI_LLM_BACKEND', 'openai')
+AI_LLM_TIMEOUT = float(os.getenv('AI_LLM_TIMEOUT', '30'))
+AI_LLM_MAX_RETRIES = int(os.getenv('AI_LLM_MAX_RETRIES', '1'))
+AI_JOBS_CONCURRENCY = int(os.getenv('AI_JOBS_CONCURRENCY', '4'))
+AI_JOBS_MAX_PENDING_PER_USER = int(os.getenv('AI_JOBS_MAX_PENDING_PER_USER', '5'))
+AI_JOBS_MAX_ATTEMPTS = int(os.getenv('AI_JOBS_MAX_ATTEMPTS', '3'))
+AI_JOBS_DEDUP_SECONDS = int(os.getenv('AI_JOBS_DEDUP_SECONDS', '600'))
+AI_JOBS_STALE_SECONDS = int(os.getenv('AI_JOBS_STALE_SECONDS', '300'))
+# Chat history kept per session (process-wide, least recently used evicted)
+AI_CHAT_MEMORY_SESSIONS = int(os.getenv('AI_CHAT_MEMORY_SESSIONS', '1000'))
+AI_CHAT_MEMORY_TURNS = int(os.getenv('AI_CHAT_MEMORY_TURNS', '10'))
+AI_CHAT_MEMORY_TTL = int(os.getenv('AI_CHAT_MEMORY_TTL', '3600'))
+# Cached answers to repeated questions (finance.services.response_cache); the
+# fuzzy lookup reuses answers to near-identical questions about the same data
+AI_RESPONSE_CACHE_TIMEOUT = int(os.getenv('AI_RESPONSE_CACHE_TIMEOUT', '3600'))
+AI_RESPONSE_CACHE_FUZZY = os.getenv('AI_RESPONSE_CACHE_FUZZY', 'true').lower() == 'true'
+AI_RESPONSE_CACHE_SIMILARITY = float(os.getenv('AI_RESPONSE_CACHE_SIMILARITY', '0.9'))
+AI_RESPONSE_CACHE_INDEX_SIZE = int(os.getenv('AI_RESPONSE_CACHE_INDEX_SIZE', '200'))
+
+# n8n automation webhooks (finance.services.n8n_client): one pooled session per
+# process, retries with backoff, and a circuit breaker while n8n is failing
+N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL', '')
+N8N_TIMEOUT = float(os.getenv('N8N_TIMEOUT', '10'))
+N8N_POOL_SIZE = int(os.getenv('N8N_POOL_SIZE', '10'))
+N8N_MAX_RETRIES = int(os.getenv('N8N_MAX_RETRIES', '3'))
+N8N_RETRY_BACKOFF = float(os.getenv('N8N_RETRY_BACKOFF', '0.5'))
+N8N_CIRCUIT_FAILURES = int(os.getenv('N8N_CIRCUIT_FAILURES', '5'))
+N8N_CIRCUIT_RESET_SECONDS = float(os.getenv('N8N_CIRCUIT_RESET_SECONDS', '30'))
+N8N_BATCH_SIZE = int(os.getenv('N8N_BATCH_SIZE', '100'))
+N8N_CONCURRENCY = int(os.getenv('N8N_CONCURRENCY', '4'))
+# Businesses processed at once by the run_daily_automation command
+AUTOMATION_WORKERS = int(os.getenv('AUTOMATION_WORKERS', '4'))
+# Outbox of automation events (finance.services.outbox), delivered by dispatch_outbox:
+# retried with exponential backoff, dead-lettered after OUTBOX_MAX_ATTEMPTS
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '30'))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '3600'))
+OUTBOX_CLAIM_SECONDS = int(os.getenv('OUTBOX_CLAIM_SECONDS', '300'))
+# Default format of allocated invoice numbers, e.g. INV-2024-00042 (each
+# business can change its own on its InvoiceNumberSequence)
+INVOICE_NUMBER_PREFIX = os.getenv('INVOICE_NUMBER_PREFIX', 'INV-')
+INVOICE_NUMBER_INCLUDE_YEAR = os.getenv('INVOICE_NUMBER_INCLUDE_YEAR', 'true').lower() == 'true'
+INVOICE_NUMBER_PADDING = int(os.getenv('INVOICE_NUMBER_PADDING', '5'))
+# Rendered invoice documents, cached by content address (see
+# finance.services.invoice_documents)
+INVOICE_DOCUMENT_DIR = os.getenv('INVOICE_DOCUMENT_DIR', str(MEDIA_ROOT / 'invoices'))
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -0,0 +1,231 @@
+# backend/core/cache_backends.py
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+
+class TwoTierCache(BaseCache):
+    """
+    Bounded per-process LRU cache in front of a shared cache backend.
+
+    Reads are served from process memory when possible and fall back to the
+    shared backend (database, file or locmem cache configured under another
+    alias in settings.CACHES). Writes go to both tiers.
+
+    OPTIONS:
+        SHARED_ALIAS: alias of the shared cache in settings.CACHES ('shared')
+        LOCAL_MAX_ENTRIES: maximum number of entries kept in process (1000)
+        LOCAL_TIMEOUT: maximum seconds an entry lives in process (60)
+        LOCAL_BYPASS_PREFIXES: key prefixes that always go to the shared tier,
+            for mutable values that must stay coherent across processes
+        LOCK_TIMEOUT: seconds a recomputation lock is held at most (30)
+        LOCK_WAIT: seconds a caller waits for another worker's recomputation (5)
+    """
+
+    LOCK_PREFIX = 'lock:'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', location or 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._bypass_prefixes = tuple(options.get('LOCAL_BYPASS_PREFIXES', ())) + (self.LOCK_PREFIX,)
+        self._lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self._lock_wait = options.get('LOCK_WAIT', 5)
+
+        self._local = OrderedDict()  # local key -> (expires_at, pickled value)
+        self._local_lock = threading.Lock()
+        self._flights = {}  # local key -> [lock, waiters]
+        self._flights_lock = threading.Lock()
+        self._stats = Counter()
+
+    @cached_property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Statistics
+
+    def get_stats(self):
+        """Hit/miss counters for this process"""
+        stats = dict(self._stats)
+        lookups = stats.get('local_hits', 0) + stats.get('shared_hits', 0) + stats.get('misses', 0)
+        hits = stats.get('local_hits', 0) + stats.get('shared_hits', 0)
+        stats['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        stats['local_entries'] = len(self._local)
+        return stats
+
+    def reset_stats(self):
+        self._stats.clear()
+
+    # Local tier helpers
+
+    def _bypass_local(self, key):
+        return key.startswith(self._bypass_prefixes)
+
+    def _local_expiry(self, timeout):
+        expiry = self.get_backend_timeout(timeout)
+        if self._local_timeout is not None:
+            local_expiry = time.time() + self._local_timeout
+            expiry = local_expiry if expiry is None else min(expiry, local_expiry)
+        return expiry
+
+    def _local_get(self, local_key):
+        with self._local_lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return self._missing_key
+            expires_at, pickled = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._local[local_key]
+                return self._missing_key
+            self._local.move_to_end(local_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, local_key, value, timeout):
+        expires_at = self._local_expiry(timeout)
+        if expires_at is not None and expires_at <= time.time():
+            self._local_delete(local_key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._local_lock:
+            self._local[local_key] = (expires_at, pickled)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _local_delete(self, local_key):
+        with self._local_lock:
+            return self._local.pop(local_key, None) is not None
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if not self._bypass_local(key):
+            value = self._local_get(local_key)
+            if value is not self._missing_key:
+                self._stats['local_hits'] += 1
+                return value
+
+        value = self.shared.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            self._stats['misses'] += 1
+            return default
+
+        self._stats['shared_hits'] += 1
+        if not self._bypass_local(key):
+            self._local_set(local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout=timeout, version=version)
+        if not self._bypass_local(key):
+            self._local_set(local_key, value, timeout)
+        self._stats['sets'] += 1
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added and not self._bypass_local(key):
+            self._local_set(local_key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local_delete(local_key)
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted_local = self._local_delete(local_key)
+        return self.shared.delete(key, version=version) or deleted_local
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if not self._bypass_local(key) and self._local_get(local_key) is not self._missing_key:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._local_delete(local_key)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._local_lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's entries without touching the shared tier"""
+        with self._local_lock:
+            self._local.clear()
+
+    # Stampede protection
+
+    @contextmanager
+    def single_flight(self, key, version=None):
+        """
+        Serialize recomputation of a missing key.
+
+        Only one thread per process, and (via an `add`-based lock in the
+        shared tier) normally one worker overall, runs the block at a time.
+        Callers should re-check the cache inside the block before computing.
+        """
+        local_key = self.make_and_validate_key(key, version=version)
+        with self._flights_lock:
+            flight = self._flights.setdefault(local_key, [threading.Lock(), 0])
+            flight[1] += 1
+
+        try:
+            with flight[0]:
+                lock_key = f"{self.LOCK_PREFIX}{key}"
+                token = uuid.uuid4().hex
+                acquired = self.shared.add(lock_key, token, timeout=self._lock_timeout, version=version)
+                if not acquired:
+                    self._stats['lock_waits'] += 1
+                    self._wait_for_shared(key, lock_key, version)
+                try:
+                    yield
+                finally:
+                    if acquired and self.shared.get(lock_key, version=version) == token:
+                        self.shared.delete(lock_key, version=version)
+        finally:
+            with self._flights_lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    self._flights.pop(local_key, None)
+
+    def _wait_for_shared(self, key, lock_key, version):
+        """Wait until another worker fills key or releases its lock"""
+        deadline = time.monotonic() + self._lock_wait
+        delay = 0.01
+        while time.monotonic() < deadline:
+            if self.shared.has_key(key, version=version) or not self.shared.has_key(lock_key, version=version):
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, self._missing_key, version=version)
+        if value is not self._missing_key:
+            return value
+
+        with self.single_flight(key, version=version):
+            value = self.get(key, self._missing_key, version=version)
+            if value is self._missing_key:
+                self._stats['recomputes'] += 1
+                value = default() if callable(default) else default
+                if value is not None:
+                    self.set(key, value, timeout=timeout, version=version)
+        return value
@@ -0,0 +1,194 @@
+# backend/core/pagination.py
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a unique, stable ordering.
+
+    Pages are selected with a `WHERE (a, b) < (last_a, last_b)` style filter
+    instead of an OFFSET, so page N costs the same as page 1 and an index on
+    the ordering columns is used directly.
+
+    Views control pagination with optional attributes:
+        ordering: field names to order by, e.g. ('-transaction_date', '-id').
+            The primary key is appended as a tie-breaker when missing.
+            Defaults to the queryset (or model Meta) ordering.
+        page_size: default page size (REST_FRAMEWORK['PAGE_SIZE'] otherwise)
+        max_page_size: opt-in cap; when set, clients may pick a page size up
+            to this value with ?page_size=
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request, view)
+        self.fields = self.get_ordering_fields(queryset, view)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+        ordering = [self._order_expression(field, desc != reverse) for field, desc in self.fields]
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.keyset_filter(cursor['values'], reverse))
+
+        # Fetch one extra row to learn whether there is a further page
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request, view):
+        page_size = getattr(view, 'page_size', None) or api_settings.PAGE_SIZE or 50
+        max_page_size = getattr(view, 'max_page_size', None)
+        if max_page_size and self.page_size_query_param in request.query_params:
+            try:
+                requested = int(request.query_params[self.page_size_query_param])
+            except (TypeError, ValueError):
+                return page_size
+            if requested > 0:
+                return min(requested, max_page_size)
+        return page_size
+
+    # Ordering
+
+    def get_ordering_fields(self, queryset, view):
+        """Return [(model field, descending)] ending with the primary key"""
+        model = queryset.model
+        ordering = getattr(view, 'ordering', None)
+        explicit = bool(ordering)
+        if not ordering:
+            ordering = queryset.query.order_by or model._meta.ordering or ['-pk']
+
+        fields = []
+        try:
+            for name in ordering:
+                fields.append(self._resolve_field(model, name))
+        except (FieldDoesNotExist, ImproperlyConfigured) as exc:
+            if explicit:
+                raise ImproperlyConfigured(f"{view.__class__.__name__}.ordering: {exc}")
+            # Expressions, related lookups or nullable fields cannot be used as
+            # a keyset; fall back to newest first by primary key
+            fields = [(model._meta.pk, True)]
+
+        if not any(field.primary_key for field, _ in fields):
+            fields.append((model._meta.pk, fields[-1][1]))
+        return fields
+
+    def _resolve_field(self, model, name):
+        if not isinstance(name, str) or name == '?':
+            raise ImproperlyConfigured(f"unsupported ordering {name!r}")
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        if field.is_relation or not field.concrete:
+            raise ImproperlyConfigured(f"'{name}' is not a concrete column")
+        if field.null:
+            raise ImproperlyConfigured(f"'{name}' is nullable")
+        return field, descending
+
+    @staticmethod
+    def _order_expression(field, descending):
+        return f"-{field.attname}" if descending else field.attname
+
+    def keyset_filter(self, values, reverse=False):
+        """Rows strictly after values in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f"{field.attname}__{lookup}": value})
+            equal &= Q(**{field.attname: value})
+        return condition
+
+    # Cursors
+
+    def encode_cursor(self, row, reverse=False):
+        values = [self._dump_value(getattr(row, field.attname)) for field, _ in self.fields]
+        payload = {'v': values}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            raw_values = payload['v']
+            if len(raw_values) != len(self.fields):
+                raise ValueError('cursor does not match ordering')
+            values = [field.to_python(value) for (field, _), value in zip(self.fields, raw_values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return {'values': values, 'reverse': bool(payload.get('r'))}
+
+    @staticmethod
+    def _dump_value(value):
+        # Keep full precision (DjangoJSONEncoder truncates microseconds)
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        return value
+
+    # Links
+
+    def _link(self, cursor):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.encode_cursor(self.page[0], reverse=True))
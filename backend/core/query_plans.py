@@ -0,0 +1,48 @@
+# backend/core/query_plans.py
+"""
+Declarative query plans for serializers.
+
+A serializer lists the relations it reads in its Meta::
+
+    class Meta:
+        model = Invoice
+        select_related = ('business', 'user')
+        prefetch_related = ('items',)
+
+and viewsets using QueryPlanMixin apply that plan to the queryset before it
+is paginated or looked up, so nested/related fields never trigger per-row
+queries.
+"""
+
+
+class QueryPlanSerializerMixin:
+    """Serializer mixin exposing the Meta query plan"""
+
+    @classmethod
+    def get_query_plan(cls):
+        meta = getattr(cls, 'Meta', None)
+        return (
+            tuple(getattr(meta, 'select_related', ())),
+            tuple(getattr(meta, 'prefetch_related', ())),
+        )
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Apply this serializer's query plan to queryset"""
+        select_related, prefetch_related = cls.get_query_plan()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class QueryPlanMixin:
+    """GenericAPIView mixin applying the serializer's query plan automatically"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        if setup_eager_loading is not None:
+            queryset = setup_eager_loading(queryset)
+        return queryset
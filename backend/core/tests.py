@@ -3,5 +3,7 @@ from django.test import TestCase
 # Import all test modules
 from .tests.test_user_api import *
 from .tests.test_business_api import *
+from .tests.test_cache_backend import *
+from .tests.test_business_access import *
 
 # Create your tests here.
\ No newline at end of file
@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.access import get_business_access
+from users.models import Business, Membership
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BusinessAccessTest(APITestCase):
+    """Test the memoized business access resolver"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='accessuser', password='testpass123')
+        self.other = User.objects.create_user(username='otheruser', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Access Business')
+        self.second = Business.objects.create(owner=self.other, legal_name='Second Business')
+        self.membership = Membership.objects.create(
+            user=self.user, business=self.business, role_in_business='business_admin'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def membership_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q for q in context.captured_queries if 'users_membership' in q['sql']]
+    
+    def test_roles(self):
+        Membership.objects.create(user=self.user, business=self.second, role_in_business='staff')
+        access = get_business_access(User.objects.get(pk=self.user.pk))
+        self.assertEqual(access.business_ids, [self.business.id, self.second.id])
+        self.assertTrue(access.is_admin(self.business.id))
+        self.assertTrue(access.is_admin(str(self.business.id)))
+        self.assertFalse(access.is_admin(self.second.id))
+        self.assertTrue(access.is_member(self.second.id))
+        self.assertFalse(access.is_member('not-an-id'))
+    
+    def test_resolved_once_per_request(self):
+        """Queryset filtering and admin checks share one membership lookup"""
+        url = f'/api/finance/transactions/?business={self.business.id}'
+        self.assertEqual(len(self.membership_queries(url)), 1)
+    
+    def test_cached_across_requests(self):
+        url = f'/api/finance/transactions/?business={self.business.id}'
+        self.membership_queries(url)
+        self.assertEqual(self.membership_queries(url), [])
+    
+    def test_membership_changes_invalidate(self):
+        """Adding or deactivating a membership applies on the next request"""
+        access = get_business_access(User.objects.get(pk=self.user.pk))
+        self.assertFalse(access.is_member(self.second.id))
+        
+        Membership.objects.create(user=self.user, business=self.second, role_in_business='staff')
+        access = get_business_access(User.objects.get(pk=self.user.pk))
+        self.assertTrue(access.is_member(self.second.id))
+        
+        self.membership.is_active = False
+        self.membership.save()
+        access = get_business_access(User.objects.get(pk=self.user.pk))
+        self.assertFalse(access.is_member(self.business.id))
+    
+    def test_permission_uses_resolver(self):
+        """IsMemberOfBusiness allows members and rejects other businesses"""
+        response = self.client.get(f'/api/users/memberships/?business={self.business.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/api/users/memberships/?business={self.second.id}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
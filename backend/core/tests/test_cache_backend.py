@@ -0,0 +1,130 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from core.cache_backends import TwoTierCache
+import threading
+import time
+
+
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-shared'},
+}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TwoTierCacheTest(SimpleTestCase):
+    """Test the in-process LRU + shared two-tier cache backend"""
+    
+    def setUp(self):
+        caches['shared'].clear()
+    
+    def make_cache(self, **options):
+        options.setdefault('SHARED_ALIAS', 'shared')
+        return TwoTierCache('', {'TIMEOUT': 300, 'OPTIONS': options})
+    
+    def test_reads_are_served_locally(self):
+        """A second read is a local hit and does not touch the shared tier"""
+        cache = self.make_cache()
+        cache.set('dashboard', {'total': 1})
+        
+        self.assertEqual(cache.get('dashboard'), {'total': 1})
+        self.assertEqual(cache.get_stats()['local_hits'], 1)
+        
+        caches['shared'].delete('dashboard')
+        self.assertEqual(cache.get('dashboard'), {'total': 1})
+    
+    def test_shared_tier_fills_local_tier(self):
+        """Values written by another process are found in the shared tier"""
+        writer, reader = self.make_cache(), self.make_cache()
+        writer.set('key', 'value')
+        
+        self.assertEqual(reader.get('key'), 'value')
+        self.assertEqual(reader.get('key'), 'value')
+        stats = reader.get_stats()
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 1.0)
+    
+    def test_misses_are_counted(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(cache.get_stats()['misses'], 1)
+        self.assertEqual(cache.get_stats()['hit_ratio'], 0.0)
+    
+    def test_local_tier_is_bounded(self):
+        """The least recently used local entry is evicted past LOCAL_MAX_ENTRIES"""
+        cache = self.make_cache(LOCAL_MAX_ENTRIES=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertEqual(cache.get_stats()['local_entries'], 2)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        cache.reset_stats()
+        self.assertEqual(cache.get('b'), 2)  # Evicted locally, still shared
+        self.assertEqual(cache.get_stats()['shared_hits'], 1)
+    
+    def test_local_entries_expire(self):
+        """Local entries live at most LOCAL_TIMEOUT seconds"""
+        cache = self.make_cache(LOCAL_TIMEOUT=0.05)
+        cache.set('key', 'value')
+        time.sleep(0.1)
+        
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get_stats()['shared_hits'], 1)
+    
+    def test_bypass_prefixes_stay_coherent(self):
+        """Counters under a bypass prefix are always read from the shared tier"""
+        first = self.make_cache(LOCAL_BYPASS_PREFIXES=['cache_version:'])
+        second = self.make_cache(LOCAL_BYPASS_PREFIXES=['cache_version:'])
+        first.set('cache_version:business_1', 1, None)
+        self.assertEqual(second.get('cache_version:business_1'), 1)
+        
+        first.incr('cache_version:business_1')
+        self.assertEqual(second.get('cache_version:business_1'), 2)
+    
+    def test_delete_removes_both_tiers(self):
+        cache = self.make_cache()
+        cache.set('key', 'value')
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(caches['shared'].get('key'))
+    
+    def test_get_or_set_computes_once(self):
+        """Concurrent misses for the same key trigger a single recomputation"""
+        cache = self.make_cache()
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'computed'
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('slow', compute)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['computed'] * 10)
+        self.assertEqual(cache.get_stats()['recomputes'], 1)
+    
+    def test_single_flight_waits_for_other_worker(self):
+        """A worker waits while another worker holds the shared recompute lock"""
+        worker, other = self.make_cache(LOCK_WAIT=1), self.make_cache()
+        caches['shared'].add('lock:report', 'other-worker', 30)
+        
+        def finish():
+            time.sleep(0.05)
+            other.set('report', 'done')
+        
+        thread = threading.Thread(target=finish)
+        thread.start()
+        self.assertEqual(worker.get_or_set('report', lambda: 'recomputed'), 'done')
+        thread.join()
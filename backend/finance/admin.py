@@ -2,7 +2,7 @@
 from django.contrib import admin
 from .models import (
     Transaction, Invoice, InvoiceItem, Budget, CashFlow,
-    FinancialForecast, CreditScore
+    FinancialForecast, CreditScore, AIJob, OutboxEvent, InvoiceNumberSequence
 )
 
 
@@ -32,6 +32,13 @@ class InvoiceAdmin(admin.ModelAdmin):
     ordering = ['-issue_date']
 
 
+@admin.register(InvoiceNumberSequence)
+class InvoiceNumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ['business', 'prefix', 'include_year', 'padding', 'year', 'next_number', 'updated_at']
+    search_fields = ['business__legal_name', 'prefix']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(InvoiceItem)
 class InvoiceItemAdmin(admin.ModelAdmin):
     list_display = ['invoice', 'description', 'quantity', 'unit_price', 'total_price']
@@ -52,7 +59,7 @@ class BudgetAdmin(admin.ModelAdmin):
 @admin.register(CashFlow)
 class CashFlowAdmin(admin.ModelAdmin):
     list_display = ['business', 'flow_type', 'category', 'amount', 'currency', 'period_start', 'period_end', 'is_forecast']
-    list_filter = ['flow_type', 'is_forecast', 'currency', 'period_start']
+    list_filter = ['flow_type', 'is_forecast', 'granularity', 'currency', 'period_start']
     search_fields = ['category', 'source']
     readonly_fields = ['id', 'created_at', 'updated_at']
     date_hierarchy = 'period_start'
@@ -77,3 +84,23 @@ class CreditScoreAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'score_category', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+
+
+@admin.register(AIJob)
+class AIJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'business', 'user', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['business__legal_name', 'user__username', 'error']
+    readonly_fields = ['id', 'dedup_key', 'created_at', 'started_at', 'finished_at']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['event_type', 'business', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['event_type', 'status', 'created_at']
+    search_fields = ['business__legal_name', 'idempotency_key', 'last_error']
+    readonly_fields = ['id', 'idempotency_key', 'created_at', 'claimed_at', 'sent_at']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at']
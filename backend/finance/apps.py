@@ -9,4 +9,4 @@ class FinanceConfig(AppConfig):
     
     def ready(self):
         # Import signal handlers
-        pass
+        from . import signals  # noqa: F401
@@ -1,12 +1,74 @@
 from django.core.cache import cache
+from contextlib import nullcontext
 from functools import wraps
 import hashlib
 import json
+import time
+
+# Generation counters: every cached response embeds the current version of the
+# business (and user) it was built from. Bumping a version makes all older
+# entries unreachable, so invalidation is O(1) and works for any period value.
+VERSION_TIMEOUT = None  # Version keys never expire
+
+
+def _version_key(scope, scope_id):
+    return f"cache_version:{scope}_{scope_id}"
+
+
+def _get_version(scope, scope_id):
+    key = _version_key(scope, scope_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version that was evicted never restarts at
+        # a value older cache entries were built with
+        version = time.time_ns()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(scope, scope_id):
+    key = _version_key(scope, scope_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (never read or evicted). add() only seeds it if no other
+        # process did in the meantime; otherwise increment theirs.
+        version = time.time_ns()
+        if cache.add(key, version, VERSION_TIMEOUT):
+            return version
+        return cache.incr(key)
+
+
+def get_business_cache_version(business_id):
+    """Current cache generation for a business"""
+    return _get_version('business', business_id)
+
+
+def get_user_cache_version(user_id):
+    """Current cache generation for a user"""
+    return _get_version('user', user_id)
+
+
+def bump_business_cache_version(business_id):
+    """Invalidate every cached response built from this business's data"""
+    if business_id:
+        return _bump_version('business', business_id)
+
+
+def bump_user_cache_version(user_id):
+    """Invalidate every cached response built for this user"""
+    if user_id:
+        return _bump_version('user', user_id)
+
 
 def cached_response(timeout=300, key_prefix=""):
     """
     Simple decorator to cache API responses.
     Usage: @cached_response(timeout=600, key_prefix="dashboard")
+
+    Cache keys embed the user's and business's cache versions, so entries are
+    invalidated by bumping a version (see finance.signals).
     """
     def decorator(func):
         @wraps(func)
@@ -15,47 +77,54 @@ def cached_response(timeout=300, key_prefix=""):
             user_id = request.user.id if hasattr(request, 'user') and request.user.is_authenticated else 'anon'
             business_id = request.query_params.get('business_id') or kwargs.get('business_id', '')
             period = request.query_params.get('period', '30')
-            
+
+            # Embed the current generations of the data the response depends on
+            user_version = get_user_cache_version(user_id)
+            business_version = get_business_cache_version(business_id) if business_id else ''
+
             # Create unique cache key
-            cache_key = f"{key_prefix}:user_{user_id}:business_{business_id}:period_{period}"
-            
+            cache_key = (
+                f"{key_prefix}:user_{user_id}.v{user_version}"
+                f":business_{business_id}.v{business_version}:period_{period}"
+            )
+
             # Try to get from cache
             cached_data = cache.get(cache_key)
             if cached_data is not None:
                 from rest_framework.response import Response
                 return Response(cached_data)
-            
-            # Execute view function
-            response = func(request, *args, **kwargs)
-            
-            # Cache successful GET responses
-            if hasattr(response, 'status_code') and response.status_code == 200:
-                if hasattr(response, 'data'):
-                    cache.set(cache_key, response.data, timeout)
-            
+
+            # Let only one request recompute a missing entry when the backend
+            # supports it (see core.cache_backends.TwoTierCache)
+            single_flight = getattr(cache, 'single_flight', None)
+            with single_flight(cache_key) if single_flight else nullcontext():
+                cached_data = cache.get(cache_key) if single_flight else None
+                if cached_data is not None:
+                    from rest_framework.response import Response
+                    return Response(cached_data)
+
+                # Execute view function
+                response = func(request, *args, **kwargs)
+
+                # Cache successful GET responses
+                if hasattr(response, 'status_code') and response.status_code == 200:
+                    if hasattr(response, 'data'):
+                        cache.set(cache_key, response.data, timeout)
+
             return response
         return wrapper
     return decorator
 
 def invalidate_user_cache(user_id, pattern=""):
     """Invalidate cache for a specific user"""
-    # For database cache, we can't easily pattern match, so this is a helper
-    # In production with Redis, this would use pattern matching
-    pass
+    bump_user_cache_version(user_id)
 
-# Add this function to cache_utils.py (after line 44)
 
 def invalidate_dashboard_cache(user_id, business_id=None):
     """
     Helper function to invalidate dashboard cache when data changes.
-    Call this after creating/updating transactions, invoices, budgets, etc.
+    Model signals already do this for finance records; call it directly
+    only for changes that bypass signals (e.g. queryset.update()).
     """
-    periods = ['7', '30', '90', '365']  # Common periods
-    for period in periods:
-        # Delete with business_id
-        if business_id:
-            cache_key = f"dashboard:user_{user_id}:business_{business_id}:period_{period}"
-            cache.delete(cache_key)
-        # Delete without business_id (all businesses view)
-        cache_key_all = f"dashboard:user_{user_id}:business_:period_{period}"
-        cache.delete(cache_key_all)
\ No newline at end of file
+    bump_user_cache_version(user_id)
+    bump_business_cache_version(business_id)
@@ -0,0 +1,10 @@
+from django.db import connections
+
+
+def init_worker():
+    """Give each worker process its own Django setup and database connections"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
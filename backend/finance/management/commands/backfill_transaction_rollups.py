@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+import time
+
+from finance.services.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction rollup table from existing transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only rebuild rollups for this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows inserted per batch',
+        )
+
+    def handle(self, *args, **options):
+        businesses = options['businesses']
+        scope = f"businesses {', '.join(map(str, businesses))}" if businesses else 'all businesses'
+        self.stdout.write(f'Rebuilding transaction rollups for {scope}...')
+
+        started = time.monotonic()
+        rows = rebuild_rollups(businesses, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rollup rows in {elapsed:.2f}s'))
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import signal
+import time
+
+from finance.services.outbox import OutboxDispatcher, requeue_stale_events
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued automation events to n8n (retrying failures, dead-lettering repeated ones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.N8N_BATCH_SIZE,
+            help='Events sent per webhook call',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.N8N_CONCURRENCY,
+            help='Webhook calls in flight at once',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no events are due instead of polling forever',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when nothing is due',
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'], concurrency=options['concurrency'])
+        if dispatcher.client is None:
+            raise CommandError('N8N_WEBHOOK_URL is not set')
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        self.stdout.write(f'Outbox dispatcher {dispatcher.worker} started')
+
+        started = time.monotonic()
+        totals = {'webhooks': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        while not self.stopping:
+            requeue_stale_events()
+            result = dispatcher.run_once()
+            if not result['claimed']:
+                if options['burst']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            for key in totals:
+                totals[key] += result[key]
+            self.stdout.write(
+                f"  {result['claimed']} events in {result['webhooks']} calls: {result['sent']} sent, "
+                f"{result['retried']} retrying, {result['dead']} dead-lettered"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {totals['sent']} events in {totals['webhooks']} webhook calls ({totals['retried']} retrying, "
+            f"{totals['dead']} dead-lettered) in {time.monotonic() - started:.2f}s"
+        ))
+
+    def _stop(self, signum, frame):
+        self.stdout.write('Stopping after the current batch...')
+        self.stopping = True
@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+import json
+import sys
+
+from finance.services.imports import (
+    DEFAULT_BATCH_SIZE, SUPPORTED_FORMATS, detect_format, import_transactions
+)
+from users.models import Business
+
+
+class Command(BaseCommand):
+    help = 'Bulk import transactions for a business from a CSV or JSON-lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import ('-' reads stdin)")
+        parser.add_argument('--business', type=int, required=True, help='Business ID to import into')
+        parser.add_argument('--user', required=True, help='Username or ID of the user who owns the imported rows')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=SUPPORTED_FORMATS,
+            help='File format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Rows validated and inserted per batch',
+        )
+        parser.add_argument(
+            '--allow-duplicates',
+            action='store_true',
+            help='Import rows even if their external_id already exists for the business',
+        )
+        parser.add_argument('--errors', help='Write the per-row error report to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(id=options['business'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business']} not found")
+
+        user_ref = options['user']
+        user = User.objects.filter(username=user_ref).first()
+        if user is None and user_ref.isdigit():
+            user = User.objects.filter(id=int(user_ref)).first()
+        if user is None:
+            raise CommandError(f"User '{user_ref}' not found")
+
+        path = options['path']
+        file_format = options['file_format'] or detect_format(path)
+        self.stdout.write(f'Importing {file_format} transactions into {business.legal_name}...')
+
+        try:
+            stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            result = import_transactions(
+                stream, file_format, business, user,
+                batch_size=options['batch_size'],
+                skip_duplicates=not options['allow_duplicates'],
+            )
+
+        for error in result.errors[:20]:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if result.error_count > 20:
+            self.stderr.write(f'... and {result.error_count - 20} more errors')
+        if result.file_error:
+            self.stderr.write(f'Import stopped early: {result.file_error}')
+        if options['errors']:
+            with open(options['errors'], 'w') as report:
+                json.dump(result.as_dict(), report, indent=2, default=str)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} of {result.rows} rows '
+            f'({result.skipped_duplicates} duplicates skipped, {result.error_count} errors) '
+            f'in {result.elapsed:.2f}s ({result.rows_per_second} rows/s)'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+import time
+
+from finance.services.cash_flows import materialize_cash_flows
+from users.models import Business
+
+
+class Command(BaseCommand):
+    help = 'Materialize weekly and monthly cash flows from transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only materialize cash flows for this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every period instead of only those with changed transactions',
+        )
+
+    def handle(self, *args, **options):
+        businesses = options['businesses'] or list(Business.objects.values_list('id', flat=True))
+
+        started = time.monotonic()
+        totals = materialize_cash_flows(businesses, full=options['full'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {totals['businesses']} businesses ({totals['rows']} cash flow rows) in {elapsed:.2f}s"
+        ))
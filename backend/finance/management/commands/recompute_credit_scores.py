@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+import os
+import time
+
+from finance.cache_utils import bump_business_cache_version, bump_user_cache_version
+from finance.management.commands._pool import init_worker
+from finance.models import CreditScore
+from finance.services.automation_service import queue_credit_score_alerts
+from finance.services.credit_scoring import build_credit_scores, score_chunk
+from users.models import Business
+
+
+class Command(BaseCommand):
+    help = 'Recompute credit scores for all businesses whose data changed since their last score'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only score this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (1 scores in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Businesses scored per chunk',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rescore businesses even if their data has not changed',
+        )
+
+    def handle(self, *args, **options):
+        business_ids = Business.objects.order_by('id').values_list('id', flat=True)
+        if options['businesses']:
+            business_ids = business_ids.filter(id__in=options['businesses'])
+        business_ids = list(business_ids)
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [business_ids[i:i + chunk_size] for i in range(0, len(business_ids), chunk_size)]
+        workers = max(1, min(options['workers'], len(chunks) or 1))
+        self.stdout.write(
+            f'Scoring {len(business_ids)} businesses in {len(chunks)} chunks with {workers} worker(s)...'
+        )
+
+        self.started = time.monotonic()
+        self.totals = {'processed': 0, 'scored': 0, 'skipped': 0}
+        self.total = len(business_ids)
+
+        if workers == 1:
+            for chunk in chunks:
+                self._save_chunk(len(chunk), *score_chunk(chunk, options['force']))
+        else:
+            # Forked workers must not share this process's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                futures = {pool.submit(score_chunk, chunk, options['force']): len(chunk) for chunk in chunks}
+                for future in as_completed(futures):
+                    self._save_chunk(futures[future], *future.result())
+
+        elapsed = time.monotonic() - self.started
+        rate = self.totals['processed'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {self.totals['scored']} businesses, skipped {self.totals['skipped']} unchanged "
+            f"in {elapsed:.2f}s ({rate:.1f} businesses/s)"
+        ))
+
+    def _save_chunk(self, size, results, skipped):
+        scores = build_credit_scores(results)
+        with transaction.atomic():
+            CreditScore.objects.bulk_create(scores)
+            queue_credit_score_alerts(scores)
+        # bulk_create skips the signals that invalidate cached dashboards
+        for score in scores:
+            bump_business_cache_version(score.business_id)
+            bump_user_cache_version(score.user_id)
+
+        self.totals['processed'] += size
+        self.totals['scored'] += len(scores)
+        self.totals['skipped'] += skipped
+        elapsed = time.monotonic() - self.started
+        rate = self.totals['processed'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"  {self.totals['processed']}/{self.total} businesses "
+            f"({self.totals['scored']} scored, {self.totals['skipped']} unchanged) - {rate:.1f}/s"
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+import time
+
+from finance.services.customer_balances import link_invoices_to_customers, recompute_customer_balances
+from users.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recompute customer total_invoiced/total_paid from invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only recompute customers of this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--link',
+            action='store_true',
+            help='First link invoices without a customer to the customer with the same email',
+        )
+
+    def handle(self, *args, **options):
+        businesses = options['businesses']
+        customers = Customer.objects.all()
+        if businesses:
+            customers = customers.filter(business_id__in=businesses)
+
+        started = time.monotonic()
+        linked = link_invoices_to_customers(businesses) if options['link'] else 0
+        total = customers.count()
+        corrected = recompute_customer_balances(customers)
+        for customer, invoiced, paid in corrected:
+            self.stdout.write(
+                f'  {customer.customer_name} ({customer.id}): invoiced {invoiced} -> {customer.total_invoiced}, '
+                f'paid {paid} -> {customer.total_paid}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {total} customers ({len(corrected)} corrected, {linked} invoices linked) '
+            f'in {time.monotonic() - started:.2f}s'
+        ))
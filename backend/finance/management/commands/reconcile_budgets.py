@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+import time
+
+from finance.models import Budget
+from finance.services.budgets import reconcile_budgets
+
+
+class Command(BaseCommand):
+    help = 'Recompute budget spent amounts from expense transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only reconcile budgets of this business ID (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        budgets = Budget.objects.all()
+        if options['businesses']:
+            budgets = budgets.filter(business_id__in=options['businesses'])
+
+        started = time.monotonic()
+        total = budgets.count()
+        corrected = reconcile_budgets(budgets)
+        for budget, previous in corrected:
+            self.stdout.write(f'  {budget.name} ({budget.id}): {previous} -> {budget.spent_amount}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {total} budgets ({len(corrected)} corrected) in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from datetime import datetime, timedelta
+import os
+import time
+
+from finance.management.commands._pool import init_worker
+from finance.models import Invoice
+from finance.services.invoice_documents import CONTENT_TYPES, render_invoice_chunk
+
+
+class Command(BaseCommand):
+    help = "Render and cache the documents of a month's invoices (month-end runs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only render invoices of this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--month',
+            help='Month of the invoices\' issue date, YYYY-MM (default: this month)',
+        )
+        parser.add_argument(
+            '--changed-since',
+            type=int,
+            metavar='MINUTES',
+            help='Instead of a month, render invoices changed in the last MINUTES '
+                 '(run it at that interval to render sent invoices before they are downloaded)',
+        )
+        parser.add_argument(
+            '--type',
+            choices=[*CONTENT_TYPES, 'all'],
+            default='pdf',
+            help='Document type to render',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (1 renders in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='Invoices rendered per chunk',
+        )
+
+    def handle(self, *args, **options):
+        if options['changed_since'] is not None:
+            if options['month']:
+                raise CommandError('--month and --changed-since cannot be combined')
+            since = timezone.now() - timedelta(minutes=options['changed_since'])
+            invoices = Invoice.objects.filter(updated_at__gte=since)
+            selection = f'changed since {since:%Y-%m-%d %H:%M}'
+        else:
+            if options['month']:
+                try:
+                    month = datetime.strptime(options['month'], '%Y-%m').date()
+                except ValueError:
+                    raise CommandError('--month must be YYYY-MM')
+            else:
+                month = timezone.localdate().replace(day=1)
+            invoices = Invoice.objects.filter(issue_date__year=month.year, issue_date__month=month.month)
+            selection = f'from {month:%Y-%m}'
+        formats = list(CONTENT_TYPES) if options['type'] == 'all' else [options['type']]
+
+        if options['businesses']:
+            invoices = invoices.filter(business_id__in=options['businesses'])
+        invoice_ids = list(invoices.order_by('issue_date', 'id').values_list('id', flat=True))
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [invoice_ids[i:i + chunk_size] for i in range(0, len(invoice_ids), chunk_size)]
+        workers = max(1, min(options['workers'], len(chunks) or 1))
+        self.stdout.write(
+            f'Rendering {len(invoice_ids)} invoices {selection} in {len(chunks)} chunks '
+            f'with {workers} worker(s)...'
+        )
+
+        started = time.monotonic()
+        rendered = cached = 0
+        if workers == 1:
+            for chunk in chunks:
+                chunk_rendered, chunk_cached = render_invoice_chunk(chunk, formats)
+                rendered += chunk_rendered
+                cached += chunk_cached
+        else:
+            # Forked workers must not share this process's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                futures = [pool.submit(render_invoice_chunk, chunk, formats) for chunk in chunks]
+                for future in as_completed(futures):
+                    chunk_rendered, chunk_cached = future.result()
+                    rendered += chunk_rendered
+                    cached += chunk_cached
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} documents ({cached} already cached) in {elapsed:.2f}s'
+        ))
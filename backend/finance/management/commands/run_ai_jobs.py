@@ -0,0 +1,123 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+import os
+import signal
+import socket
+import time
+
+from finance.services.ai_jobs import claim_jobs, requeue_stale_jobs, run_job
+
+
+def _run_in_thread(job):
+    """Run a job on a pool thread, releasing that thread's database connection afterwards"""
+    try:
+        return run_job(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Process queued AI jobs (LLM-backed analysis, forecast narratives and chat)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.AI_JOBS_CONCURRENCY,
+            help='Jobs run at the same time (1 runs them in this thread)',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no queued jobs are due instead of polling forever',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after processing this many jobs (0 = no limit)',
+        )
+
+    def handle(self, *args, **options):
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        self.totals = {'succeeded': 0, 'failed': 0, 'retried': 0}
+        signal.signal(signal.SIGTERM, self._stop)
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(f'AI job worker {self.worker} started with concurrency {concurrency}')
+
+        started = time.monotonic()
+        if concurrency == 1:
+            self._run_inline(options)
+        else:
+            self._run_pool(concurrency, options)
+
+        processed = sum(self.totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} jobs ({self.totals['succeeded']} succeeded, {self.totals['failed']} failed, "
+            f"{self.totals['retried']} retried) in {time.monotonic() - started:.2f}s"
+        ))
+
+    def _stop(self, signum, frame):
+        self.stdout.write('Stopping after in-flight jobs finish...')
+        self.stopping = True
+
+    def _done(self, options):
+        return self.stopping or (options['max_jobs'] and sum(self.totals.values()) >= options['max_jobs'])
+
+    def _remaining(self, options, in_flight=0):
+        if not options['max_jobs']:
+            return None
+        return options['max_jobs'] - sum(self.totals.values()) - in_flight
+
+    def _run_inline(self, options):
+        while not self._done(options):
+            requeue_stale_jobs()
+            jobs = claim_jobs(self.worker, 1)
+            if not jobs:
+                if options['burst']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self._record(run_job(jobs[0]))
+
+    def _run_pool(self, concurrency, options):
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-job') as pool:
+            while True:
+                if not self._done(options):
+                    free = concurrency - len(in_flight)
+                    remaining = self._remaining(options, len(in_flight))
+                    if remaining is not None:
+                        free = min(free, remaining)
+                    if free > 0:
+                        requeue_stale_jobs()
+                        for job in claim_jobs(self.worker, free):
+                            in_flight.add(pool.submit(_run_in_thread, job))
+
+                if not in_flight:
+                    if self._done(options) or options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                finished, in_flight = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._record(future.result())
+
+    def _record(self, job):
+        if job.status == 'succeeded':
+            self.totals['succeeded'] += 1
+        elif job.status == 'failed':
+            self.totals['failed'] += 1
+        else:
+            self.totals['retried'] += 1
+        self.stdout.write(f'  {job.kind} {job.id}: {job.status} (attempt {job.attempts})')
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from finance.services.automation_runner import DailyAutomationRunner
+
+
+class Command(BaseCommand):
+    help = 'Flag overdue invoices and send their reminders for every business'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            dest='businesses',
+            help='Only process this business ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.AUTOMATION_WORKERS,
+            help='Businesses processed at the same time (1 processes them in this thread)',
+        )
+        parser.add_argument(
+            '--webhook-concurrency',
+            type=int,
+            default=settings.N8N_CONCURRENCY,
+            help='Webhook requests in flight at once',
+        )
+
+    def handle(self, *args, **options):
+        runner = DailyAutomationRunner(options['workers'], options['webhook_concurrency'])
+        summary = runner.run(options['businesses'])
+
+        for business_id, result in summary['results'].items():
+            if 'error' in result:
+                self.stderr.write(f'  business {business_id}: {result["error"]}')
+        phases = summary['phases']
+        self.stdout.write(
+            f"collect {phases['collect']:.2f}s, dispatch {phases['dispatch']:.2f}s "
+            f"({summary['webhooks']} webhook calls)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {summary['businesses']} businesses: {summary['overdue_invoices']} invoices marked overdue, "
+            f"{summary['events']} events queued, {summary['delivered']} delivered ({summary['retrying']} retrying, "
+            f"{summary['dead']} dead-lettered) in {phases['total']:.2f}s"
+        ))
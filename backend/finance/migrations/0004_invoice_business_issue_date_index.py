@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_transactiondailyrollup'),
+        ('users', '0007_alter_businessregistration_id_document_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['business', 'issue_date'], name='finance_inv_busines_bd63aa_idx'),
+        ),
+    ]
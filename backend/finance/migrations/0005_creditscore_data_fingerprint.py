@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_invoice_business_issue_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditscore',
+            name='data_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
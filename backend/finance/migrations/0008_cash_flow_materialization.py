@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_outboxevent'),
+        ('users', '0007_alter_businessregistration_id_document_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('synced_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cashflow',
+            name='granularity',
+            field=models.CharField(blank=True, choices=[('week', 'Weekly'), ('month', 'Monthly')], max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='cashflow',
+            constraint=models.UniqueConstraint(condition=models.Q(('source', 'transactions')), fields=('business', 'user', 'granularity', 'period_start', 'flow_type'), name='unique_materialized_cash_flow'),
+        ),
+        migrations.AddField(
+            model_name='cashflowsyncstate',
+            name='business',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cash_flow_sync', to='users.business'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_cash_flow_materialization'),
+        ('users', '0007_alter_businessregistration_id_document_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status__in', ['sent', 'overdue'])), fields=['business', 'due_date'], include=('customer_name', 'total_amount'), name='invoice_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:06
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_invoice_customer'),
+        ('users', '0008_customer_top_invoiced_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(blank=True, max_length=20)),
+                ('include_year', models.BooleanField(default=True)),
+                ('padding', models.PositiveSmallIntegerField(default=5, validators=[django.core.validators.MaxValueValidator(20)])),
+                ('year', models.PositiveIntegerField(blank=True, null=True)),
+                ('next_number', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.UniqueConstraint(fields=('business', 'invoice_number'), name='unique_invoice_number_per_business'),
+        ),
+        migrations.AddField(
+            model_name='invoicenumbersequence',
+            name='business',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequence', to='users.business'),
+        ),
+    ]
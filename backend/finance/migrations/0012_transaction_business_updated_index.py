@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_invoice_number_sequence'),
+        ('users', '0008_customer_top_invoiced_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['business', 'updated_at'], name='finance_tra_busines_f58ab4_idx'),
+        ),
+    ]
@@ -71,12 +71,44 @@ class Transaction(models.Model):
             models.Index(fields=['business', 'transaction_date']),
             models.Index(fields=['transaction_type', 'status']),
             models.Index(fields=['category', 'subcategory']),
+            # Cash flow staleness checks look for changes since the last sync
+            models.Index(fields=['business', 'updated_at']),
         ]
     
     def __str__(self):
         return f"{self.transaction_type.title()}: {self.amount} {self.currency} - {self.description[:50]}"
 
 
+class TransactionDailyRollup(models.Model):
+    """Pre-aggregated daily transaction totals used by the analytics endpoints"""
+    
+    business = models.ForeignKey('users.Business', on_delete=models.CASCADE, related_name='transaction_rollups')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_rollups')
+    
+    # Rollup key
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=100, blank=True)
+    payment_method = models.CharField(max_length=20, choices=Transaction.PAYMENT_METHODS)
+    
+    # Aggregates
+    transaction_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = [['business', 'user', 'day', 'transaction_type', 'category', 'payment_method']]
+        indexes = [
+            models.Index(fields=['business', 'day']),
+            models.Index(fields=['user', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.transaction_type}/{self.category or '-'}/{self.payment_method}: {self.transaction_count} ({self.total_amount})"
+
+
 class Invoice(models.Model):
     """Invoice model for managing customer invoices"""
     
@@ -93,7 +125,11 @@ class Invoice(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invoices')
     
     # Invoice details
-    invoice_number = models.CharField(max_length=50, unique=True)
+    # Unique per business; allocated by finance.services.invoice_numbers when not supplied
+    invoice_number = models.CharField(max_length=50)
+    # Balances are kept on the customer (see finance.services.customer_balances)
+    customer = models.ForeignKey('users.Customer', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='invoices')
     customer_name = models.CharField(max_length=255)
     customer_email = models.EmailField(blank=True)
     customer_phone = models.CharField(max_length=20, blank=True)
@@ -127,12 +163,49 @@ class Invoice(models.Model):
         indexes = [
             models.Index(fields=['business', 'status']),
             models.Index(fields=['due_date', 'status']),
+            models.Index(fields=['business', 'issue_date']),
+            # Aged receivables (see finance.services.receivables)
+            models.Index(
+                fields=['business', 'due_date'],
+                include=['customer_name', 'total_amount'],
+                condition=models.Q(status__in=['sent', 'overdue']),
+                name='invoice_open_due_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'invoice_number'], name='unique_invoice_number_per_business'),
         ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.customer_name}"
 
 
+class InvoiceNumberSequence(models.Model):
+    """Per-business invoice number counter and format"""
+    
+    business = models.OneToOneField('users.Business', on_delete=models.CASCADE, related_name='invoice_sequence')
+    
+    # Format: {prefix}{year}-{number} or {prefix}{number}, number zero-padded
+    prefix = models.CharField(max_length=20, blank=True)
+    include_year = models.BooleanField(default=True)
+    padding = models.PositiveSmallIntegerField(default=5, validators=[MaxValueValidator(20)])
+    
+    # Numbering restarts at 1 each year when the year is included
+    year = models.PositiveIntegerField(null=True, blank=True)
+    next_number = models.PositiveIntegerField(default=1)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def format(self, number, year=None):
+        digits = str(number).zfill(self.padding)
+        if self.include_year:
+            return f"{self.prefix}{year or self.year}-{digits}"
+        return f"{self.prefix}{digits}"
+    
+    def __str__(self):
+        return f"{self.business_id}: next {self.format(self.next_number)}"
+
+
 class InvoiceItem(models.Model):
     """Individual items within an invoice"""
     
@@ -202,6 +275,13 @@ class Budget(models.Model):
         self.remaining_amount = self.budgeted_amount - self.spent_amount
         super().save(*args, **kwargs)
     
+    @property
+    def utilization_percentage(self):
+        """Share of the budget spent, in percent"""
+        if self.budgeted_amount > 0:
+            return round((self.spent_amount / self.budgeted_amount) * 100, 2)
+        return 0
+    
     def __str__(self):
         return f"{self.name} - {self.budgeted_amount} {self.currency}"
 
@@ -215,6 +295,11 @@ class CashFlow(models.Model):
         ('net', 'Net Cash Flow'),
     ]
     
+    GRANULARITIES = [
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     business = models.ForeignKey('users.Business', on_delete=models.CASCADE, related_name='cash_flows')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cash_flows')
@@ -233,7 +318,9 @@ class CashFlow(models.Model):
     # Analysis metadata
     confidence_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
                                          validators=[MinValueValidator(0), MaxValueValidator(100)])
-    source = models.CharField(max_length=100, blank=True)  # 'actual', 'forecast', 'ai_prediction'
+    source = models.CharField(max_length=100, blank=True)  # 'actual', 'forecast', 'ai_prediction', 'transactions'
+    # Set on rows materialized from transactions (see finance.services.cash_flows)
+    granularity = models.CharField(max_length=10, choices=GRANULARITIES, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -244,11 +331,29 @@ class CashFlow(models.Model):
             models.Index(fields=['business', 'period_start']),
             models.Index(fields=['flow_type', 'is_forecast']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'user', 'granularity', 'period_start', 'flow_type'],
+                condition=models.Q(source='transactions'),
+                name='unique_materialized_cash_flow',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.flow_type.title()}: {self.amount} {self.currency} - {self.period_start}"
 
 
+class CashFlowSyncState(models.Model):
+    """How far a business's transaction-derived cash flows are up to date"""
+    
+    business = models.OneToOneField('users.Business', on_delete=models.CASCADE, related_name='cash_flow_sync')
+    # Transaction changes made before this time are reflected in its CashFlow rows
+    synced_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.business_id} synced at {self.synced_at}"
+
+
 class FinancialForecast(models.Model):
     """AI-powered financial forecasting model"""
     
@@ -327,6 +432,7 @@ class CreditScore(models.Model):
     # Metadata
     calculation_method = models.CharField(max_length=100, default='ai_enhanced')
     data_sources = models.JSONField(default=list, blank=True)
+    data_fingerprint = models.CharField(max_length=64, blank=True)  # Snapshot of the scored data (batch job)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -338,18 +444,22 @@ class CreditScore(models.Model):
             models.Index(fields=['score_category']),
         ]
     
+    @staticmethod
+    def categorize(score):
+        """Score category for a numeric score"""
+        if score >= 800:
+            return 'excellent'
+        elif score >= 740:
+            return 'very_good'
+        elif score >= 670:
+            return 'good'
+        elif score >= 580:
+            return 'fair'
+        return 'poor'
+    
     def save(self, *args, **kwargs):
         # Auto-categorize score
-        if self.score >= 800:
-            self.score_category = 'excellent'
-        elif self.score >= 740:
-            self.score_category = 'very_good'
-        elif self.score >= 670:
-            self.score_category = 'good'
-        elif self.score >= 580:
-            self.score_category = 'fair'
-        else:
-            self.score_category = 'poor'
+        self.score_category = self.categorize(self.score)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -410,4 +520,97 @@ class Supplier(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.supplier_name} - {self.business.legal_name}"
\ No newline at end of file
+        return f"{self.supplier_name} - {self.business.legal_name}"
+
+class AIJob(models.Model):
+    """Queued LLM-backed analysis request, processed by the run_ai_jobs worker"""
+    
+    JOB_KINDS = [
+        ('health_analysis', 'Financial Health Analysis'),
+        ('forecast_narrative', 'Forecast Narrative'),
+        ('chat', 'Chat'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey('users.Business', on_delete=models.CASCADE, related_name='ai_jobs')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ai_jobs')
+    
+    kind = models.CharField(max_length=30, choices=JOB_KINDS)
+    payload = models.JSONField(default=dict, blank=True)
+    dedup_key = models.CharField(max_length=64)  # Identical requests share one job
+    
+    # Execution state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField()  # Not picked up before this time (retry backoff)
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['dedup_key', 'status']),
+            models.Index(fields=['user', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+
+class OutboxEvent(models.Model):
+    """Automation event for n8n, written in the same transaction as the change
+    that triggered it and delivered by the dispatch_outbox worker"""
+    
+    EVENT_TYPES = [
+        ('invoice_reminder', 'Invoice Reminder'),
+        ('budget_alert', 'Budget Alert'),
+        ('credit_score_alert', 'Credit Score Alert'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey('users.Business', on_delete=models.CASCADE, related_name='outbox_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    # Also sent to n8n, so a redelivered event can be recognised and ignored
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    payload = models.JSONField(default=dict)
+    
+    # Delivery state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField()  # Not sent before this time (retry backoff)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['business', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} ({self.status})"
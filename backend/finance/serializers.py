@@ -1,14 +1,17 @@
 # backend/finance/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from decimal import Decimal
 from .models import (
     Transaction, Invoice, InvoiceItem, Budget, CashFlow, 
-    FinancialForecast, CreditScore, Supplier
+    FinancialForecast, CreditScore, Supplier, AIJob
 )
 from users.models import Business, UserProfile
+from core.query_plans import QueryPlanSerializerMixin
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for Transaction model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -16,6 +19,7 @@ class TransactionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Transaction
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'amount', 'currency', 'transaction_type', 'payment_method', 'status',
@@ -40,7 +44,7 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'total_price', 'created_at']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for Invoice model"""
     
     items = InvoiceItemSerializer(many=True, read_only=True)
@@ -50,24 +54,86 @@ class InvoiceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Invoice
+        select_related = ('business', 'user')
+        prefetch_related = ('items',)
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
-            'invoice_number', 'customer_name', 'customer_email', 'customer_phone',
+            'invoice_number', 'customer', 'customer_name', 'customer_email', 'customer_phone',
             'customer_address', 'subtotal', 'tax_amount', 'total_amount', 'currency',
             'status', 'issue_date', 'due_date', 'paid_date', 'etims_invoice_number',
             'etims_status', 'notes', 'terms_conditions', 'items', 'days_overdue',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'days_overdue']
+        # Allocated from the business's sequence when omitted, so the
+        # (business, invoice_number) check is done in InvoiceViewSet.perform_create
+        extra_kwargs = {'invoice_number': {'required': False, 'allow_blank': True}}
+        validators = []
     
     def get_days_overdue(self, obj):
         if obj.status == 'overdue':
             from django.utils import timezone
             return (timezone.now().date() - obj.due_date).days
         return 0
+    
+    def _business_id(self, attrs):
+        """Business the invoice belongs to (or will), as far as it can be told here"""
+        if attrs.get('business') is not None:
+            return attrs['business'].id
+        if self.instance is not None:
+            return self.instance.business_id
+        # Read-only (with-items): perform_create takes the business from the request data
+        try:
+            return int(self.initial_data.get('business'))
+        except (TypeError, ValueError):
+            return None
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # The customer's balance is updated from the invoice, so it must be the same tenant's
+        customer = attrs.get('customer')
+        if customer is not None and customer.business_id != self._business_id(attrs):
+            raise serializers.ValidationError({'customer': 'Customer does not belong to this business'})
+        return attrs
+
 
+class InvoiceWithItemsSerializer(InvoiceSerializer):
+    """Serializer for creating an invoice together with its items.
+    
+    Line totals, ``subtotal`` and ``total_amount`` (subtotal plus
+    ``tax_amount``) are computed here; the invoice and its items are inserted
+    in one transaction, the items with a single bulk insert.
+    """
+    
+    items = InvoiceItemSerializer(many=True)
+    
+    class Meta(InvoiceSerializer.Meta):
+        read_only_fields = InvoiceSerializer.Meta.read_only_fields + ['business', 'user', 'subtotal', 'total_amount']
+    
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An invoice needs at least one item")
+        return items
+    
+    def create(self, validated_data):
+        items = validated_data.pop('items')
+        lines = [
+            InvoiceItem(total_price=(item['quantity'] * item['unit_price']).quantize(Decimal('0.01')), **item)
+            for item in items
+        ]
+        subtotal = sum((line.total_price for line in lines), Decimal('0'))
+        validated_data['subtotal'] = subtotal
+        validated_data['total_amount'] = subtotal + validated_data.get('tax_amount', Decimal('0'))
+        
+        with transaction.atomic():
+            invoice = Invoice.objects.create(**validated_data)
+            for line in lines:
+                line.invoice = invoice
+            InvoiceItem.objects.bulk_create(lines)
+        return invoice
 
-class BudgetSerializer(serializers.ModelSerializer):
+
+class BudgetSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for Budget model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -77,6 +143,7 @@ class BudgetSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Budget
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'name', 'description', 'budget_type', 'category',
@@ -85,18 +152,17 @@ class BudgetSerializer(serializers.ModelSerializer):
             'utilization_percentage', 'is_over_budget',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'remaining_amount', 'created_at', 'updated_at']
+        # spent_amount is derived from expense transactions (finance.services.budgets)
+        read_only_fields = ['id', 'spent_amount', 'remaining_amount', 'created_at', 'updated_at']
     
     def get_utilization_percentage(self, obj):
-        if obj.budgeted_amount > 0:
-            return round((obj.spent_amount / obj.budgeted_amount) * 100, 2)
-        return 0
+        return obj.utilization_percentage
     
     def get_is_over_budget(self, obj):
         return obj.spent_amount > obj.budgeted_amount
 
 
-class CashFlowSerializer(serializers.ModelSerializer):
+class CashFlowSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for CashFlow model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -104,16 +170,17 @@ class CashFlowSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CashFlow
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'flow_type', 'category', 'amount', 'currency',
             'period_start', 'period_end', 'is_forecast', 'confidence_score',
-            'source', 'created_at', 'updated_at'
+            'source', 'granularity', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'granularity', 'created_at', 'updated_at']
 
 
-class FinancialForecastSerializer(serializers.ModelSerializer):
+class FinancialForecastSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for FinancialForecast model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -121,6 +188,7 @@ class FinancialForecastSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = FinancialForecast
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'forecast_type', 'name', 'description', 'forecast_data',
@@ -131,7 +199,7 @@ class FinancialForecastSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class CreditScoreSerializer(serializers.ModelSerializer):
+class CreditScoreSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for CreditScore model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -139,6 +207,7 @@ class CreditScoreSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CreditScore
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'score', 'score_category', 'payment_history', 'credit_utilization',
@@ -174,7 +243,7 @@ class TransactionAnalyticsSerializer(serializers.Serializer):
     income_count = serializers.IntegerField()
     expense_count = serializers.IntegerField()
     top_categories = serializers.ListField()
-    payment_methods = serializers.DictField()
+    payment_methods = serializers.ListField()
     currency = serializers.CharField(max_length=3)
 
 
@@ -191,7 +260,46 @@ class BudgetAnalyticsSerializer(serializers.Serializer):
     currency = serializers.CharField(max_length=3)
 
 
-class SupplierSerializer(serializers.ModelSerializer):
+class CashFlowPeriodSerializer(serializers.Serializer):
+    """Serializer for one period of materialized cash flows"""
+    
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+    inflow = serializers.DecimalField(max_digits=15, decimal_places=2)
+    outflow = serializers.DecimalField(max_digits=15, decimal_places=2)
+    net = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+
+
+class AgingBucketsSerializer(serializers.Serializer):
+    """Serializer for receivables aging buckets"""
+    
+    current = serializers.DecimalField(max_digits=15, decimal_places=2)
+    days_1_30 = serializers.DecimalField(max_digits=15, decimal_places=2)
+    days_31_60 = serializers.DecimalField(max_digits=15, decimal_places=2)
+    days_61_90 = serializers.DecimalField(max_digits=15, decimal_places=2)
+    days_over_90 = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total = serializers.DecimalField(max_digits=15, decimal_places=2)
+    invoice_count = serializers.IntegerField()
+
+
+class CustomerAgingSerializer(AgingBucketsSerializer):
+    """Serializer for one customer's receivables aging"""
+    
+    customer_name = serializers.CharField()
+
+
+class AgedReceivablesSerializer(serializers.Serializer):
+    """Serializer for the aged receivables report"""
+    
+    business = serializers.IntegerField()
+    as_of = serializers.DateField()
+    totals = AgingBucketsSerializer()
+    customers = CustomerAgingSerializer(many=True)
+    currency = serializers.CharField(max_length=3)
+
+
+class SupplierSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for Supplier model"""
     
     business_name = serializers.CharField(source='business.legal_name', read_only=True)
@@ -199,6 +307,7 @@ class SupplierSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Supplier
+        select_related = ('business', 'user')
         fields = [
             'id', 'business', 'user', 'business_name', 'user_name',
             'supplier_name', 'contact_person', 'email', 'phone_number',
@@ -208,3 +317,18 @@ class SupplierSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class AIJobSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
+    """Serializer for queued AI jobs (status only; the result has its own endpoint)"""
+    
+    business_name = serializers.CharField(source='business.legal_name', read_only=True)
+    
+    class Meta:
+        model = AIJob
+        select_related = ('business',)
+        fields = [
+            'id', 'business', 'business_name', 'kind', 'payload', 'status',
+            'attempts', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
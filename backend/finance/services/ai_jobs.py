@@ -0,0 +1,227 @@
+# backend/finance/services/ai_jobs.py
+"""
+Database-backed queue for LLM-backed analysis.
+
+Requests are stored as AIJob rows and answered by the ``run_ai_jobs``
+worker, so no web worker ever waits on a completion. Identical requests
+(same kind, business, user and payload) share one job while it is pending
+and for ``AI_JOBS_DEDUP_SECONDS`` after it succeeds, and each user may only
+have ``AI_JOBS_MAX_PENDING_PER_USER`` jobs queued or running at once.
+"""
+import hashlib
+import json
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import AIJob, FinancialForecast
+from .llm import get_llm, parse_json_response
+from .prompts import CHAT_TEMPLATE, FORECAST_NARRATIVE_TEMPLATE, HEALTH_ANALYSIS_TEMPLATE
+from .response_cache import ResponseCache
+from .summary import business_financial_context, financial_scope_user
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+MAX_QUESTION_LENGTH = 2000
+RETRY_BACKOFF_SECONDS = 5
+
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+
+class JobLimitExceeded(Exception):
+    """The user already has the maximum number of pending jobs"""
+
+
+def job_handler(kind: str):
+    """Register the function that runs jobs of ``kind``"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def validate_payload(kind: str, payload: Any, business_id) -> Dict[str, Any]:
+    """Check a job payload before it is queued; raises ValueError"""
+    if kind not in dict(AIJob.JOB_KINDS):
+        raise ValueError(f"Unknown job kind '{kind}'. Use one of: {', '.join(dict(AIJob.JOB_KINDS))}")
+    payload = payload or {}
+    if not isinstance(payload, dict):
+        raise ValueError('payload must be an object')
+
+    if kind == 'chat':
+        question = payload.get('question')
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError('payload.question is required')
+        if len(question) > MAX_QUESTION_LENGTH:
+            raise ValueError(f'payload.question must be at most {MAX_QUESTION_LENGTH} characters')
+        payload = dict(payload, question=question.strip())
+    elif kind == 'forecast_narrative':
+        forecast_id = payload.get('forecast_id')
+        if forecast_id:
+            try:
+                found = FinancialForecast.objects.filter(id=forecast_id, business_id=business_id).exists()
+            except (ValueError, DjangoValidationError):
+                found = False
+            if not found:
+                raise ValueError('Forecast not found for this business')
+        elif payload.get('forecast_type', 'revenue') not in dict(FinancialForecast.FORECAST_TYPES):
+            raise ValueError(f"Unknown forecast type: {payload.get('forecast_type')}")
+    return payload
+
+
+def dedup_key(kind: str, business_id, user_id, payload: Dict[str, Any]) -> str:
+    raw = json.dumps([kind, str(business_id), user_id, payload], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def submit_job(business, user, kind: str, payload: Dict[str, Any] = None) -> Tuple[AIJob, bool]:
+    """Queue a job, or return the matching pending/recent one. Returns (job, created)."""
+    payload = validate_payload(kind, payload, business.id)
+    key = dedup_key(kind, business.id, user.id, payload)
+    now = timezone.now()
+    recent = now - timedelta(seconds=settings.AI_JOBS_DEDUP_SECONDS)
+
+    existing = (
+        AIJob.objects
+        .filter(dedup_key=key)
+        .filter(Q(status__in=ACTIVE_STATUSES) | Q(status='succeeded', finished_at__gte=recent))
+        .order_by('-created_at')
+        .first()
+    )
+    if existing:
+        return existing, False
+
+    pending = AIJob.objects.filter(user=user, status__in=ACTIVE_STATUSES).count()
+    if pending >= settings.AI_JOBS_MAX_PENDING_PER_USER:
+        raise JobLimitExceeded(
+            f'You already have {pending} AI requests in progress. Please wait for them to finish.'
+        )
+
+    job = AIJob.objects.create(
+        business=business, user=user, kind=kind, payload=payload, dedup_key=key, run_after=now
+    )
+    return job, True
+
+
+def claim_jobs(worker: str, limit: int) -> List[AIJob]:
+    """Atomically mark up to ``limit`` due jobs as running for this worker"""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    due = AIJob.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'created_at')
+    locking = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if locking else nullcontext():
+        if locking:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # Without row locks (SQLite) the status guard alone keeps claims exclusive
+        AIJob.objects.filter(id__in=ids, status='queued').update(
+            status='running', worker=worker, started_at=now, attempts=F('attempts') + 1
+        )
+    return list(
+        AIJob.objects.filter(id__in=ids, status='running', worker=worker, started_at=now)
+        .order_by('run_after', 'created_at')
+    )
+
+
+def requeue_stale_jobs() -> int:
+    """Return jobs abandoned by a crashed worker to the queue (or fail them)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.AI_JOBS_STALE_SECONDS)
+    stale = AIJob.objects.filter(status='running', started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=settings.AI_JOBS_MAX_ATTEMPTS).update(
+        status='failed', error='Worker stopped while running the job', finished_at=timezone.now()
+    )
+    requeued = stale.update(status='queued', worker='', run_after=timezone.now())
+    return failed + requeued
+
+
+def run_job(job: AIJob, llm=None) -> AIJob:
+    """Run a claimed job and record its result, retrying failures with backoff"""
+    handler = JOB_HANDLERS[job.kind]
+    try:
+        result = handler(job, llm or get_llm())
+    except Exception as exc:
+        logger.warning('AI job %s (%s) failed on attempt %s: %s', job.id, job.kind, job.attempts, exc)
+        job.error = str(exc)[:2000]
+        if job.attempts < settings.AI_JOBS_MAX_ATTEMPTS:
+            job.status = 'queued'
+            job.worker = ''
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'succeeded'
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'worker', 'run_after', 'finished_at'])
+    return job
+
+
+def _json(data) -> str:
+    return json.dumps(data, default=str)
+
+
+def _financial_context(job: AIJob) -> Dict[str, Any]:
+    """Financial snapshot of the job's business, as much of it as the job's user may see"""
+    return business_financial_context(job.business_id, financial_scope_user(job.user, job.business_id))
+
+
+@job_handler('health_analysis')
+def analyze_financial_health(job: AIJob, llm) -> Dict[str, Any]:
+    context = _financial_context(job)
+    analysis = parse_json_response(llm.complete(HEALTH_ANALYSIS_TEMPLATE.format(financial_data=_json(context))))
+    return {'context': context, 'analysis': analysis}
+
+
+@job_handler('forecast_narrative')
+def narrate_forecast(job: AIJob, llm) -> Dict[str, Any]:
+    forecast_id = job.payload.get('forecast_id')
+    if forecast_id:
+        forecast = FinancialForecast.objects.get(id=forecast_id, business_id=job.business_id)
+    else:
+        forecast_type = job.payload.get('forecast_type', 'revenue')
+        forecast = (
+            FinancialForecast.objects
+            .filter(business_id=job.business_id, forecast_type=forecast_type)
+            .order_by('-created_at')
+            .first()
+        )
+        if forecast is None:
+            # Statistical forecast first; the LLM only explains it
+            from .forecasting import generate_forecast
+            forecast = generate_forecast(job.business, job.user, forecast_type)
+
+    forecast_data = {key: value for key, value in forecast.forecast_data.items() if key != 'model'}
+    prompt = FORECAST_NARRATIVE_TEMPLATE.format(
+        forecast_type=forecast.forecast_type,
+        forecast=_json(forecast_data),
+        context=_json(_financial_context(job)),
+    )
+    return {'forecast_id': str(forecast.id), 'narrative': parse_json_response(llm.complete(prompt))}
+
+
+@job_handler('chat')
+def answer_question(job: AIJob, llm) -> Dict[str, Any]:
+    context = _financial_context(job)
+    if isinstance(job.payload.get('context'), dict):
+        # The scope keys the response cache, so the client cannot change it
+        context.update({key: value for key, value in job.payload['context'].items() if key != 'scope'})
+    question = job.payload['question']
+
+    def ask():
+        return llm.complete(CHAT_TEMPLATE.format(context=_json(context), question=question)).strip()
+
+    answer, cached = ResponseCache('chat').get_or_compute(job.business_id, question, context, ask)
+    return {'question': question, 'answer': answer, 'cached': cached}
@@ -1,11 +1,13 @@
 # backend/finance/services/ai_services.py
 import os
-import json
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any
 from decimal import Decimal
-from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Transaction, Budget, Invoice, CashFlow, FinancialForecast, CreditScore
+from django.contrib.auth.models import User
+from django.db import transaction
+from ..models import Transaction, Budget, Invoice, CreditScore
+from .automation_service import queue_credit_score_alerts
+from .credit_scoring import CreditScoringEngine, compose_credit_score
+from .forecasting import ForecastEngine, generate_forecast, latest_model_state
 from users.models import Business
 
 
@@ -72,50 +74,15 @@ class AIFinancialAnalyzer:
         }
     
     def generate_revenue_forecast(self, business_id: str, user_id: int, months: int = 6) -> Dict[str, Any]:
-        """Generate AI-powered revenue forecast"""
-        
-        # Get historical data
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=months * 30)
-        
-        transactions = Transaction.objects.filter(
-            business_id=business_id,
-            user_id=user_id,
-            transaction_type='income',
-            transaction_date__gte=start_date
-        ).order_by('transaction_date')
-        
-        # Prepare data for AI analysis
-        historical_data = []
-        for transaction in transactions:
-            historical_data.append({
-                'date': transaction.transaction_date.isoformat(),
-                'amount': float(transaction.amount),
-                'category': transaction.category or 'general'
-            })
-        
-        # Generate forecast using AI
-        forecast_data = self._generate_forecast_data(historical_data, months)
-        
-        # Create forecast record
-        forecast = FinancialForecast.objects.create(
-            business_id=business_id,
-            user_id=user_id,
-            forecast_type='revenue',
-            name=f'Revenue Forecast - {months} months',
-            description='AI-generated revenue forecast based on historical data',
-            forecast_data=forecast_data,
-            confidence_score=85.0,
-            forecast_start=timezone.now().date(),
-            forecast_end=(timezone.now() + timedelta(days=months * 30)).date(),
-            model_version='v1.0',
-            training_data_period=f'{months} months'
-        )
+        """Generate a revenue forecast from the business's monthly history"""
+        business = Business.objects.get(id=business_id)
+        forecast = generate_forecast(business, User.objects.get(id=user_id), 'revenue', months)
+        forecast_data = forecast.forecast_data
         
         return {
             'forecast_id': str(forecast.id),
             'forecast_data': forecast_data,
-            'confidence_score': 85.0,
+            'confidence_score': float(forecast.confidence_score),
             'recommendations': self._generate_forecast_recommendations(forecast_data)
         }
     
@@ -124,51 +91,34 @@ class AIFinancialAnalyzer:
         
         business = Business.objects.get(id=business_id, owner_id=user_id)
         
-        # Get financial data for scoring
-        transactions = Transaction.objects.filter(
-            business_id=business_id,
-            user_id=user_id
-        )
-        
-        invoices = Invoice.objects.filter(
-            business_id=business_id,
-            user_id=user_id
-        )
-        
-        # Calculate scoring factors
-        payment_history = self._calculate_payment_history(transactions, invoices)
-        credit_utilization = self._calculate_credit_utilization(transactions)
-        business_age = self._calculate_business_age(business)
-        revenue_stability = self._calculate_revenue_stability(transactions)
-        debt_to_income = self._calculate_debt_to_income(transactions)
+        # Fetch the history once and compute every factor with NumPy
+        factors = CreditScoringEngine().compute_factors([business.id], user_id=user_id)[business.id]
+        payment_history = factors['payment_history']
+        credit_utilization = factors['credit_utilization']
+        business_age = factors['business_age']
+        revenue_stability = factors['revenue_stability']
+        debt_to_income = factors['debt_to_income']
         
         # Generate AI-enhanced score
-        score_data = self._generate_credit_score({
-            'payment_history': payment_history,
-            'credit_utilization': credit_utilization,
-            'business_age': business_age,
-            'revenue_stability': revenue_stability,
-            'debt_to_income': debt_to_income,
-            'business_type': business.business_model,
-            'employee_count': business.employee_count,
-            'revenue_band': business.revenue_band
-        })
-        
-        # Create credit score record
-        credit_score = CreditScore.objects.create(
-            business_id=business_id,
-            user_id=user_id,
-            score=score_data['score'],
-            payment_history=payment_history,
-            credit_utilization=credit_utilization,
-            business_age=business_age,
-            revenue_stability=revenue_stability,
-            debt_to_income=debt_to_income,
-            factors=score_data['factors'],
-            recommendations=score_data['recommendations'],
-            calculation_method='ai_enhanced',
-            data_sources=['transactions', 'invoices', 'business_profile']
-        )
+        score_data = self._generate_credit_score(factors)
+        
+        # Create credit score record, queueing any alert in the same transaction
+        with transaction.atomic():
+            credit_score = CreditScore.objects.create(
+                business_id=business_id,
+                user_id=user_id,
+                score=score_data['score'],
+                payment_history=payment_history,
+                credit_utilization=credit_utilization,
+                business_age=business_age,
+                revenue_stability=revenue_stability,
+                debt_to_income=debt_to_income,
+                factors=score_data['factors'],
+                recommendations=score_data['recommendations'],
+                calculation_method='ai_enhanced',
+                data_sources=['transactions', 'invoices', 'business_profile']
+            )
+            queue_credit_score_alerts([credit_score])
         
         return {
             'credit_score_id': str(credit_score.id),
@@ -178,6 +128,10 @@ class AIFinancialAnalyzer:
             'recommendations': score_data['recommendations']
         }
     
+    def calculate_credit_scores(self, business_ids: List[int], user_id: int = None) -> Dict[int, Dict[str, Any]]:
+        """Score many businesses in one pass (factors, score, explanations per business id)"""
+        return CreditScoringEngine().score_businesses(business_ids, user_id=user_id)
+    
     def generate_supplier_negotiation_insights(self, business_id: str, user_id: int) -> Dict[str, Any]:
         """Generate AI insights for supplier negotiations"""
         
@@ -314,38 +268,9 @@ class AIFinancialAnalyzer:
         
         return max(0, min(100, score))
     
-    def _generate_forecast_data(self, historical_data: List[Dict], months: int) -> Dict[str, Any]:
-        """Generate forecast data using AI analysis"""
-        # Simplified forecast logic - in production, this would use LangChain + OpenAI
-        if not historical_data:
-            return {
-                'monthly_forecast': [0] * months,
-                'confidence': 50.0,
-                'trend': 'stable'
-            }
-        
-        # Calculate average monthly revenue
-        monthly_totals = {}
-        for item in historical_data:
-            month_key = item['date'][:7]  # YYYY-MM
-            if month_key not in monthly_totals:
-                monthly_totals[month_key] = 0
-            monthly_totals[month_key] += item['amount']
-        
-        avg_monthly = sum(monthly_totals.values()) / len(monthly_totals) if monthly_totals else 0
-        
-        # Generate forecast with slight growth trend
-        forecast = []
-        for i in range(months):
-            growth_factor = 1 + (i * 0.02)  # 2% growth per month
-            forecast.append(avg_monthly * growth_factor)
-        
-        return {
-            'monthly_forecast': forecast,
-            'confidence': 85.0,
-            'trend': 'growing',
-            'growth_rate': 2.0
-        }
+    def _generate_forecast_data(self, business_id: str, months: int, forecast_type: str = 'revenue') -> Dict[str, Any]:
+        """Forecast data from the statistical models (no stored record)"""
+        return ForecastEngine().forecast(business_id, forecast_type, months, latest_model_state(business_id, forecast_type))
     
     def _generate_forecast_recommendations(self, forecast_data: Dict[str, Any]) -> List[str]:
         """Generate recommendations based on forecast"""
@@ -360,131 +285,9 @@ class AIFinancialAnalyzer:
         
         return recommendations
     
-    def _calculate_payment_history(self, transactions, invoices) -> float:
-        """Calculate payment history score"""
-        # Simplified calculation
-        paid_invoices = invoices.filter(status='paid').count()
-        total_invoices = invoices.count()
-        
-        if total_invoices == 0:
-            return 100.0
-        
-        return (paid_invoices / total_invoices) * 100
-    
-    def _calculate_credit_utilization(self, transactions) -> float:
-        """Calculate credit utilization ratio"""
-        # Simplified calculation
-        expenses = transactions.filter(transaction_type='expense')
-        income = transactions.filter(transaction_type='income')
-        
-        total_expenses = sum(t.amount for t in expenses)
-        total_income = sum(t.amount for t in income)
-        
-        if total_income == 0:
-            return 0.0
-        
-        return (total_expenses / total_income) * 100
-    
-    def _calculate_business_age(self, business) -> float:
-        """Calculate business age score"""
-        if not business.year_founded:
-            return 50.0
-        
-        current_year = timezone.now().year
-        age = current_year - business.year_founded
-        
-        if age >= 10:
-            return 100.0
-        elif age >= 5:
-            return 80.0
-        elif age >= 2:
-            return 60.0
-        else:
-            return 40.0
-    
-    def _calculate_revenue_stability(self, transactions) -> float:
-        """Calculate revenue stability score"""
-        income_transactions = transactions.filter(transaction_type='income')
-        
-        if income_transactions.count() < 3:
-            return 50.0
-        
-        # Calculate coefficient of variation
-        amounts = [float(t.amount) for t in income_transactions]
-        mean_amount = sum(amounts) / len(amounts)
-        
-        if mean_amount == 0:
-            return 50.0
-        
-        variance = sum((x - mean_amount) ** 2 for x in amounts) / len(amounts)
-        std_dev = variance ** 0.5
-        cv = std_dev / mean_amount
-        
-        # Convert to score (lower CV = higher score)
-        return max(0, 100 - (cv * 100))
-    
-    def _calculate_debt_to_income(self, transactions) -> float:
-        """Calculate debt-to-income ratio"""
-        expenses = transactions.filter(transaction_type='expense')
-        income = transactions.filter(transaction_type='income')
-        
-        total_expenses = sum(t.amount for t in expenses)
-        total_income = sum(t.amount for t in income)
-        
-        if total_income == 0:
-            return 0.0
-        
-        return (total_expenses / total_income) * 100
-    
     def _generate_credit_score(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate AI-enhanced credit score"""
-        # Weighted scoring
-        weights = {
-            'payment_history': 0.35,
-            'credit_utilization': 0.30,
-            'business_age': 0.15,
-            'revenue_stability': 0.15,
-            'debt_to_income': 0.05
-        }
-        
-        # Calculate weighted score
-        score = 0
-        for factor, weight in weights.items():
-            score += data[factor] * weight
-        
-        # Adjust for business characteristics
-        if data['business_type'] == 'B2B':
-            score += 10
-        elif data['business_type'] == 'B2C':
-            score += 5
-        
-        if data['employee_count'] and data['employee_count'] > 10:
-            score += 5
-        
-        score = max(300, min(850, score))
-        
-        # Generate factors and recommendations
-        factors = {
-            'payment_history': f"Payment history: {data['payment_history']:.1f}%",
-            'credit_utilization': f"Credit utilization: {data['credit_utilization']:.1f}%",
-            'business_age': f"Business age: {data['business_age']:.1f}%",
-            'revenue_stability': f"Revenue stability: {data['revenue_stability']:.1f}%",
-            'debt_to_income': f"Debt-to-income: {data['debt_to_income']:.1f}%"
-        }
-        
-        recommendations = []
-        if data['payment_history'] < 80:
-            recommendations.append("Improve payment history by paying bills on time")
-        if data['credit_utilization'] > 70:
-            recommendations.append("Reduce credit utilization by paying down debts")
-        if data['business_age'] < 60:
-            recommendations.append("Build business credit history over time")
-        
-        return {
-            'score': int(score),
-            'factors': factors,
-            'recommendations': recommendations
-        }
+        return compose_credit_score(data)
     
     def _generate_negotiation_insights(self, supplier_analysis: Dict[str, Any]) -> List[str]:
         """Generate supplier negotiation insights"""
@@ -0,0 +1,104 @@
+# backend/finance/services/automation_runner.py
+"""
+Daily automation across every business.
+
+Runs in two phases, each timed:
+
+- ``collect``: per business, flag overdue invoices with one bulk UPDATE and
+  queue their reminders in the outbox (budget alerts are queued when a
+  transaction crosses the threshold, see finance.services.budgets)
+  (``AUTOMATION_WORKERS`` businesses at a time, each on its own database
+  connection)
+- ``dispatch``: drain those businesses' outbox events as batch webhooks, at
+  most ``N8N_CONCURRENCY`` requests in flight
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from ..models import Invoice
+from .automation_service import AutomationWorkflowManager
+from .outbox import OutboxDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class DailyAutomationRunner:
+    """Fan daily automation out over every business with work due (or the given ones)"""
+
+    def __init__(self, workers: Optional[int] = None, webhook_concurrency: Optional[int] = None):
+        self.workers = max(1, workers or settings.AUTOMATION_WORKERS)
+        self.webhook_concurrency = max(1, webhook_concurrency or settings.N8N_CONCURRENCY)
+        self.manager = AutomationWorkflowManager()
+
+    def _collect(self, business_id: str) -> Dict[str, Any]:
+        try:
+            return self.manager.collect_daily_tasks(business_id)
+        except Exception as exc:
+            logger.exception('Daily automation failed for business %s', business_id)
+            return {'business_id': business_id, 'error': str(exc), 'tasks': [], 'idempotency_keys': []}
+
+    def _collect_in_thread(self, business_id: str) -> Dict[str, Any]:
+        try:
+            return self._collect(business_id)
+        finally:
+            connections.close_all()
+
+    def _map(self, func, items: List, workers: int) -> List:
+        if workers == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='automation') as pool:
+            return list(pool.map(func, items))
+
+    def due_business_ids(self) -> List:
+        """Businesses with a sent invoice past due"""
+        overdue = Invoice.objects.filter(status='sent', due_date__lt=timezone.now().date())
+        return sorted(set(overdue.values_list('business_id', flat=True)))
+
+    def run(self, business_ids: Optional[Iterable] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        if business_ids is None:
+            business_ids = self.due_business_ids()
+        business_ids = [str(business_id) for business_id in business_ids]
+
+        collect = self._collect_in_thread if self.workers > 1 and len(business_ids) > 1 else self._collect
+        collected = self._map(collect, business_ids, self.workers)
+        collected_at = time.monotonic()
+
+        client = self.manager.n8n_service.client
+        if client is not None:
+            delivery = OutboxDispatcher(client, concurrency=self.webhook_concurrency).drain(business_ids)
+        else:
+            delivery = {'webhooks': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        finished = time.monotonic()
+
+        businesses = {}
+        for daily in collected:
+            businesses[daily['business_id']] = {
+                'overdue_invoices': daily.get('overdue_invoices', 0),
+                'events': len(daily['idempotency_keys']),
+            }
+            if 'error' in daily:
+                businesses[daily['business_id']]['error'] = daily['error']
+
+        return {
+            'businesses': len(business_ids),
+            'overdue_invoices': sum(daily.get('overdue_invoices', 0) for daily in collected),
+            'events': sum(len(daily['idempotency_keys']) for daily in collected),
+            'delivered': delivery['sent'],
+            'retrying': delivery['retried'],
+            'dead': delivery['dead'],
+            'failed_businesses': sum(1 for daily in collected if 'error' in daily),
+            'webhooks': delivery['webhooks'],
+            'phases': {
+                'collect': round(collected_at - started, 3),
+                'dispatch': round(finished - collected_at, 3),
+                'total': round(finished - started, 3),
+            },
+            'results': businesses,
+        }
@@ -1,23 +1,28 @@
 # backend/finance/services/automation_service.py
-import os
-import requests
-import json
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
-from .models import Transaction, Invoice, Budget
+from ..cache_utils import bump_business_cache_version, bump_user_cache_version
+from ..models import Invoice, Budget, CreditScore, OutboxEvent
+from users.models import Business
+from .n8n_client import get_n8n_client
+from .outbox import OutboxDispatcher, enqueue
 
 
 class N8NAutomationService:
-    """Service for integrating with n8n automation workflows"""
+    """Service for integrating with n8n automation workflows.
+    
+    Webhooks go through the shared pooled client (see n8n_client), which
+    retries transient failures and fails fast while n8n is down.
+    """
     
     def __init__(self):
-        self.n8n_webhook_url = os.getenv('N8N_WEBHOOK_URL', '')
-        self.n8n_api_key = os.getenv('N8N_API_KEY', '')
+        self.client = get_n8n_client()
     
     def trigger_mpesa_reconciliation(self, business_id: str, user_id: int) -> Dict[str, Any]:
         """Trigger M-Pesa transaction reconciliation workflow"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
@@ -29,16 +34,11 @@ class N8NAutomationService:
                 "action": "reconcile_transactions"
             }
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
-                    "status": "success,
+                    "status": "success",
                     "message": "M-Pesa reconciliation triggered",
                     "workflow_id": response.json().get('workflow_id')
                 }
@@ -50,31 +50,14 @@ class N8NAutomationService:
     
     def send_invoice_reminder(self, invoice_id: str, reminder_type: str = "first") -> Dict[str, Any]:
         """Send automated invoice reminder via WhatsApp/Email"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
             invoice = Invoice.objects.get(id=invoice_id)
+            payload = self.invoice_reminder_payload(invoice, reminder_type)
             
-            payload = {
-                "workflow": "invoice_reminder",
-                "invoice_id": invoice_id,
-                "customer_name": invoice.customer_name,
-                "customer_email": invoice.customer_email,
-                "customer_phone": invoice.customer_phone,
-                "invoice_number": invoice.invoice_number,
-                "total_amount": str(invoice.total_amount),
-                "due_date": invoice.due_date.isoformat(),
-                "reminder_type": reminder_type,
-                "timestamp": timezone.now().isoformat()
-            }
-            
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
@@ -92,7 +75,7 @@ class N8NAutomationService:
     
     def process_etims_integration(self, invoice_id: str) -> Dict[str, Any]:
         """Process eTIMS integration for invoice"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
@@ -112,12 +95,7 @@ class N8NAutomationService:
                 "timestamp": timezone.now().isoformat()
             }
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 result = response.json()
@@ -143,31 +121,14 @@ class N8NAutomationService:
     
     def send_budget_alert(self, budget_id: str, alert_type: str) -> Dict[str, Any]:
         """Send budget alert when threshold is reached"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
             budget = Budget.objects.get(id=budget_id)
+            payload = self.budget_alert_payload(budget, alert_type)
             
-            payload = {
-                "workflow": "budget_alert",
-                "budget_id": budget_id,
-                "business_id": str(budget.business.id),
-                "user_id": budget.user.id,
-                "budget_name": budget.name,
-                "budgeted_amount": str(budget.budgeted_amount),
-                "spent_amount": str(budget.spent_amount),
-                "utilization_percentage": budget.utilization_percentage,
-                "alert_type": alert_type,
-                "timestamp": timezone.now().isoformat()
-            }
-            
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
@@ -185,7 +146,7 @@ class N8NAutomationService:
     
     def trigger_supplier_negotiation_workflow(self, supplier_name: str, business_id: str) -> Dict[str, Any]:
         """Trigger supplier negotiation workflow"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
@@ -197,12 +158,7 @@ class N8NAutomationService:
                 "action": "generate_negotiation_strategy"
             }
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
@@ -218,25 +174,13 @@ class N8NAutomationService:
     
     def send_credit_score_alert(self, business_id: str, credit_score: int) -> Dict[str, Any]:
         """Send credit score improvement alert"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
-            payload = {
-                "workflow": "credit_score_alert",
-                "business_id": business_id,
-                "credit_score": credit_score,
-                "score_category": self._get_score_category(credit_score),
-                "timestamp": timezone.now().isoformat(),
-                "action": "send_improvement_tips"
-            }
+            payload = self.credit_score_alert_payload(business_id, credit_score)
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
@@ -252,7 +196,7 @@ class N8NAutomationService:
     
     def trigger_financial_report_generation(self, business_id: str, report_type: str, period: str) -> Dict[str, Any]:
         """Trigger automated financial report generation"""
-        if not self.n8n_webhook_url:
+        if self.client is None:
             return {"error": "N8N webhook URL not configured"}
         
         try:
@@ -265,12 +209,7 @@ class N8NAutomationService:
                 "action": "generate_report"
             }
             
-            response = requests.post(
-                self.n8n_webhook_url,
-                headers={'Content-Type': 'application/json'},
-                json=payload,
-                timeout=30
-            )
+            response = self.client.post(payload)
             
             if response.status_code == 200:
                 return {
@@ -284,6 +223,50 @@ class N8NAutomationService:
         except Exception as e:
             return {"error": f"Report generation failed: {str(e)}"}
     
+    def send_batch(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send many workflow events in as few webhook calls as possible"""
+        if self.client is None:
+            return [{"error": "N8N webhook URL not configured"} for _ in payloads]
+        return self.client.post_batch(payloads)
+    
+    def invoice_reminder_payload(self, invoice, reminder_type: str) -> Dict[str, Any]:
+        return {
+            "workflow": "invoice_reminder",
+            "invoice_id": str(invoice.id),
+            "customer_name": invoice.customer_name,
+            "customer_email": invoice.customer_email,
+            "customer_phone": invoice.customer_phone,
+            "invoice_number": invoice.invoice_number,
+            "total_amount": str(invoice.total_amount),
+            "due_date": invoice.due_date.isoformat(),
+            "reminder_type": reminder_type,
+            "timestamp": timezone.now().isoformat()
+        }
+    
+    def budget_alert_payload(self, budget, alert_type: str) -> Dict[str, Any]:
+        return {
+            "workflow": "budget_alert",
+            "budget_id": str(budget.id),
+            "business_id": str(budget.business_id),
+            "user_id": budget.user_id,
+            "budget_name": budget.name,
+            "budgeted_amount": str(budget.budgeted_amount),
+            "spent_amount": str(budget.spent_amount),
+            "utilization_percentage": float(budget.utilization_percentage),
+            "alert_type": alert_type,
+            "timestamp": timezone.now().isoformat()
+        }
+    
+    def credit_score_alert_payload(self, business_id: str, credit_score: int) -> Dict[str, Any]:
+        return {
+            "workflow": "credit_score_alert",
+            "business_id": str(business_id),
+            "credit_score": credit_score,
+            "score_category": self._get_score_category(credit_score),
+            "timestamp": timezone.now().isoformat(),
+            "action": "send_improvement_tips"
+        }
+    
     def _get_score_category(self, score: int) -> str:
         """Get credit score category"""
         if score >= 800:
@@ -298,6 +281,34 @@ class N8NAutomationService:
             return "Poor"
 
 
+def queue_credit_score_alerts(scores: List[CreditScore]) -> None:
+    """Queue an alert for each new score whose category differs from the business's previous score.
+    
+    Call inside the transaction that saves the scores.
+    """
+    if not scores:
+        return
+    new_ids = [score.id for score in scores]
+    previous = dict(
+        Business.objects.filter(id__in={score.business_id for score in scores})
+        .annotate(previous_category=Subquery(
+            CreditScore.objects.filter(business_id=OuterRef('pk')).exclude(id__in=new_ids)
+            .order_by('-created_at').values('score_category')[:1]
+        ))
+        .values_list('id', 'previous_category')
+    )
+    service = N8NAutomationService()
+    enqueue(
+        (
+            score.business_id,
+            f"credit_score_alert:{score.id}",
+            service.credit_score_alert_payload(score.business_id, score.score)
+        )
+        for score in scores
+        if CreditScore.categorize(score.score) != previous.get(score.business_id)
+    )
+
+
 class AutomationWorkflowManager:
     """Manager for automation workflows"""
     
@@ -333,42 +344,73 @@ class AutomationWorkflowManager:
             "workflows": workflows
         }
     
+    def collect_daily_tasks(self, business_id: str) -> Dict[str, Any]:
+        """Mark overdue invoices and queue their reminders in the outbox"""
+        tasks = []
+        events = []
+        today = timezone.now().date()
+        
+        with transaction.atomic():
+            # Check for overdue invoices
+            overdue_invoices = list(Invoice.objects.select_for_update().filter(
+                business_id=business_id,
+                status='sent',
+                due_date__lt=today
+            ))
+            
+            if overdue_invoices:
+                # One UPDATE for the whole business instead of a save() per invoice
+                Invoice.objects.filter(id__in=[invoice.id for invoice in overdue_invoices]).update(
+                    status='overdue', updated_at=timezone.now()
+                )
+            
+            for invoice in overdue_invoices:
+                # Queue overdue reminder
+                tasks.append(f"Overdue reminder for {invoice.invoice_number}")
+                events.append((
+                    invoice.business_id,
+                    f"invoice_reminder:overdue:{invoice.id}",
+                    self.n8n_service.invoice_reminder_payload(invoice, "overdue")
+                ))
+            
+            # Budget alerts are queued when a transaction crosses the threshold (see services.budgets)
+            
+            # Committed together with the status change, or not at all
+            enqueue(events)
+        
+        if overdue_invoices:
+            # update() skips the post_save signal that invalidates cached responses
+            bump_business_cache_version(business_id)
+            for user_id in {invoice.user_id for invoice in overdue_invoices}:
+                bump_user_cache_version(user_id)
+        
+        return {
+            "business_id": business_id,
+            "date": today.isoformat(),
+            "overdue_invoices": len(overdue_invoices),
+            "tasks": tasks,
+            "idempotency_keys": [key for _, key, _ in events]
+        }
+    
     def process_daily_automation(self, business_id: str) -> Dict[str, Any]:
         """Process daily automation tasks"""
-        results = []
+        daily = self.collect_daily_tasks(business_id)
         
-        # Check for overdue invoices
-        overdue_invoices = Invoice.objects.filter(
-            business_id=business_id,
-            status='sent',
-            due_date__lt=timezone.now().date()
+        # Deliver this business's queued events now, in as few webhook calls as possible
+        if self.n8n_service.client is not None:
+            OutboxDispatcher(self.n8n_service.client).drain([business_id])
+        outcomes = dict(
+            OutboxEvent.objects.filter(idempotency_key__in=daily["idempotency_keys"])
+            .values_list("idempotency_key", "status")
         )
-        
-        for invoice in overdue_invoices:
-            # Update status to overdue
-            invoice.status = 'overdue'
-            invoice.save()
-            
-            # Send overdue reminder
-            reminder_result = self.n8n_service.send_invoice_reminder(str(invoice.id), "overdue")
-            results.append({
-                "task": f"Overdue reminder for {invoice.invoice_number}",
-                "result": reminder_result
-            })
-        
-        # Check budget thresholds
-        budgets = Budget.objects.filter(business_id=business_id, is_active=True)
-        for budget in budgets:
-            if budget.utilization_percentage >= budget.alert_threshold:
-                alert_result = self.n8n_service.send_budget_alert(str(budget.id), "threshold_reached")
-                results.append({
-                    "task": f"Budget alert for {budget.name}",
-                    "result": alert_result
-                })
+        results = [
+            {"task": task, "result": {"status": "success"} if outcomes.get(key) == "sent" else {"status": "queued"}}
+            for task, key in zip(daily["tasks"], daily["idempotency_keys"])
+        ]
         
         return {
             "business_id": business_id,
-            "date": timezone.now().date().isoformat(),
+            "date": daily["date"],
             "tasks_processed": len(results),
             "results": results
         }
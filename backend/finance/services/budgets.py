@@ -0,0 +1,190 @@
+# backend/finance/services/budgets.py
+"""
+Budget consumption.
+
+``Budget.spent_amount`` is the total of the business's expense transactions
+in the budget's category dated within ``start_date``..``end_date``.
+Pending and completed expenses count; failed and cancelled ones do not.
+
+It is kept current incrementally: each transaction write adds its delta to
+the matching budgets with an F-expression (see finance.signals and the
+importer). A write that takes an active budget across its alert threshold
+queues a budget alert in the outbox in the same transaction, so no daily
+scan of every budget is needed. ``reconcile_budgets`` (and the
+``reconcile_budgets`` command) recompute the totals from scratch, and queue
+the same alert for budgets the correction takes across their threshold.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..cache_utils import bump_business_cache_version, bump_user_cache_version
+from ..models import Budget, Transaction
+from .automation_service import N8NAutomationService
+from .outbox import enqueue
+from .rollups import rollup_day
+
+CONSUMING_STATUSES = ('pending', 'completed')
+
+
+def budget_key(values: Optional[Dict[str, Any]]) -> Optional[Tuple]:
+    """(business_id, category, day) a transaction counts towards, or None if it consumes no budget"""
+    if not values or values.get('transaction_type') != 'expense':
+        return None
+    if values.get('status', 'completed') not in CONSUMING_STATUSES:
+        return None
+    day = rollup_day(values.get('transaction_date'))
+    if day is None or values.get('business_id') is None:
+        return None
+    return values['business_id'], values.get('category') or '', day
+
+
+def _threshold_amount(budget: Budget) -> Decimal:
+    return budget.budgeted_amount * budget.alert_threshold / 100
+
+
+def crosses_threshold(budget: Budget, before: Decimal) -> bool:
+    """Whether spending going from ``before`` to ``budget.spent_amount`` takes an active budget across its threshold"""
+    return budget.is_active and before < _threshold_amount(budget) <= budget.spent_amount
+
+
+def queue_budget_alerts(budgets: List[Budget], source: str) -> None:
+    """Queue a threshold alert for each budget; call inside the transaction that updates them"""
+    if not budgets:
+        return
+    service = N8NAutomationService()
+    enqueue(
+        (
+            budget.business_id,
+            f'budget_alert:threshold_reached:{budget.id}:{source}',
+            service.budget_alert_payload(budget, 'threshold_reached'),
+        )
+        for budget in budgets
+    )
+
+
+def apply_budget_deltas(deltas: Dict[Tuple, Decimal], source: str) -> List[Budget]:
+    """Add ``deltas`` ({(business_id, category, day): amount}) to the budgets they fall in.
+
+    Queues a budget alert for every active budget the change takes across
+    its alert threshold; ``source`` (the transaction or import batch) makes
+    the alert's idempotency key. Returns the budgets that crossed.
+    """
+    by_scope = defaultdict(list)
+    for (business_id, category, day), amount in deltas.items():
+        if amount:
+            by_scope[(business_id, category)].append((day, amount))
+    if not by_scope:
+        return []
+
+    crossed = []
+    with transaction.atomic():
+        for (business_id, category), changes in by_scope.items():
+            days = [day for day, _ in changes]
+            budgets = list(
+                Budget.objects.select_for_update()
+                .filter(business_id=business_id, category=category, start_date__lte=max(days), end_date__gte=min(days))
+            )
+            by_delta = defaultdict(list)
+            for budget in budgets:
+                delta = sum(
+                    (amount for day, amount in changes if budget.start_date <= day <= budget.end_date),
+                    Decimal('0'),
+                )
+                if not delta:
+                    continue
+                by_delta[delta].append(budget.id)
+                before = budget.spent_amount
+                budget.spent_amount = before + delta
+                budget.remaining_amount -= delta
+                if crosses_threshold(budget, before):
+                    crossed.append(budget)
+
+            for delta, ids in by_delta.items():
+                Budget.objects.filter(id__in=ids).update(
+                    spent_amount=F('spent_amount') + delta,
+                    remaining_amount=F('remaining_amount') - delta,
+                    updated_at=timezone.now(),
+                )
+            # update() skips the signals that invalidate cached responses
+            updated = {budget_id for ids in by_delta.values() for budget_id in ids}
+            if updated:
+                bump_business_cache_version(business_id)
+            for user_id in {budget.user_id for budget in budgets if budget.id in updated}:
+                bump_user_cache_version(user_id)
+
+        queue_budget_alerts(crossed, source)
+    return crossed
+
+
+def record_transaction_budget_change(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]],
+                                     source: str) -> List[Budget]:
+    """Apply a transaction moving from previous to current (either may be None) to its budgets"""
+    deltas = defaultdict(Decimal)
+    old_key = budget_key(previous)
+    if old_key:
+        deltas[old_key] -= previous['amount']
+    new_key = budget_key(current)
+    if new_key:
+        deltas[new_key] += current['amount']
+    return apply_budget_deltas(deltas, source)
+
+
+def reconcile_budgets(budgets: Optional[Iterable[Budget]] = None) -> List[Tuple[Budget, Decimal]]:
+    """Recompute spent/remaining amounts from the Transaction table.
+
+    ``budgets`` is a Budget queryset (default: all). Returns (budget, previous
+    spent amount) for every budget that was corrected. Corrections that take
+    a budget across its alert threshold queue its alert.
+    """
+    queryset = Budget.objects.all() if budgets is None else budgets
+    spent = (
+        Transaction.objects
+        .filter(
+            business_id=OuterRef('business_id'),
+            category=OuterRef('category'),
+            transaction_type='expense',
+            status__in=CONSUMING_STATUSES,
+            transaction_date__date__gte=OuterRef('start_date'),
+            transaction_date__date__lte=OuterRef('end_date'),
+        )
+        .order_by()
+        .values('business_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=15, decimal_places=2))
+    queryset = queryset.annotate(computed_spent=Coalesce(Subquery(spent), zero))
+
+    now = timezone.now()
+    corrected = []
+    for budget in queryset.iterator():
+        if budget.spent_amount == budget.computed_spent:
+            continue
+        corrected.append((budget, budget.spent_amount))
+        budget.spent_amount = budget.computed_spent
+        budget.remaining_amount = budget.budgeted_amount - budget.spent_amount
+        budget.updated_at = now
+
+    if corrected:
+        with transaction.atomic():
+            Budget.objects.bulk_update(
+                [budget for budget, _ in corrected],
+                ['spent_amount', 'remaining_amount', 'updated_at'],
+                batch_size=500,
+            )
+            queue_budget_alerts(
+                [budget for budget, before in corrected if crosses_threshold(budget, before)],
+                f'reconcile:{now.isoformat()}',
+            )
+        # bulk_update skips the signals that invalidate cached responses
+        for business_id in {budget.business_id for budget, _ in corrected}:
+            bump_business_cache_version(business_id)
+        for user_id in {budget.user_id for budget, _ in corrected}:
+            bump_user_cache_version(user_id)
+    return corrected
@@ -0,0 +1,194 @@
+# backend/finance/services/cash_flows.py
+"""
+Cash flows materialized from transactions.
+
+For every business, user and week/month the materializer writes three
+CashFlow rows (``source='transactions'``): inflow (completed income),
+outflow (completed expenses) and net. Each granularity is computed with one
+``TruncWeek``/``TruncMonth`` grouped query per business.
+
+Materialization is incremental. ``CashFlowSyncState`` records when a
+business was last materialized; only the periods containing a transaction
+changed since then are recomputed. Changes are found from
+``Transaction.updated_at`` (creates, edits, status changes) and
+``TransactionDailyRollup.updated_at`` (which also catches deletes).
+
+The ``materialize_cash_flows`` command (scheduled every 15 minutes) does
+every business, which keeps the summary's ``cash_flow`` current. The cash
+flow periods endpoint only reads; it materializes its business only when
+``cash_flows_stale`` finds a change since the last sync. Concurrent runs
+for a business are serialized by locking its ``CashFlowSyncState`` row.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.db import transaction
+from django.db.models import DateField, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..cache_utils import bump_business_cache_version, bump_user_cache_version
+from ..models import CashFlow, CashFlowSyncState, Transaction, TransactionDailyRollup
+
+SOURCE = 'transactions'
+TRUNCATIONS = {'week': TruncWeek, 'month': TruncMonth}
+ZERO = Decimal('0')
+
+# Changes are looked for slightly before the last sync, so a transaction that
+# was still uncommitted while the previous run read the table is not missed.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(start: date, granularity: str) -> date:
+    if granularity == 'week':
+        return start + timedelta(days=6)
+    return start.replace(day=calendar.monthrange(start.year, start.month)[1])
+
+
+def _local_midnight(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def changed_days(business_ids: List) -> Dict[object, Set[date]]:
+    """Days with a transaction change since each business was last materialized.
+
+    Businesses never materialized get every day they have transactions on.
+    """
+    synced = dict(
+        CashFlowSyncState.objects.filter(business_id__in=business_ids).values_list('business_id', 'synced_at')
+    )
+    changed = Q()
+    for business_id in business_ids:
+        since = synced.get(business_id)
+        if since is None:
+            changed |= Q(business_id=business_id)
+        else:
+            changed |= Q(business_id=business_id, updated_at__gte=since - SYNC_OVERLAP)
+
+    transactions = (
+        Transaction.objects.filter(changed)
+        .annotate(day=TruncDate('transaction_date'))
+        .values_list('business_id', 'day')
+        .order_by()
+    )
+    rollups = TransactionDailyRollup.objects.filter(changed).values_list('business_id', 'day').order_by()
+
+    days = {business_id: set() for business_id in business_ids}
+    for business_id, day in transactions.union(rollups):
+        days[business_id].add(day)
+    return days
+
+
+def cash_flows_stale(business_id) -> bool:
+    """Whether a transaction of the business changed since it was last materialized.
+
+    Two indexed existence checks. Changes inside the sync overlap of the
+    last run are left to the next scheduled run.
+    """
+    synced_at = CashFlowSyncState.objects.filter(business_id=business_id).values_list('synced_at', flat=True).first()
+    if synced_at is None:
+        return Transaction.objects.filter(business_id=business_id).exists()
+    return (
+        Transaction.objects.filter(business_id=business_id, updated_at__gt=synced_at).exists()
+        # Deletes leave no transaction behind but update the day's rollup
+        or TransactionDailyRollup.objects.filter(business_id=business_id, updated_at__gt=synced_at).exists()
+    )
+
+
+def _period_rows(business_id, granularity: str, periods: Optional[Set[date]]) -> List[CashFlow]:
+    """Inflow/outflow/net rows per user for the given periods (all periods if None)"""
+    completed = Transaction.objects.filter(
+        business_id=business_id, status='completed', transaction_type__in=('income', 'expense')
+    )
+    if periods is not None:
+        completed = completed.filter(
+            transaction_date__gte=_local_midnight(min(periods)),
+            transaction_date__lt=_local_midnight(period_end(max(periods), granularity) + timedelta(days=1)),
+        )
+    grouped = (
+        completed
+        .annotate(period=TRUNCATIONS[granularity]('transaction_date', output_field=DateField()))
+        .values('user_id', 'period')
+        .annotate(
+            inflow=Sum('amount', filter=Q(transaction_type='income')),
+            outflow=Sum('amount', filter=Q(transaction_type='expense')),
+        )
+        .order_by()
+    )
+    if periods is not None:
+        grouped = grouped.filter(period__in=periods)
+
+    rows = []
+    for group in grouped:
+        inflow = group['inflow'] or ZERO
+        outflow = group['outflow'] or ZERO
+        for flow_type, amount in (('inflow', inflow), ('outflow', outflow), ('net', inflow - outflow)):
+            rows.append(CashFlow(
+                business_id=business_id,
+                user_id=group['user_id'],
+                flow_type=flow_type,
+                category='all',
+                amount=amount,
+                period_start=group['period'],
+                period_end=period_end(group['period'], granularity),
+                source=SOURCE,
+                granularity=granularity,
+            ))
+    return rows
+
+
+def materialize_cash_flows(business_ids: Iterable, full: bool = False) -> Dict[str, int]:
+    """Bring the transaction-derived cash flows of the given businesses up to date.
+
+    With ``full`` every period is recomputed, ignoring the sync state.
+    Returns counts of businesses and periods recomputed and rows written.
+    """
+    business_ids = list(business_ids)
+    started = timezone.now()
+    totals = {'businesses': 0, 'periods': 0, 'rows': 0}
+    if not business_ids:
+        return totals
+    days = {business_id: None for business_id in business_ids} if full else changed_days(business_ids)
+
+    for business_id in business_ids:
+        business_days = days[business_id]
+        if business_days is not None and not business_days:
+            continue
+
+        rows = []
+        with transaction.atomic():
+            # Runs for the same business (the scheduled command and a periods
+            # read that found it stale) queue on its sync state row instead of
+            # both deleting and inserting the same periods
+            CashFlowSyncState.objects.get_or_create(business_id=business_id, defaults={'synced_at': started})
+            state = CashFlowSyncState.objects.select_for_update().get(business_id=business_id)
+            existing = CashFlow.objects.filter(business_id=business_id, source=SOURCE)
+            for granularity in TRUNCATIONS:
+                periods = None
+                if business_days is not None:
+                    periods = {period_start(day, granularity) for day in business_days}
+                    totals['periods'] += len(periods)
+                rows.extend(_period_rows(business_id, granularity, periods))
+                stale = existing.filter(granularity=granularity)
+                if periods is not None:
+                    stale = stale.filter(period_start__in=periods)
+                stale.delete()
+            CashFlow.objects.bulk_create(rows)
+            state.synced_at = started
+            state.save(update_fields=['synced_at'])
+
+        # bulk_create() skips the signals that invalidate cached responses
+        bump_business_cache_version(business_id)
+        for user_id in {row.user_id for row in rows}:
+            bump_user_cache_version(user_id)
+        totals['businesses'] += 1
+        totals['rows'] += len(rows)
+    return totals
@@ -0,0 +1,87 @@
+# backend/finance/services/chat_memory.py
+"""
+Bounded per-session conversation memory.
+
+Replaces a ``ConversationBufferMemory`` per chatbot instance (which grows
+with every turn and lives as long as the instance) with one process-wide
+store: at most ``max_sessions`` sessions (least recently used evicted),
+``max_turns`` turns per session, and sessions idle for ``ttl`` seconds
+dropped.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+
+class ConversationMemoryStore:
+    """Thread-safe LRU of recent (question, answer) turns keyed by session ID"""
+
+    def __init__(self, max_sessions: int = 1000, max_turns: int = 10, ttl: float = 3600):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Tuple[float, deque]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def history(self, session_id: Optional[str]) -> List[Tuple[str, str]]:
+        """Recent turns for a session, oldest first"""
+        if not session_id:
+            return []
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            touched, turns = entry
+            if time.monotonic() - touched > self.ttl:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(turns)
+
+    def append(self, session_id: Optional[str], question: str, answer: str) -> None:
+        if not session_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            turns = entry[1] if entry and now - entry[0] <= self.ttl else deque(maxlen=self.max_turns)
+            turns.append((question, answer))
+            self._sessions[session_id] = (now, turns)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_memory_store() -> ConversationMemoryStore:
+    """The process-wide conversation memory"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationMemoryStore(
+                    max_sessions=settings.AI_CHAT_MEMORY_SESSIONS,
+                    max_turns=settings.AI_CHAT_MEMORY_TURNS,
+                    ttl=settings.AI_CHAT_MEMORY_TTL,
+                )
+    return _store
+
+
+def format_history(turns: List[Tuple[str, str]]) -> List[dict]:
+    """Turns as JSON-friendly dicts for prompt context"""
+    return [{'question': question, 'answer': answer} for question, answer in turns]
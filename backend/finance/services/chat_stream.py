@@ -0,0 +1,121 @@
+# backend/finance/services/chat_stream.py
+"""
+Streaming chat answers as server-sent events.
+
+``ChatStream`` does the database work (business context, cache lookup)
+up front, then streams the answer token by token. Events:
+
+- ``start``: ``{"cached": "exact" | "fuzzy" | null}``, sent immediately
+- ``token``: ``{"text": "..."}``, one per token (a cached answer is one token)
+- ``done``: ``{"answer": "...", "first_token_ms": ..., "total_ms": ...}``
+- ``error``: ``{"error": "..."}``, instead of ``done`` if the LLM fails
+
+``events()`` is a plain generator for WSGI; ``aevents()`` is an async
+generator for ASGI, where streams wait on the LLM without holding a thread.
+"""
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+
+from .chat_memory import format_history, get_memory_store
+from .llm import get_llm
+from .prompts import CHAT_TEMPLATE
+from .response_cache import ResponseCache
+from .summary import business_financial_context, financial_scope_user
+
+logger = logging.getLogger(__name__)
+
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    """One server-sent event"""
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+class ChatStream:
+    """One streamed answer to a chat question about a business"""
+
+    def __init__(self, business_id, user, question: str, session_id: Optional[str] = None,
+                 context: Optional[Dict[str, Any]] = None, llm=None):
+        self.business_id = business_id
+        self.question = question
+        self.session_id = session_id
+        self.llm = llm or get_llm('chat')
+        self.memory = get_memory_store()
+        self.response_cache = ResponseCache('chat')
+
+        # Staff only see their own figures
+        self.context = business_financial_context(business_id, financial_scope_user(user, business_id))
+        # The scope keys the response cache, so the client cannot change it
+        self.context.update({key: value for key, value in (context or {}).items() if key != 'scope'})
+        self.history = self.memory.history(session_id)
+        self.cached, self.hit = None, None
+        if self.history:
+            self.context['recent_conversation'] = format_history(self.history)
+        else:
+            self.cached, self.hit = self.response_cache.lookup(business_id, question, self.context)
+        self.prompt = CHAT_TEMPLATE.format(context=json.dumps(self.context, default=str), question=question)
+
+    def _finish(self, answer: str) -> None:
+        if not self.history and self.hit is None:
+            self.response_cache.store(self.business_id, self.question, self.context, answer)
+        self.memory.append(self.session_id, self.question, answer)
+
+    def _done(self, answer: str, started: float, first_token: Optional[float]) -> str:
+        now = time.monotonic()
+        return sse('done', {
+            'answer': answer,
+            'first_token_ms': round(((first_token or now) - started) * 1000, 1),
+            'total_ms': round((now - started) * 1000, 1),
+        })
+
+    def events(self) -> Iterator[str]:
+        started, first_token = time.monotonic(), None
+        yield sse('start', {'cached': self.hit})
+        if self.cached is not None:
+            self.memory.append(self.session_id, self.question, self.cached)
+            yield sse('token', {'text': self.cached})
+            yield self._done(self.cached, started, started)
+            return
+
+        parts = []
+        try:
+            for token in self.llm.stream(self.prompt):
+                if first_token is None:
+                    first_token = time.monotonic()
+                parts.append(token)
+                yield sse('token', {'text': token})
+        except Exception as exc:
+            logger.warning('Chat stream for business %s failed: %s', self.business_id, exc)
+            yield sse('error', {'error': str(exc)})
+            return
+        answer = ''.join(parts).strip()
+        self._finish(answer)
+        yield self._done(answer, started, first_token)
+
+    async def aevents(self) -> AsyncIterator[str]:
+        started, first_token = time.monotonic(), None
+        yield sse('start', {'cached': self.hit})
+        if self.cached is not None:
+            self.memory.append(self.session_id, self.question, self.cached)
+            yield sse('token', {'text': self.cached})
+            yield self._done(self.cached, started, started)
+            return
+
+        parts = []
+        try:
+            async for token in self.llm.astream(self.prompt):
+                if first_token is None:
+                    first_token = time.monotonic()
+                parts.append(token)
+                yield sse('token', {'text': token})
+        except Exception as exc:
+            logger.warning('Chat stream for business %s failed: %s', self.business_id, exc)
+            yield sse('error', {'error': str(exc)})
+            return
+        answer = ''.join(parts).strip()
+        # The response cache may be database-backed
+        await sync_to_async(self._finish)(answer)
+        yield self._done(answer, started, first_token)
@@ -0,0 +1,124 @@
+# backend/finance/services/customer_balances.py
+"""
+Customer balances.
+
+``Customer.total_invoiced`` is the total of the customer's issued invoices
+(sent, overdue or paid) and ``Customer.total_paid`` the total of the paid
+ones. Invoice saves and deletes (finance.signals) add their delta to the
+customer with F-expressions, so top-customer queries read the columns
+instead of aggregating invoices. ``recompute_customer_balances`` (and the
+``recompute_customer_balances`` command) rebuild them from scratch.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.models import Customer
+from ..cache_utils import bump_business_cache_version
+from ..models import Invoice
+
+BILLED_STATUSES = ('sent', 'overdue', 'paid')
+
+ZERO = Decimal('0')
+
+
+def invoice_values(instance: Invoice) -> Dict[str, Any]:
+    """Snapshot of the invoice fields that feed the customer's balance"""
+    return {
+        'customer_id': instance.customer_id,
+        'status': instance.status,
+        'total_amount': Decimal(str(instance.total_amount)),
+    }
+
+
+def balance_amounts(values: Optional[Dict[str, Any]]) -> Tuple[Decimal, Decimal]:
+    """(invoiced, paid) an invoice adds to its customer"""
+    if not values or values.get('status') not in BILLED_STATUSES:
+        return ZERO, ZERO
+    amount = values['total_amount']
+    return amount, amount if values['status'] == 'paid' else ZERO
+
+
+def record_invoice_balance_change(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]]) -> None:
+    """Apply an invoice moving from previous to current (either may be None) to its customers"""
+    deltas = defaultdict(lambda: [ZERO, ZERO])
+    for values, sign in ((previous, -1), (current, 1)):
+        if values and values.get('customer_id'):
+            invoiced, paid = balance_amounts(values)
+            deltas[values['customer_id']][0] += sign * invoiced
+            deltas[values['customer_id']][1] += sign * paid
+
+    for customer_id, (invoiced, paid) in deltas.items():
+        if invoiced or paid:
+            Customer.objects.filter(pk=customer_id).update(
+                total_invoiced=F('total_invoiced') + invoiced,
+                total_paid=F('total_paid') + paid,
+                updated_at=timezone.now(),
+            )
+
+
+def customer_for_email(business_id, email: str) -> Optional[Customer]:
+    """The business's customer with this email, if any"""
+    if not email:
+        return None
+    return Customer.objects.filter(business_id=business_id, email__iexact=email).order_by('id').first()
+
+
+def link_invoices_to_customers(business_ids: Optional[Iterable] = None) -> int:
+    """Set the customer of unlinked invoices whose customer_email matches one of the business's customers"""
+    unlinked = Invoice.objects.filter(customer__isnull=True).exclude(customer_email='')
+    if business_ids is not None:
+        unlinked = unlinked.filter(business_id__in=list(business_ids))
+    match = Customer.objects.filter(
+        business_id=OuterRef('business_id'), email__iexact=OuterRef('customer_email')
+    ).order_by('id').values('id')[:1]
+    unlinked = unlinked.annotate(match=Subquery(match)).filter(match__isnull=False)
+    return Invoice.objects.filter(pk__in=unlinked.values('pk')).update(customer=Subquery(match))
+
+
+def recompute_customer_balances(customers=None) -> List[Tuple[Customer, Decimal, Decimal]]:
+    """Recompute total_invoiced/total_paid from the Invoice table.
+
+    ``customers`` is a Customer queryset (default: all). Returns (customer,
+    previous total_invoiced, previous total_paid) for every corrected customer.
+    """
+    queryset = Customer.objects.all() if customers is None else customers
+    zero = Value(ZERO, output_field=DecimalField(max_digits=15, decimal_places=2))
+    totals = (
+        Invoice.objects
+        .filter(customer=OuterRef('pk'), status__in=BILLED_STATUSES)
+        .order_by()
+        .values('customer')
+    )
+    queryset = queryset.annotate(
+        computed_invoiced=Coalesce(Subquery(totals.annotate(total=Sum('total_amount')).values('total')), zero),
+        computed_paid=Coalesce(
+            Subquery(totals.annotate(total=Sum('total_amount', filter=Q(status='paid'))).values('total')), zero
+        ),
+    )
+
+    corrected = []
+    for customer in queryset.iterator():
+        if (customer.total_invoiced, customer.total_paid) == (customer.computed_invoiced, customer.computed_paid):
+            continue
+        corrected.append((customer, customer.total_invoiced, customer.total_paid))
+        customer.total_invoiced = customer.computed_invoiced
+        customer.total_paid = customer.computed_paid
+        customer.updated_at = timezone.now()
+
+    if corrected:
+        with transaction.atomic():
+            Customer.objects.bulk_update(
+                [customer for customer, _, _ in corrected],
+                ['total_invoiced', 'total_paid', 'updated_at'],
+                batch_size=500,
+            )
+        # bulk_update skips the signals that invalidate cached responses
+        for business_id in {customer.business_id for customer, _, _ in corrected}:
+            bump_business_cache_version(business_id)
+    return corrected
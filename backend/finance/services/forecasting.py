@@ -0,0 +1,341 @@
+# backend/finance/services/forecasting.py
+"""
+Statistical revenue/expense forecasting.
+
+Monthly income and expense totals for a business come from the daily
+rollups in one grouped query. Three small models are fitted with NumPy
+(simple exponential smoothing, seasonal naive and a linear trend), the one
+with the lowest holdout error is used, and its fitted state is stored in
+``FinancialForecast.forecast_data['model']``. When the next forecast only
+adds new months to an unchanged history, that state is rolled forward
+instead of being refitted from scratch.
+"""
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from ..models import FinancialForecast, TransactionDailyRollup
+
+ENGINE_VERSION = 'stats-v1'
+DEFAULT_HORIZON = 6
+MAX_HORIZON = 24
+SEASON_LENGTH = 12
+MAX_HOLDOUT = 3
+# Refit from scratch after this many incremental updates
+REFIT_EVERY = 6
+SMOOTHING_ALPHAS = np.linspace(0.05, 0.95, 19)
+NEUTRAL_CONFIDENCE = 50.0
+# Forecast change (%) versus recent actuals that counts as a trend
+TREND_THRESHOLD = 2.0
+
+# Which monthly series each forecast type is fitted on
+FORECAST_SERIES = {
+    'revenue': 'income',
+    'expense': 'expense',
+    'cash_flow': 'net',
+    'profit_loss': 'net',
+}
+
+METHODS = ('exponential_smoothing', 'seasonal_naive', 'linear_trend')
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_label(value: date) -> str:
+    return value.strftime('%Y-%m')
+
+
+def series_checksum(values: np.ndarray) -> str:
+    """Fingerprint of a series, used to detect edits to already-fitted months"""
+    payload = json.dumps([round(float(v), 2) for v in values])
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+# Model fitting. Each fit returns (params, in-sample residuals) and params
+# can be rolled forward with update() and projected with predict().
+
+def fit_exponential_smoothing(y: np.ndarray) -> Tuple[Dict[str, float], np.ndarray]:
+    """Simple exponential smoothing, alpha chosen by one-step-ahead SSE over a grid"""
+    alphas = SMOOTHING_ALPHAS
+    level = np.full(alphas.shape, y[0])
+    errors = np.zeros((len(y) - 1, len(alphas)))
+    for t, value in enumerate(y[1:]):
+        errors[t] = value - level
+        level = level + alphas * errors[t]
+    best = int(np.argmin((errors ** 2).sum(axis=0))) if len(y) > 1 else len(alphas) // 2
+    return {'alpha': float(alphas[best]), 'level': float(level[best])}, errors[:, best]
+
+
+def fit_seasonal_naive(y: np.ndarray) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Repeat the last full season"""
+    season = y[-SEASON_LENGTH:]
+    return {'season': [float(v) for v in season]}, y[SEASON_LENGTH:] - y[:-SEASON_LENGTH]
+
+
+def fit_linear_trend(y: np.ndarray) -> Tuple[Dict[str, float], np.ndarray]:
+    """Least-squares line, kept as sufficient statistics so new months are cheap to add"""
+    x = np.arange(len(y), dtype=float)
+    params = {
+        'n': float(len(y)), 'sx': float(x.sum()), 'sy': float(y.sum()),
+        'sxx': float((x * x).sum()), 'sxy': float((x * y).sum()),
+    }
+    slope, intercept = _line(params)
+    return params, y - (intercept + slope * x)
+
+
+def _line(params: Dict[str, float]) -> Tuple[float, float]:
+    n = params['n']
+    denominator = n * params['sxx'] - params['sx'] ** 2
+    slope = (n * params['sxy'] - params['sx'] * params['sy']) / denominator if denominator else 0.0
+    intercept = (params['sy'] - slope * params['sx']) / n if n else 0.0
+    return slope, intercept
+
+
+FITTERS = {
+    'exponential_smoothing': fit_exponential_smoothing,
+    'seasonal_naive': fit_seasonal_naive,
+    'linear_trend': fit_linear_trend,
+}
+
+
+def min_history(method: str) -> int:
+    if method == 'seasonal_naive':
+        return SEASON_LENGTH + 1
+    if method == 'linear_trend':
+        return 3
+    return 1
+
+
+def update(method: str, params: Dict[str, Any], new_values: np.ndarray) -> Dict[str, Any]:
+    """Roll fitted params forward over months observed since the fit"""
+    params = dict(params)
+    if method == 'exponential_smoothing':
+        level = params['level']
+        for value in new_values:
+            level += params['alpha'] * (value - level)
+        params['level'] = float(level)
+    elif method == 'seasonal_naive':
+        params['season'] = (params['season'] + [float(v) for v in new_values])[-SEASON_LENGTH:]
+    elif method == 'linear_trend':
+        x = params['n'] + np.arange(len(new_values), dtype=float)
+        params['n'] += len(new_values)
+        params['sx'] += float(x.sum())
+        params['sy'] += float(new_values.sum())
+        params['sxx'] += float((x * x).sum())
+        params['sxy'] += float((x * new_values).sum())
+    return params
+
+
+def predict(method: str, params: Dict[str, Any], horizon: int) -> np.ndarray:
+    if method == 'exponential_smoothing':
+        return np.full(horizon, params['level'])
+    if method == 'seasonal_naive':
+        season = np.asarray(params['season'])
+        return np.resize(season, horizon)
+    slope, intercept = _line(params)
+    return intercept + slope * (params['n'] + np.arange(horizon))
+
+
+def fit_series(y: np.ndarray) -> Dict[str, Any]:
+    """Fit every applicable model and pick the one with the lowest holdout error"""
+    methods = [method for method in METHODS if len(y) >= min_history(method)]
+    holdout = min(MAX_HOLDOUT, len(y) // 4)
+    errors = {}
+    if holdout:
+        train, test = y[:-holdout], y[-holdout:]
+        for method in methods:
+            if len(train) >= min_history(method):
+                params, _ = FITTERS[method](train)
+                errors[method] = float(np.abs(predict(method, params, holdout) - test).sum())
+    if errors:
+        method = min(errors, key=errors.get)
+        scale = float(np.abs(y[-holdout:]).sum())
+        # Weighted absolute percentage error on the holdout months
+        confidence = 100.0 - 100.0 * errors[method] / scale if scale else NEUTRAL_CONFIDENCE
+    else:
+        method = 'linear_trend' if 'linear_trend' in methods else 'exponential_smoothing'
+        confidence = NEUTRAL_CONFIDENCE
+
+    params, residuals = FITTERS[method](y)
+    return {
+        'method': method,
+        'params': params,
+        'residual_std': float(np.std(residuals)) if len(residuals) else 0.0,
+        'confidence': round(max(0.0, min(100.0, confidence)), 2),
+        'holdout_errors': {name: round(value, 2) for name, value in errors.items()},
+    }
+
+
+class ForecastEngine:
+    """Fits and projects monthly series for one business at a time"""
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        # Only complete months are used for fitting
+        today = timezone.localdate(self.now) if timezone.is_aware(self.now) else self.now.date()
+        self.current_month = month_start(today)
+
+    def monthly_series(self, business_id) -> Tuple[List[date], Dict[str, np.ndarray]]:
+        """Income, expense and net totals for every complete month, in one grouped query"""
+        rows = (
+            TransactionDailyRollup.objects
+            .filter(business_id=business_id, day__lt=self.current_month, transaction_count__gt=0)
+            .annotate(month=TruncMonth('day'))
+            .values('month')
+            .annotate(
+                income=Sum('total_amount', filter=Q(transaction_type='income')),
+                expense=Sum('total_amount', filter=Q(transaction_type='expense')),
+            )
+            .order_by('month')
+        )
+        rows = list(rows)
+        if not rows:
+            return [], {name: np.zeros(0) for name in ('income', 'expense', 'net')}
+
+        first = month_start(rows[0]['month'])
+        months = []
+        cursor = first
+        while cursor < self.current_month:
+            months.append(cursor)
+            cursor = add_months(cursor, 1)
+
+        income = np.zeros(len(months))
+        expense = np.zeros(len(months))
+        for row in rows:
+            month = month_start(row['month'])
+            index = (month.year - first.year) * 12 + month.month - first.month
+            income[index] = float(row['income'] or 0)
+            expense[index] = float(row['expense'] or 0)
+        return months, {'income': income, 'expense': expense, 'net': income - expense}
+
+    def fit(self, months: List[date], y: np.ndarray, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Model state for a series, rolled forward from previous state when possible"""
+        state = self._roll_forward(months, y, previous) if previous else None
+        if state is None:
+            state = fit_series(y)
+            state['updates_since_fit'] = 0
+        state.update({
+            'version': ENGINE_VERSION,
+            'first_month': month_label(months[0]),
+            'last_month': month_label(months[-1]),
+            'months': len(y),
+            'checksum': series_checksum(y),
+        })
+        return state
+
+    def _roll_forward(self, months, y, previous) -> Optional[Dict[str, Any]]:
+        if previous.get('version') != ENGINE_VERSION or previous.get('first_month') != month_label(months[0]):
+            return None
+        fitted = previous.get('months', 0)
+        if not 0 < fitted <= len(y) or series_checksum(y[:fitted]) != previous.get('checksum'):
+            return None
+        new_values = y[fitted:]
+        if previous.get('updates_since_fit', 0) + len(new_values) > REFIT_EVERY:
+            return None
+
+        state = {key: previous[key] for key in ('method', 'params', 'residual_std', 'confidence', 'holdout_errors')}
+        if len(new_values):
+            state['params'] = update(state['method'], state['params'], new_values)
+        state['updates_since_fit'] = previous.get('updates_since_fit', 0) + len(new_values)
+        return state
+
+    def forecast(self, business_id, forecast_type: str = 'revenue', horizon: int = DEFAULT_HORIZON,
+                 previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Forecast data for a business, reusing a previous forecast's model state"""
+        horizon = max(1, min(int(horizon), MAX_HORIZON))
+        months, series = self.monthly_series(business_id)
+        y = series[FORECAST_SERIES.get(forecast_type, 'income')]
+        periods = [month_label(add_months(self.current_month, i)) for i in range(horizon)]
+
+        if not len(y):
+            return {
+                'periods': periods,
+                'monthly_forecast': [0.0] * horizon,
+                'lower': [0.0] * horizon,
+                'upper': [0.0] * horizon,
+                'confidence': NEUTRAL_CONFIDENCE,
+                'trend': 'stable',
+                'growth_rate': 0.0,
+                'method': None,
+                'history_months': 0,
+                'model': None,
+            }
+
+        state = self.fit(months, y, previous)
+        values = predict(state['method'], state['params'], horizon)
+        spread = 1.96 * state['residual_std'] * np.sqrt(np.arange(1, horizon + 1))
+        lower, upper = values - spread, values + spread
+        if forecast_type in ('revenue', 'expense'):
+            values, lower = np.clip(values, 0, None), np.clip(lower, 0, None)
+
+        recent = float(y[-3:].mean())
+        growth_rate = (float(values.mean()) / recent - 1) * 100 if recent > 0 else 0.0
+        if growth_rate > TREND_THRESHOLD:
+            trend = 'growing'
+        elif growth_rate < -TREND_THRESHOLD:
+            trend = 'declining'
+        else:
+            trend = 'stable'
+
+        return {
+            'periods': periods,
+            'monthly_forecast': [round(float(v), 2) for v in values],
+            'lower': [round(float(v), 2) for v in lower],
+            'upper': [round(float(v), 2) for v in upper],
+            'confidence': state['confidence'],
+            'trend': trend,
+            'growth_rate': round(growth_rate, 2),
+            'method': state['method'],
+            'history_months': len(y),
+            'model': state,
+        }
+
+
+def latest_model_state(business_id, forecast_type: str) -> Optional[Dict[str, Any]]:
+    """Fitted model state from the business's most recent forecast of this type"""
+    data = (
+        FinancialForecast.objects
+        .filter(business_id=business_id, forecast_type=forecast_type, model_version=ENGINE_VERSION)
+        .order_by('-created_at')
+        .values_list('forecast_data', flat=True)
+        .first()
+    )
+    return (data or {}).get('model')
+
+
+def generate_forecast(business, user, forecast_type: str = 'revenue',
+                      horizon: int = DEFAULT_HORIZON, now=None) -> FinancialForecast:
+    """Fit (or roll forward) a forecast for a business and store it"""
+    engine = ForecastEngine(now)
+    forecast_data = engine.forecast(business.id, forecast_type, horizon, latest_model_state(business.id, forecast_type))
+    horizon = len(forecast_data['periods'])
+    label = dict(FinancialForecast.FORECAST_TYPES).get(forecast_type, forecast_type.title())
+    history = forecast_data['history_months']
+
+    return FinancialForecast.objects.create(
+        business=business,
+        user=user,
+        forecast_type=forecast_type,
+        name=f'{label} - {horizon} months',
+        description=f"{label} from {history} months of history ({forecast_data['method'] or 'no data'})",
+        forecast_data=forecast_data,
+        confidence_score=forecast_data['confidence'],
+        forecast_start=engine.current_month,
+        forecast_end=add_months(engine.current_month, horizon) - timedelta(days=1),
+        model_version=ENGINE_VERSION,
+        training_data_period=f'{history} months',
+        accuracy_score=forecast_data['confidence'] if forecast_data['model'] and forecast_data['model']['holdout_errors'] else None,
+    )
@@ -0,0 +1,268 @@
+# backend/finance/services/imports.py
+"""
+Bulk transaction import.
+
+Rows are stream-parsed from CSV or JSON-lines, validated one chunk at a
+time, and written with ``bulk_create``. ``bulk_create`` bypasses model
+signals, so the importer applies the daily rollup and budget deltas itself
+(one update per rollup row and per budget per batch) and bumps the cache
+versions once at the end.
+
+Each chunk commits on its own, so a file that turns out to be unreadable
+partway (bad encoding, malformed CSV) keeps the rows before the fault: the
+rows read so far are imported and the fault is reported in ``file_error``
+alongside the ``created`` count.
+"""
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.db import transaction
+from rest_framework import serializers
+
+from ..cache_utils import bump_business_cache_version, bump_user_cache_version
+from ..models import Transaction
+from .budgets import apply_budget_deltas, budget_key
+from .rollups import apply_rollup_delta, rollup_key
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+SUPPORTED_FORMATS = ('csv', 'jsonl')
+
+
+class TransactionImportSerializer(serializers.ModelSerializer):
+    """Validates a single imported row (no related lookups)"""
+
+    class Meta:
+        model = Transaction
+        fields = [
+            'amount', 'currency', 'transaction_type', 'payment_method', 'status',
+            'description', 'reference_number', 'external_id', 'category', 'subcategory',
+            'tags', 'supplier', 'customer', 'transaction_date'
+        ]
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(normalize_row(data))
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be greater than 0")
+        return value
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Clean up spreadsheet-style values before validation"""
+    row = {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+    for key, value in row.items():
+        if isinstance(value, str):
+            row[key] = value.strip()
+
+    amount = row.get('amount')
+    if isinstance(amount, str):
+        row['amount'] = amount.replace(',', '')
+
+    # Date-only values (common in bank statements) mean midnight
+    date = row.get('transaction_date')
+    if isinstance(date, str) and len(date) == 10:
+        row['transaction_date'] = f"{date}T00:00:00"
+
+    tags = row.get('tags')
+    if isinstance(tags, str):
+        row['tags'] = [tag.strip() for tag in tags.replace(';', ',').split(',') if tag.strip()]
+
+    for key in ('transaction_type', 'payment_method', 'status'):
+        if isinstance(row.get(key), str):
+            row[key] = row[key].lower()
+    return row
+
+
+def iter_rows(stream, file_format: str) -> Iterator[Dict[str, Any]]:
+    """Yield dict rows from a binary or text stream without loading it whole"""
+    if file_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}'. Use one of: {', '.join(SUPPORTED_FORMATS)}")
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = {'__error__': f"Invalid JSON: {exc}"}
+        if not isinstance(row, dict):
+            row = {'__error__': 'Each line must be a JSON object'}
+        yield row
+
+
+def detect_format(filename: str, default: str = 'csv') -> str:
+    """Guess the import format from a file name"""
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    skipped_duplicates: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    error_count: int = 0
+    # Why reading the file stopped early; rows before it were imported
+    file_error: str = ''
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def add_error(self, row_number: int, errors: Any) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'skipped_duplicates': self.skipped_duplicates,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+            'file_error': self.file_error,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+class TransactionImporter:
+    """Import transactions for one business, owned by one user"""
+
+    def __init__(self, business, user, batch_size: int = DEFAULT_BATCH_SIZE, skip_duplicates: bool = True):
+        self.business = business
+        self.user = user
+        self.batch_size = max(1, int(batch_size))
+        self.skip_duplicates = skip_duplicates
+        self._serializer = TransactionImportSerializer()
+        self._seen_external_ids = set()
+
+    def run(self, rows: Iterable[Dict[str, Any]]) -> ImportResult:
+        result = ImportResult()
+        started = time.monotonic()
+        numbered = enumerate(rows, start=1)
+        try:
+            try:
+                while True:
+                    chunk = []
+                    # Appending row by row keeps the rows read before a fault
+                    chunk.extend(islice(numbered, self.batch_size))
+                    if not chunk:
+                        break
+                    self._import_chunk(chunk, result)
+            except (UnicodeDecodeError, csv.Error) as exc:
+                if isinstance(exc, UnicodeDecodeError):
+                    reason = 'File must be UTF-8 encoded'
+                else:
+                    reason = f'Malformed CSV file: {exc}'
+                result.file_error = f'{reason} (stopped after row {result.rows + len(chunk)})'
+                if chunk:
+                    self._import_chunk(chunk, result)
+        finally:
+            if result.created:
+                # One invalidation for the whole import
+                bump_business_cache_version(self.business.id)
+                bump_user_cache_version(self.user.id)
+            result.elapsed = time.monotonic() - started
+        return result
+
+    def _validate(self, chunk: List[Tuple[int, Dict[str, Any]]], result: ImportResult) -> List[Tuple[int, Dict[str, Any]]]:
+        valid = []
+        for row_number, row in chunk:
+            if '__error__' in row:
+                result.add_error(row_number, {'non_field_errors': [row['__error__']]})
+                continue
+            try:
+                valid.append((row_number, self._serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                result.add_error(row_number, exc.detail)
+        return valid
+
+    def _drop_duplicates(self, valid, result):
+        """Skip rows whose external_id was already imported for this business"""
+        external_ids = {data['external_id'] for _, data in valid if data.get('external_id')}
+        if not external_ids:
+            return valid
+        existing = set(
+            Transaction.objects.filter(business=self.business, external_id__in=external_ids)
+            .values_list('external_id', flat=True)
+        )
+        kept = []
+        for row_number, data in valid:
+            external_id = data.get('external_id')
+            if external_id and (external_id in existing or external_id in self._seen_external_ids):
+                result.skipped_duplicates += 1
+                continue
+            if external_id:
+                self._seen_external_ids.add(external_id)
+            kept.append((row_number, data))
+        return kept
+
+    def _import_chunk(self, chunk, result: ImportResult) -> None:
+        result.rows += len(chunk)
+        valid = self._validate(chunk, result)
+        if self.skip_duplicates:
+            valid = self._drop_duplicates(valid, result)
+        if not valid:
+            return
+
+        objects = [
+            Transaction(business=self.business, user=self.user, **data)
+            for _, data in valid
+        ]
+        deltas: Dict[tuple, List[Any]] = {}
+        budget_deltas: Dict[tuple, Decimal] = defaultdict(Decimal)
+        for obj in objects:
+            values = {
+                'business_id': self.business.id,
+                'user_id': self.user.id,
+                'transaction_type': obj.transaction_type,
+                'category': obj.category,
+                'payment_method': obj.payment_method,
+                'transaction_date': obj.transaction_date,
+                'status': obj.status,
+            }
+            delta = deltas.setdefault(rollup_key(values), [0, Decimal('0')])
+            delta[0] += 1
+            delta[1] += obj.amount
+            key = budget_key(values)
+            if key:
+                budget_deltas[key] += obj.amount
+
+        with transaction.atomic():
+            Transaction.objects.bulk_create(objects, batch_size=self.batch_size)
+            for key, (count, amount) in deltas.items():
+                apply_rollup_delta(key, count, amount)
+            apply_budget_deltas(budget_deltas, f'import:{objects[0].id}')
+        result.created += len(objects)
+
+
+def import_transactions(stream, file_format: str, business, user,
+                        batch_size: int = DEFAULT_BATCH_SIZE, skip_duplicates: bool = True) -> ImportResult:
+    """Stream-parse and import transactions from a CSV or JSON-lines file"""
+    importer = TransactionImporter(business, user, batch_size=batch_size, skip_duplicates=skip_duplicates)
+    return importer.run(iter_rows(stream, file_format))
@@ -0,0 +1,189 @@
+# backend/finance/services/invoice_documents.py
+"""
+Rendered invoice documents (HTML and PDF).
+
+Documents are cached on disk under ``INVOICE_DOCUMENT_DIR``, content
+addressed by a hash of the invoice's id, its ``updated_at`` (which invoice
+item changes also touch, see finance.signals), its business's
+``updated_at``, the format and ``RENDER_VERSION``. A repeat download of an
+unchanged invoice is served from the file without rendering; any change
+gives the invoice a new key, so cached files are never stale and never
+need invalidating. Files are written to a temporary name and renamed into
+place, so concurrent renders of the same document are harmless.
+
+The ``render_invoices`` command warms the cache with a process pool: for a
+month's invoices at month end, and with ``--changed-since`` for recently
+sent or edited invoices, so requests never render.
+"""
+import hashlib
+import os
+import tempfile
+import textwrap
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from ..models import Invoice
+from .pdf import LINE_WIDTH, text_pdf
+
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+# Bump when the templates or layout change, so cached documents are re-rendered
+RENDER_VERSION = 1
+
+
+def document_key(invoice: Invoice, fmt: str) -> str:
+    """Content address of an invoice's rendered document"""
+    source = ':'.join([
+        str(invoice.pk),
+        invoice.updated_at.isoformat(),
+        invoice.business.updated_at.isoformat(),
+        fmt,
+        str(RENDER_VERSION),
+    ])
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def document_path(key: str, fmt: str) -> Path:
+    return Path(settings.INVOICE_DOCUMENT_DIR) / key[:2] / f'{key}.{fmt}'
+
+
+def _money(amount) -> str:
+    return f'{Decimal(amount):,.2f}'
+
+
+def invoice_context(invoice: Invoice) -> Dict[str, Any]:
+    """Template context shared by the HTML and PDF layouts"""
+    business = invoice.business
+    return {
+        'invoice': invoice,
+        'business': business,
+        'business_location': ', '.join(part for part in (business.hq_city, business.hq_country) if part),
+        'items': [
+            {
+                'description': item.description,
+                'quantity': f'{item.quantity.normalize():f}',
+                'unit_price': _money(item.unit_price),
+                'total_price': _money(item.total_price),
+            }
+            for item in sorted(invoice.items.all(), key=lambda item: item.pk)
+        ],
+        'subtotal': _money(invoice.subtotal),
+        'tax_amount': _money(invoice.tax_amount),
+        'total_amount': _money(invoice.total_amount),
+    }
+
+
+def render_html(invoice: Invoice) -> bytes:
+    return render_to_string('finance/invoice.html', invoice_context(invoice)).encode()
+
+
+def _pdf_lines(context: Dict[str, Any]) -> List[str]:
+    invoice = context['invoice']
+    business = context['business']
+    rule = '-' * 80
+
+    lines = [f'INVOICE {invoice.invoice_number}', business.legal_name]
+    if business.dba_name:
+        lines.append(f'Trading as {business.dba_name}')
+    if business.registration_number:
+        lines.append(f'Registration no. {business.registration_number}')
+    if context['business_location']:
+        lines.append(context['business_location'])
+
+    lines += ['', 'Bill to:', f'  {invoice.customer_name}']
+    lines += [f'  {part}' for part in (invoice.customer_email, invoice.customer_phone) if part]
+    lines += [f'  {part}' for part in invoice.customer_address.splitlines() if part.strip()]
+
+    lines += [
+        '',
+        f'Issue date: {invoice.issue_date}    Due date: {invoice.due_date}    '
+        f'Status: {invoice.get_status_display()}',
+        '',
+        f"{'Description':<38} {'Quantity':>10} {'Unit price':>14} {'Amount':>15}",
+        rule,
+    ]
+    for item in context['items']:
+        descriptions = textwrap.wrap(item['description'], 38) or ['']
+        lines.append(
+            f"{descriptions[0]:<38} {item['quantity']:>10} {item['unit_price']:>14} {item['total_price']:>15}"
+        )
+        lines += descriptions[1:]
+    lines.append(rule)
+    for label, amount in (('Subtotal', context['subtotal']), ('Tax', context['tax_amount']),
+                          ('Total', context['total_amount'])):
+        lines.append(f'{label:>60} {invoice.currency} {amount:>15}')
+
+    if invoice.etims_invoice_number:
+        lines += ['', f'eTIMS invoice number: {invoice.etims_invoice_number}']
+    for heading, text in (('Notes', invoice.notes), ('Terms and conditions', invoice.terms_conditions)):
+        if text.strip():
+            lines += ['', f'{heading}:']
+            for paragraph in text.splitlines():
+                lines += textwrap.wrap(paragraph, LINE_WIDTH) or ['']
+    return lines
+
+
+def render_pdf(invoice: Invoice) -> bytes:
+    return text_pdf(_pdf_lines(invoice_context(invoice)), title=f'Invoice {invoice.invoice_number}')
+
+
+RENDERERS = {
+    'html': render_html,
+    'pdf': render_pdf,
+}
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix='.render-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def invoice_document(invoice: Invoice, fmt: str) -> Tuple[Path, str, bool]:
+    """The cached document of an invoice, rendering it first if needed.
+
+    Returns (path, key, rendered); ``rendered`` is False for a cache hit.
+    """
+    key = document_key(invoice, fmt)
+    path = document_path(key, fmt)
+    if path.exists():
+        return path, key, False
+    _write_atomic(path, RENDERERS[fmt](invoice))
+    return path, key, True
+
+
+def invoices_for_rendering(invoice_ids: Iterable = None):
+    """Invoices with everything the renderers read"""
+    invoices = Invoice.objects.select_related('business').prefetch_related('items')
+    if invoice_ids is not None:
+        invoices = invoices.filter(pk__in=list(invoice_ids))
+    return invoices
+
+
+def render_invoice_chunk(invoice_ids: List, formats: List[str]) -> Tuple[int, int]:
+    """Render the documents of a chunk of invoices that are not cached yet.
+
+    Returns (rendered, cached) document counts; plain ints so they can be
+    sent back from a worker process.
+    """
+    rendered = cached = 0
+    for invoice in invoices_for_rendering(invoice_ids):
+        for fmt in formats:
+            if invoice_document(invoice, fmt)[2]:
+                rendered += 1
+            else:
+                cached += 1
+    return rendered, cached
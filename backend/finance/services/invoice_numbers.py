@@ -0,0 +1,58 @@
+# backend/finance/services/invoice_numbers.py
+"""
+Per-business invoice numbering.
+
+Each business has one InvoiceNumberSequence row. ``allocate_invoice_number``
+locks it with ``SELECT ... FOR UPDATE``, takes its next number and
+increments it, so concurrent requests for the same business queue on that
+row while other businesses are unaffected. Called inside the transaction
+that inserts the invoice, a rolled-back invoice also rolls back its number,
+which keeps the sequence gapless. Numbers a client already gave an invoice
+by hand are skipped.
+"""
+from datetime import date
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import Invoice, InvoiceNumberSequence
+
+
+def _locked_sequence(business_id) -> InvoiceNumberSequence:
+    sequence = InvoiceNumberSequence.objects.select_for_update().filter(business_id=business_id).first()
+    if sequence is not None:
+        return sequence
+    try:
+        with transaction.atomic():
+            return InvoiceNumberSequence.objects.create(
+                business_id=business_id,
+                prefix=settings.INVOICE_NUMBER_PREFIX,
+                include_year=settings.INVOICE_NUMBER_INCLUDE_YEAR,
+                padding=settings.INVOICE_NUMBER_PADDING,
+            )
+    except IntegrityError:
+        # Another request created the business's sequence first
+        return InvoiceNumberSequence.objects.select_for_update().get(business_id=business_id)
+
+
+def allocate_invoice_number(business_id, today: Optional[date] = None) -> str:
+    """Take the next invoice number of a business.
+
+    Call inside the transaction that saves the invoice; the sequence row
+    stays locked until it commits.
+    """
+    with transaction.atomic():
+        sequence = _locked_sequence(business_id)
+        year = (today or timezone.localdate()).year
+        if sequence.include_year and sequence.year != year:
+            sequence.year = year
+            sequence.next_number = 1
+        number = sequence.next_number
+        taken = Invoice.objects.filter(business_id=business_id)
+        while taken.filter(invoice_number=sequence.format(number, year)).exists():
+            number += 1
+        sequence.next_number = number + 1
+        sequence.save(update_fields=['year', 'next_number', 'updated_at'])
+    return sequence.format(number, year)
@@ -1,21 +1,39 @@
 # backend/finance/services/langchain_service.py
+"""
+LangChain-powered advisor and chatbot.
+
+The OpenAI clients, prompt templates, chains, tools and agent are built on
+first use and shared by every advisor/chatbot in the process, so creating
+one is free. Conversation history lives in the bounded per-session store in
+``chat_memory`` rather than in a ConversationBufferMemory per instance.
+"""
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Callable
 import json
 
+from django.conf import settings
+
+from .chat_memory import format_history, get_memory_store
+from .prompts import (
+    CHAT_TEMPLATE, CREDIT_SCORE_TEMPLATE, HEALTH_ANALYSIS_TEMPLATE,
+    REVENUE_FORECAST_TEMPLATE, SUPPLIER_NEGOTIATION_TEMPLATE
+)
+from .response_cache import ResponseCache
+
 # LangChain imports with fallback
 try:
     from langchain.llms import OpenAI
     from langchain.chains import LLMChain
     from langchain.prompts import PromptTemplate
     from langchain.schema import BaseOutputParser
-    from langchain.memory import ConversationBufferMemory
     from langchain.agents import initialize_agent, Tool, AgentType
     from langchain.tools import BaseTool
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     # Fallback for when LangChain is not installed
     LANGCHAIN_AVAILABLE = False
+    BaseOutputParser = BaseTool = object
     print("Warning: LangChain not available. AI features will be limited.")
 
 
@@ -52,200 +70,144 @@ class FinancialAnalysisTool(BaseTool):
         return self._run(financial_data)
 
 
-class LangChainFinancialAdvisor:
-    """LangChain-powered financial advisor for SMEs"""
-    
-    def __init__(self):
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.llm = OpenAI(
-            temperature=0.3,
-            max_tokens=1000,
-            openai_api_key=self.openai_api_key
+# Chain name -> (template, input variables, parse JSON output, LLM settings)
+CHAIN_SPECS = {
+    'health': (HEALTH_ANALYSIS_TEMPLATE, ['financial_data'], True, 'analysis'),
+    'forecast': (REVENUE_FORECAST_TEMPLATE, ['historical_data'], True, 'analysis'),
+    'credit': (CREDIT_SCORE_TEMPLATE, ['business_data'], True, 'analysis'),
+    'negotiation': (SUPPLIER_NEGOTIATION_TEMPLATE, ['supplier_data'], True, 'analysis'),
+    'chat': (CHAT_TEMPLATE, ['context', 'question'], False, 'chat'),
+}
+
+LLM_SETTINGS = {
+    'analysis': {'temperature': 0.3, 'max_tokens': 1000},
+    'chat': {'temperature': 0.7, 'max_tokens': 500},
+}
+
+_shared: Dict[str, Any] = {}
+_shared_lock = threading.RLock()
+
+
+def _get_shared(key: str, factory: Callable[[], Any]) -> Any:
+    """Build a process-wide object on first use"""
+    value = _shared.get(key)
+    if value is None:
+        with _shared_lock:
+            value = _shared.get(key)
+            if value is None:
+                value = factory()
+                _shared[key] = value
+    return value
+
+
+def _require_langchain():
+    if not LANGCHAIN_AVAILABLE:
+        raise RuntimeError('LangChain is not installed')
+
+
+def get_llm(profile: str = 'analysis'):
+    """Shared OpenAI client for an LLM settings profile"""
+    def build():
+        _require_langchain()
+        return OpenAI(
+            openai_api_key=os.getenv('OPENAI_API_KEY'),
+            request_timeout=settings.AI_LLM_TIMEOUT,
+            max_retries=settings.AI_LLM_MAX_RETRIES,
+            **LLM_SETTINGS[profile]
         )
-        
-        # Initialize tools
-        self.tools = [
+    return _get_shared(f'llm:{profile}', build)
+
+
+def get_prompt(name: str):
+    """Shared PromptTemplate for a chain"""
+    template, input_variables, _, _ = CHAIN_SPECS[name]
+
+    def build():
+        _require_langchain()
+        return PromptTemplate(template=template, input_variables=input_variables)
+    return _get_shared(f'prompt:{name}', build)
+
+
+def get_chain(name: str):
+    """Shared LLMChain, built on first use"""
+    _, _, parse_json, profile = CHAIN_SPECS[name]
+
+    def build():
+        _require_langchain()
+        options = {'output_parser': FinancialInsightParser()} if parse_json else {}
+        return LLMChain(llm=get_llm(profile), prompt=get_prompt(name), **options)
+    return _get_shared(f'chain:{name}', build)
+
+
+def get_agent():
+    """Shared tool-using agent. It keeps no memory; history is passed in the prompt."""
+    def build():
+        _require_langchain()
+        tools = [
             FinancialAnalysisTool(),
             Tool(
                 name="budget_analysis",
                 description="Analyze budget performance and provide recommendations",
-                func=self._analyze_budget
+                func=LangChainFinancialAdvisor._analyze_budget
             ),
             Tool(
                 name="cash_flow_analysis",
                 description="Analyze cash flow patterns and predict future trends",
-                func=self._analyze_cash_flow
+                func=LangChainFinancialAdvisor._analyze_cash_flow
             ),
             Tool(
                 name="credit_scoring",
                 description="Calculate credit score and provide improvement recommendations",
-                func=self._calculate_credit_score
+                func=LangChainFinancialAdvisor._calculate_credit_score
             ),
             Tool(
                 name="supplier_negotiation",
                 description="Provide supplier negotiation strategies and insights",
-                func=self._analyze_supplier_negotiation
+                func=LangChainFinancialAdvisor._analyze_supplier_negotiation
             )
         ]
-        
-        # Initialize agent
-        self.agent = initialize_agent(
-            tools=self.tools,
-            llm=self.llm,
+        return initialize_agent(
+            tools=tools,
+            llm=get_llm('analysis'),
             agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            memory=ConversationBufferMemory()
+            verbose=settings.DEBUG
         )
-        
-        # Initialize chains
-        self._setup_chains()
+    return _get_shared('agent', build)
+
+
+class LangChainFinancialAdvisor:
+    """LangChain-powered financial advisor for SMEs.
     
-    def _setup_chains(self):
-        """Setup LangChain chains for different financial tasks"""
-        
-        # Financial Health Analysis Chain
-        health_template = """
-        You are a financial advisor for small and medium enterprises (SMEs).
-        Analyze the following financial data and provide insights:
-        
-        Financial Data:
-        {financial_data}
-        
-        Please provide:
-        1. Overall financial health assessment (score 0-100)
-        2. Key insights and observations
-        3. Specific recommendations for improvement
-        4. Risk factors to watch
-        5. Growth opportunities
-        
-        Format your response as JSON with the following structure:
-        {{
-            "health_score": <number>,
-            "insights": [<list of insights>],
-            "recommendations": [<list of recommendations>],
-            "risk_factors": [<list of risk factors>],
-            "growth_opportunities": [<list of opportunities>]
-        }}
-        """
-        
-        self.health_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                template=health_template,
-                input_variables=["financial_data"]
-            ),
-            output_parser=FinancialInsightParser()
-        )
-        
-        # Revenue Forecasting Chain
-        forecast_template = """
-        You are a financial forecasting expert for SMEs.
-        Based on the following historical revenue data, provide a 6-month revenue forecast:
-        
-        Historical Data:
-        {historical_data}
-        
-        Please provide:
-        1. Monthly revenue forecast for the next 6 months
-        2. Confidence level (0-100%)
-        3. Key assumptions and factors
-        4. Risk factors that could affect the forecast
-        5. Recommendations for improving revenue
-        
-        Format your response as JSON:
-        {{
-            "monthly_forecast": [<list of 6 monthly values>],
-            "confidence": <number>,
-            "assumptions": [<list of assumptions>],
-            "risk_factors": [<list of risk factors>],
-            "recommendations": [<list of recommendations>]
-        }}
-        """
-        
-        self.forecast_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                template=forecast_template,
-                input_variables=["historical_data"]
-            ),
-            output_parser=FinancialInsightParser()
-        )
-        
-        # Credit Scoring Chain
-        credit_template = """
-        You are a credit risk analyst for SMEs.
-        Analyze the following business data and calculate a credit score:
-        
-        Business Data:
-        {business_data}
-        
-        Please provide:
-        1. Credit score (300-850)
-        2. Score category (Poor/Fair/Good/Very Good/Excellent)
-        3. Key factors affecting the score
-        4. Specific recommendations for improvement
-        5. Loan eligibility assessment
-        
-        Format your response as JSON:
-        {{
-            "credit_score": <number>,
-            "score_category": "<category>",
-            "factors": {{
-                "payment_history": "<score and explanation>",
-                "credit_utilization": "<score and explanation>",
-                "business_age": "<score and explanation>",
-                "revenue_stability": "<score and explanation>",
-                "debt_to_income": "<score and explanation>"
-            }},
-            "recommendations": [<list of recommendations>],
-            "loan_eligibility": "<assessment>"
-        }}
-        """
-        
-        self.credit_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                template=credit_template,
-                input_variables=["business_data"]
-            ),
-            output_parser=FinancialInsightParser()
-        )
-        
-        # Supplier Negotiation Chain
-        negotiation_template = """
-        You are a procurement and negotiation expert for SMEs.
-        Analyze the following supplier spending data and provide negotiation strategies:
-        
-        Supplier Data:
-        {supplier_data}
-        
-        Please provide:
-        1. Negotiation priorities (which suppliers to focus on)
-        2. Specific negotiation strategies for each priority supplier
-        3. Potential cost savings opportunities
-        4. Risk mitigation strategies
-        5. Contract negotiation tips
-        
-        Format your response as JSON:
-        {{
-            "priorities": [<list of priority suppliers>],
-            "strategies": {{
-                "<supplier_name>": "<negotiation strategy>"
-            }},
-            "cost_savings": [<list of savings opportunities>],
-            "risk_mitigation": [<list of risk mitigation strategies>],
-            "contract_tips": [<list of contract negotiation tips>]
-        }}
-        """
-        
-        self.negotiation_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                template=negotiation_template,
-                input_variables=["supplier_data"]
-            ),
-            output_parser=FinancialInsightParser()
-        )
+    Instances are lightweight; the LLM, chains and agent are shared and
+    built on first use.
+    """
+    
+    def __init__(self, memory=None):
+        self.memory = memory or get_memory_store()
+    
+    @property
+    def llm(self):
+        return get_llm('analysis')
+    
+    @property
+    def agent(self):
+        return get_agent()
+    
+    @property
+    def health_chain(self):
+        return get_chain('health')
+    
+    @property
+    def forecast_chain(self):
+        return get_chain('forecast')
+    
+    @property
+    def credit_chain(self):
+        return get_chain('credit')
+    
+    @property
+    def negotiation_chain(self):
+        return get_chain('negotiation')
     
     def analyze_financial_health(self, financial_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze overall financial health using LangChain"""
@@ -307,34 +269,41 @@ class LangChainFinancialAdvisor:
                 "contract_tips": []
             }
     
-    def get_financial_advice(self, query: str, context: Dict[str, Any]) -> str:
+    def get_financial_advice(self, query: str, context: Dict[str, Any], session_id: Optional[str] = None) -> str:
         """Get general financial advice using the agent"""
         try:
+            history = format_history(self.memory.history(session_id))
             prompt = f"""
             Context: {json.dumps(context)}
+            Recent conversation: {json.dumps(history)}
             Query: {query}
             
             Please provide comprehensive financial advice for this SME based on the context.
             """
             
             result = self.agent.run(prompt)
+            self.memory.append(session_id, query, result)
             return result
         except Exception as e:
             return f"Unable to provide advice: {str(e)}"
     
-    def _analyze_budget(self, budget_data: str) -> str:
+    @staticmethod
+    def _analyze_budget(budget_data: str) -> str:
         """Analyze budget performance"""
         return f"Budget analysis: {budget_data}"
     
-    def _analyze_cash_flow(self, cash_flow_data: str) -> str:
+    @staticmethod
+    def _analyze_cash_flow(cash_flow_data: str) -> str:
         """Analyze cash flow patterns"""
         return f"Cash flow analysis: {cash_flow_data}"
     
-    def _calculate_credit_score(self, credit_data: str) -> str:
+    @staticmethod
+    def _calculate_credit_score(credit_data: str) -> str:
         """Calculate credit score"""
         return f"Credit score calculation: {credit_data}"
     
-    def _analyze_supplier_negotiation(self, supplier_data: str) -> str:
+    @staticmethod
+    def _analyze_supplier_negotiation(supplier_data: str) -> str:
         """Analyze supplier negotiation opportunities"""
         return f"Supplier negotiation analysis: {supplier_data}"
 
@@ -342,63 +311,56 @@ class LangChainFinancialAdvisor:
 class FinancialChatbot:
     """Financial chatbot using LangChain for conversational AI"""
     
-    def __init__(self):
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.llm = OpenAI(
-            temperature=0.7,
-            max_tokens=500,
-            openai_api_key=self.openai_api_key
-        )
-        
-        # Chat template
-        self.chat_template = """
-        You are a helpful financial advisor for small and medium enterprises (SMEs) in Kenya.
-        You specialize in:
-        - Financial planning and budgeting
-        - Cash flow management
-        - Credit scoring and loan applications
-        - Supplier negotiations
-        - Growth strategies
-        - eTIMS compliance
-        - M-Pesa integration
-        
-        Context about the business:
-        {context}
-        
-        User's question: {question}
+    chat_template = CHAT_TEMPLATE
+    
+    def __init__(self, memory=None):
+        self.memory = memory or get_memory_store()
+        self.response_cache = ResponseCache('chat')
+    
+    @property
+    def llm(self):
+        return get_llm('chat')
+    
+    @property
+    def chat_chain(self):
+        return get_chain('chat')
+    
+    def chat(self, question: str, business_context: Dict[str, Any] = None, session_id: Optional[str] = None,
+             business_id: Optional[int] = None) -> str:
+        """Chat with the financial advisor, remembering recent turns of the session.
         
-        Please provide helpful, actionable advice. Be specific and practical.
-        If you need more information, ask clarifying questions.
+        Questions without conversation history are answered from the response
+        cache when the same (or a near-identical) question was asked about the
+        same business data.
         """
-        
-        self.chat_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                template=self.chat_template,
-                input_variables=["context", "question"]
-            )
-        )
-    
-    def chat(self, question: str, business_context: Dict[str, Any] = None) -> str:
-        """Chat with the financial advisor"""
         try:
-            context = business_context or {}
-            result = self.chat_chain.run(
-                context=json.dumps(context),
-                question=question
-            )
+            context = dict(business_context or {})
+            
+            def ask():
+                return self.chat_chain.run(
+                    context=json.dumps(context),
+                    question=question
+                )
+            
+            history = self.memory.history(session_id)
+            if history:
+                context['recent_conversation'] = format_history(history)
+                result = ask()
+            else:
+                result, _ = self.response_cache.get_or_compute(business_id, question, context, ask)
+            self.memory.append(session_id, question, result)
             return result
         except Exception as e:
             return f"I'm sorry, I encountered an error: {str(e)}. Please try again."
     
-    def get_quick_insights(self, financial_summary: Dict[str, Any]) -> str:
+    def get_quick_insights(self, financial_summary: Dict[str, Any], business_id: Optional[int] = None) -> str:
         """Get quick financial insights"""
         question = "Based on this financial summary, what are the key insights and immediate actions I should take?"
         
-        return self.chat(question, financial_summary)
+        return self.chat(question, financial_summary, business_id=business_id)
     
-    def get_growth_recommendations(self, business_data: Dict[str, Any]) -> str:
+    def get_growth_recommendations(self, business_data: Dict[str, Any], business_id: Optional[int] = None) -> str:
         """Get growth recommendations"""
         question = "What growth strategies would you recommend for this business?"
         
-        return self.chat(question, business_data)
+        return self.chat(question, business_data, business_id=business_id)
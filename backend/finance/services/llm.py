@@ -0,0 +1,151 @@
+# backend/finance/services/llm.py
+"""
+LLM clients used by the AI job handlers and the streaming chat endpoint.
+
+``get_llm()`` returns the process-wide client for ``settings.AI_LLM_BACKEND``:
+``openai`` (the shared LangChain OpenAI client, with a request timeout and
+bounded retries) or ``fake`` (deterministic, no network; used in tests and
+local development).
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
+
+from django.conf import settings
+
+
+# A word plus the whitespace after it
+TOKEN_PATTERN = re.compile(r'\S+\s*')
+
+
+class LLMError(Exception):
+    """The LLM backend is unavailable or the completion failed"""
+
+
+class LangChainLLM:
+    """OpenAI completions through the shared LangChain client (see langchain_service)"""
+
+    def __init__(self, profile: str = 'analysis'):
+        self.profile = profile
+
+    def complete(self, prompt: str) -> str:
+        from .langchain_service import get_llm as get_langchain_llm
+        try:
+            result = get_langchain_llm(self.profile).invoke(prompt)
+        except Exception as exc:
+            raise LLMError(str(exc)) from exc
+        return getattr(result, 'content', result)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        from .langchain_service import get_llm as get_langchain_llm
+        try:
+            for chunk in get_langchain_llm(self.profile).stream(prompt):
+                yield getattr(chunk, 'content', chunk)
+        except Exception as exc:
+            raise LLMError(str(exc)) from exc
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        from .langchain_service import get_llm as get_langchain_llm
+        try:
+            async for chunk in get_langchain_llm(self.profile).astream(prompt):
+                yield getattr(chunk, 'content', chunk)
+        except Exception as exc:
+            raise LLMError(str(exc)) from exc
+
+
+class FakeLLM:
+    """Deterministic stand-in for an LLM.
+
+    Returns queued ``responses`` in order (strings, or callables taking the
+    prompt), then ``default``. Every prompt is recorded in ``prompts``.
+    ``stream``/``astream`` yield the response word by word, sleeping
+    ``token_delay`` before each token; ``tokens_streamed`` counts them.
+    """
+
+    def __init__(self, responses: Optional[List[Union[str, Callable[[str], str]]]] = None,
+                 default: Optional[str] = None, delay: float = 0.0, token_delay: float = 0.0):
+        self._lock = threading.Lock()
+        self.reset(responses, default, delay, token_delay)
+
+    def _respond(self, prompt: str) -> str:
+        with self._lock:
+            self.prompts.append(prompt)
+            response = self.responses.pop(0) if self.responses else self.default
+        if callable(response):
+            response = response(prompt)
+        if isinstance(response, Exception):
+            raise response
+        if response is None:
+            response = json.dumps({'summary': 'Fake response', 'prompt_length': len(prompt)})
+        return response
+
+    def complete(self, prompt: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._respond(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for token in TOKEN_PATTERN.findall(self._respond(prompt)):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            self.tokens_streamed += 1
+            yield token
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        for token in TOKEN_PATTERN.findall(self._respond(prompt)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            self.tokens_streamed += 1
+            yield token
+
+    def reset(self, responses=None, default=None, delay=0.0, token_delay=0.0):
+        with self._lock:
+            self.responses = list(responses or [])
+            self.default = default
+            self.delay = delay
+            self.token_delay = token_delay
+            self.prompts = []
+            self.tokens_streamed = 0
+
+
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm(profile: str = 'analysis'):
+    """Process-wide client for the configured backend and LLM settings profile.
+
+    The fake backend has a single instance for every profile.
+    """
+    backend = getattr(settings, 'AI_LLM_BACKEND', 'openai')
+    key = backend if backend == 'fake' else f'{backend}:{profile}'
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                if backend == 'fake':
+                    client = FakeLLM()
+                elif backend == 'openai':
+                    client = LangChainLLM(profile)
+                else:
+                    raise LLMError(f"Unknown AI_LLM_BACKEND '{backend}'")
+                _clients[key] = client
+    return client
+
+
+def parse_json_response(text: str) -> Dict:
+    """Parse a JSON completion, falling back to wrapping the raw text"""
+    cleaned = text.strip()
+    if cleaned.startswith('```'):
+        cleaned = cleaned.strip('`')
+        if cleaned.startswith('json'):
+            cleaned = cleaned[4:]
+    try:
+        parsed = json.loads(cleaned)
+    except ValueError:
+        return {'text': text.strip()}
+    return parsed if isinstance(parsed, dict) else {'text': text.strip()}
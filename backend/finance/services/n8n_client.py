@@ -0,0 +1,183 @@
+# backend/finance/services/n8n_client.py
+"""
+Shared HTTP client for n8n webhooks.
+
+One ``requests.Session`` per process keeps connections to n8n alive
+(``N8N_POOL_SIZE`` per host) instead of opening one per webhook. Connection
+errors and 429/502/503/504 responses are retried with exponential backoff
+(``N8N_MAX_RETRIES``, ``N8N_RETRY_BACKOFF``); read timeouts are not, since
+n8n may already be running the workflow.
+
+A circuit breaker stops calling n8n after ``N8N_CIRCUIT_FAILURES``
+consecutive failures, failing fast with ``CircuitOpenError`` until
+``N8N_CIRCUIT_RESET_SECONDS`` have passed. One trial request is then let
+through; it closes the circuit again on success.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class N8NError(Exception):
+    """n8n could not be reached"""
+
+
+class CircuitOpenError(N8NError):
+    """n8n has been failing; requests are not being sent"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed, open, half-open)"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class N8NClient:
+    """Pooled, retrying webhook client guarded by a circuit breaker"""
+
+    def __init__(self, url: str, timeout: float = 10.0, pool_size: int = 10, max_retries: int = 3,
+                 backoff: float = 0.5, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            backoff_factor=backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def post(self, payload: Dict[str, Any]) -> requests.Response:
+        """POST one payload; raises N8NError if n8n cannot be reached"""
+        if not self.breaker.allow():
+            raise CircuitOpenError('n8n circuit is open after repeated failures')
+        try:
+            # A (connect, read) timeout: fail fast when n8n is unreachable
+            response = self.session.post(self.url, json=payload, timeout=(min(self.timeout, 5), self.timeout))
+        except requests.RequestException as exc:
+            self.breaker.record_failure()
+            raise N8NError(str(exc)) from exc
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def post_batch(self, events: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Send events ``batch_size`` per POST; returns one result per event.
+
+        n8n receives ``{"workflow": "batch", "events": [...]}`` and may answer
+        ``{"results": [...]}`` with one object per event; an object with an
+        ``error`` marks that event as failed.
+        """
+        batch_size = batch_size or settings.N8N_BATCH_SIZE
+        results = []
+        for start in range(0, len(events), batch_size):
+            chunk = events[start:start + batch_size]
+            try:
+                response = self.post({
+                    'workflow': 'batch',
+                    'events': chunk,
+                    'timestamp': timezone.now().isoformat(),
+                })
+            except N8NError as exc:
+                results.extend({'error': f'Batch webhook failed: {exc}'} for _ in chunk)
+                continue
+            if response.status_code != 200:
+                results.extend({'error': f'Batch webhook failed: {response.status_code}'} for _ in chunk)
+                continue
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            replies = body.get('results') if isinstance(body, dict) else None
+            if not isinstance(replies, list) or len(replies) != len(chunk):
+                replies = [{}] * len(chunk)
+            for reply in replies:
+                reply = reply if isinstance(reply, dict) else {}
+                if reply.get('error'):
+                    results.append({'error': str(reply['error'])})
+                else:
+                    results.append({'status': 'success', 'workflow_id': reply.get('workflow_id')})
+        return results
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: Dict[tuple, N8NClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_n8n_client() -> Optional[N8NClient]:
+    """Process-wide client for the configured webhook, or None if unset"""
+    if not settings.N8N_WEBHOOK_URL:
+        return None
+    key = (
+        settings.N8N_WEBHOOK_URL, settings.N8N_TIMEOUT, settings.N8N_POOL_SIZE, settings.N8N_MAX_RETRIES,
+        settings.N8N_RETRY_BACKOFF, settings.N8N_CIRCUIT_FAILURES, settings.N8N_CIRCUIT_RESET_SECONDS,
+    )
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = N8NClient(*key)
+                _clients[key] = client
+    return client
@@ -0,0 +1,159 @@
+# backend/finance/services/outbox.py
+"""
+Transactional outbox for n8n automation events.
+
+Code that triggers an automation (an invoice going overdue, a budget
+crossing its alert threshold, a credit score changing category) writes an
+OutboxEvent in the same transaction as the change, so the event exists if
+and only if the change was committed. No request thread calls n8n; the
+``dispatch_outbox`` worker (and the daily automation runner) deliver the
+events in batches.
+
+Delivery is at least once: a worker that crashes after posting a batch
+but before recording it will post it again. Every event carries its
+``idempotency_key`` so n8n can drop the repeat, and the unique key stops
+the same change from being queued twice. Failed events are retried with
+exponential backoff and dead-lettered (status ``dead``) after
+``OUTBOX_MAX_ATTEMPTS`` attempts.
+"""
+import logging
+import os
+import socket
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import OutboxEvent
+from .n8n_client import get_n8n_client
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(events: Iterable[Tuple[Any, str, Dict[str, Any]]]) -> None:
+    """Queue (business_id, idempotency_key, payload) events.
+
+    Call inside the transaction that makes the triggering change. Events
+    whose key is already queued are ignored.
+    """
+    now = timezone.now()
+    rows = [
+        OutboxEvent(
+            business_id=business_id,
+            event_type=payload['workflow'],
+            idempotency_key=key,
+            payload=payload,
+            next_attempt_at=now,
+        )
+        for business_id, key, payload in events
+    ]
+    OutboxEvent.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def requeue_stale_events() -> int:
+    """Return events claimed by a worker that stopped before recording them"""
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_CLAIM_SECONDS)
+    return OutboxEvent.objects.filter(status='sending', claimed_at__lt=cutoff).update(
+        status='pending', worker='', next_attempt_at=timezone.now()
+    )
+
+
+class OutboxDispatcher:
+    """Claims due events, posts them to n8n in concurrent batches and records the outcome.
+
+    Only the HTTP calls run on pool threads; claiming and recording happen on
+    the calling thread.
+    """
+
+    def __init__(self, client=None, batch_size: Optional[int] = None, concurrency: Optional[int] = None,
+                 worker: Optional[str] = None):
+        self.client = client or get_n8n_client()
+        self.batch_size = max(1, batch_size or settings.N8N_BATCH_SIZE)
+        self.concurrency = max(1, concurrency or settings.N8N_CONCURRENCY)
+        self.worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+
+    def claim(self, limit: int, business_ids: Optional[Iterable] = None) -> List[OutboxEvent]:
+        """Mark up to ``limit`` due events as being sent by this worker"""
+        now = timezone.now()
+        due = OutboxEvent.objects.filter(status='pending', next_attempt_at__lte=now)
+        if business_ids is not None:
+            due = due.filter(business_id__in=list(business_ids))
+        ids = list(due.order_by('next_attempt_at', 'created_at').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # The status guard keeps claims exclusive between concurrent dispatchers
+        OutboxEvent.objects.filter(id__in=ids, status='pending').update(
+            status='sending', worker=self.worker, claimed_at=now, attempts=F('attempts') + 1
+        )
+        return list(
+            OutboxEvent.objects.filter(id__in=ids, status='sending', worker=self.worker, claimed_at=now)
+            .order_by('next_attempt_at', 'created_at')
+        )
+
+    def _send(self, batch: List[OutboxEvent]) -> List[Dict[str, Any]]:
+        payloads = [dict(event.payload, idempotency_key=event.idempotency_key) for event in batch]
+        return self.client.post_batch(payloads, batch_size=len(payloads))
+
+    def _record(self, batch: List[OutboxEvent], results: List[Dict[str, Any]], totals: Dict[str, int]) -> None:
+        now = timezone.now()
+        sent = []
+        failed = defaultdict(list)  # (attempts, error) -> ids
+        for event, result in zip(batch, results):
+            if 'error' in result:
+                failed[(event.attempts, result['error'][:2000])].append(event.id)
+            else:
+                sent.append(event.id)
+
+        if sent:
+            OutboxEvent.objects.filter(id__in=sent).update(status='sent', sent_at=now, last_error='', worker='')
+            totals['sent'] += len(sent)
+        for (attempts, error), ids in failed.items():
+            if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error('Dead-lettering %s outbox events after %s attempts: %s', len(ids), attempts, error)
+                OutboxEvent.objects.filter(id__in=ids).update(status='dead', last_error=error, worker='')
+                totals['dead'] += len(ids)
+            else:
+                OutboxEvent.objects.filter(id__in=ids).update(
+                    status='pending', last_error=error, worker='', next_attempt_at=now + retry_delay(attempts)
+                )
+                totals['retried'] += len(ids)
+
+    def run_once(self, business_ids: Optional[Iterable] = None) -> Dict[str, int]:
+        """Deliver one round of up to ``concurrency`` batches"""
+        totals = {'claimed': 0, 'webhooks': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        events = self.claim(self.batch_size * self.concurrency, business_ids)
+        if not events:
+            return totals
+        batches = [events[i:i + self.batch_size] for i in range(0, len(events), self.batch_size)]
+        if len(batches) == 1:
+            results = [self._send(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox') as pool:
+                results = list(pool.map(self._send, batches))
+
+        totals['claimed'] = len(events)
+        totals['webhooks'] = len(batches)
+        for batch, batch_results in zip(batches, results):
+            self._record(batch, batch_results, totals)
+        return totals
+
+    def drain(self, business_ids: Optional[Iterable] = None) -> Dict[str, int]:
+        """Deliver every event that is due now; events being retried wait for a later run"""
+        if business_ids is not None:
+            business_ids = list(business_ids)
+        totals = {'claimed': 0, 'webhooks': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        while True:
+            round_totals = self.run_once(business_ids)
+            if not round_totals['claimed']:
+                return totals
+            for key, value in round_totals.items():
+                totals[key] += value
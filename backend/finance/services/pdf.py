@@ -0,0 +1,66 @@
+# backend/finance/services/pdf.py
+"""
+Minimal text PDF writer.
+
+Lays out lines of text in the built-in Courier font (no embedded fonts, so
+no PDF library is needed) on as many A4 pages as they take. A monospaced
+font lets callers align columns with plain string formatting. Text outside
+Latin-1 is replaced with ``?``.
+"""
+from typing import List, Sequence
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 10
+LEADING = 14
+# Courier glyphs are 0.6em wide
+LINE_WIDTH = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+
+def _escape(text: str) -> bytes:
+    encoded = text.encode('latin-1', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _page_stream(lines: Sequence[str]) -> bytes:
+    parts = [b'BT', b'/F1 %d Tf' % FONT_SIZE, b'%d TL' % LEADING, b'%d %d Td' % (MARGIN, PAGE_HEIGHT - MARGIN)]
+    for line in lines:
+        parts.append(b'(' + _escape(line[:LINE_WIDTH]) + b') Tj T*')
+    parts.append(b'ET')
+    return b'\n'.join(parts)
+
+
+def text_pdf(lines: Sequence[str], title: str = '') -> bytes:
+    """A PDF document of the given lines, LINES_PER_PAGE to a page"""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # Objects 1-4 are the catalog, page tree, font and info; each page adds a page and its content stream
+    page_ids = [5 + 2 * index for index in range(len(pages))]
+    objects: List[bytes] = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+        + b'] /Count %d >>' % len(pages),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        b'<< /Title (' + _escape(title) + b') /Producer (Finance Growth Co-pilot) >>',
+    ]
+    for page_id, page_lines in zip(page_ids, pages):
+        stream = _page_stream(page_lines)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] ' % (PAGE_WIDTH, PAGE_HEIGHT)
+            + b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (page_id + 1)
+        )
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        output += b'%010d 00000 n \n' % offset
+    output += b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
@@ -0,0 +1,82 @@
+# backend/finance/services/receivables.py
+"""
+Aged receivables.
+
+Open invoices (sent or overdue) are bucketed by how many days past their
+``due_date`` they are on the report date, not by status, so the report does
+not wait for the daily automation to flag invoices overdue. Every bucket is
+a conditional ``Sum`` over a ``due_date`` range, so the per-customer report
+is one grouped query; the partial index on open invoices
+(``business``, ``due_date``) keeps it to the business's open invoices.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import Invoice
+from .summary import OUTSTANDING_INVOICE_STATUSES
+
+ZERO = Decimal('0')
+
+# (name, fewest days past due, most days past due); None is unbounded
+AGING_BUCKETS = (
+    ('current', None, 0),
+    ('days_1_30', 1, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
+)
+
+
+def bucket_filter(as_of: date, fewest: Optional[int], most: Optional[int]) -> Q:
+    """Invoices between ``fewest`` and ``most`` days past due on ``as_of``"""
+    condition = Q()
+    if fewest is not None:
+        condition &= Q(due_date__lte=as_of - timedelta(days=fewest))
+    if most is not None:
+        condition &= Q(due_date__gte=as_of - timedelta(days=most))
+    return condition
+
+
+def open_invoices(business_id, user=None):
+    invoices = Invoice.objects.filter(business_id=business_id, status__in=OUTSTANDING_INVOICE_STATUSES)
+    if user is not None:
+        invoices = invoices.filter(user=user)
+    return invoices
+
+
+def aged_receivables(business_id, as_of: Optional[date] = None, user=None) -> Dict[str, Any]:
+    """Aging buckets for a business and each of its customers, in one query.
+
+    With ``user``, only that user's invoices are included.
+    """
+    as_of = as_of or timezone.localdate()
+    buckets = {
+        name: Sum('total_amount', filter=bucket_filter(as_of, fewest, most))
+        for name, fewest, most in AGING_BUCKETS
+    }
+    rows = (
+        open_invoices(business_id, user)
+        .values('customer_name')
+        .annotate(total=Sum('total_amount'), invoice_count=Count('id'), **buckets)
+        .order_by('-total', 'customer_name')
+    )
+
+    customers: List[Dict[str, Any]] = []
+    totals = {name: ZERO for name, _, _ in AGING_BUCKETS}
+    totals.update(total=ZERO, invoice_count=0)
+    for row in rows:
+        customer = {key: (ZERO if value is None else value) for key, value in row.items()}
+        customers.append(customer)
+        for key in totals:
+            totals[key] += customer[key]
+
+    return {
+        'business': business_id,
+        'as_of': as_of,
+        'totals': totals,
+        'customers': customers,
+    }
@@ -0,0 +1,172 @@
+# backend/finance/services/response_cache.py
+"""
+Cache for LLM responses to repeated questions.
+
+Entries are keyed by the normalized prompt plus a hash of the business
+context it was answered against, and embed the business's cache version,
+so any change to the business's financial data (see finance.signals)
+invalidates its cached answers. Entries also expire after
+``AI_RESPONSE_CACHE_TIMEOUT`` seconds.
+
+With ``AI_RESPONSE_CACHE_FUZZY`` enabled, an exact miss falls back to a
+similarity lookup: prompts are embedded locally as hashed word and
+character-trigram counts (pure NumPy, no API call) and the closest earlier
+prompt for the same business and context is reused when its cosine
+similarity reaches ``AI_RESPONSE_CACHE_SIMILARITY`` and it mentions the
+same numbers.
+
+Hits and misses are counted in the shared cache; see ``response_cache_stats``.
+"""
+import hashlib
+import json
+import re
+import unicodedata
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from ..cache_utils import get_business_cache_version
+
+EMBEDDING_DIM = 512
+STATS_PREFIX = 'llm_cache_stats:'
+STAT_NAMES = ('hits', 'fuzzy_hits', 'misses')
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_prompt(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a prompt"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text)).strip()
+
+
+def context_hash(context: Any) -> str:
+    payload = json.dumps(context or {}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def embed(normalized: str) -> np.ndarray:
+    """Unit-length hashed bag of words and character trigrams"""
+    tokens = []
+    for word in normalized.split():
+        tokens.append(word)
+        padded = f'#{word}#'
+        tokens.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    if not tokens:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    buckets = [zlib.crc32(token.encode()) % EMBEDDING_DIM for token in tokens]
+    vector = np.bincount(buckets, minlength=EMBEDDING_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _numbers(normalized: str) -> frozenset:
+    return frozenset(word for word in normalized.split() if any(ch.isdigit() for ch in word))
+
+
+def _record(stat: str) -> None:
+    key = STATS_PREFIX + stat
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters across all processes, with the hit ratio"""
+    counts = {stat: cache.get(STATS_PREFIX + stat) or 0 for stat in STAT_NAMES}
+    lookups = sum(counts.values())
+    hits = counts['hits'] + counts['fuzzy_hits']
+    counts['lookups'] = lookups
+    counts['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+    return counts
+
+
+def reset_response_cache_stats() -> None:
+    cache.delete_many([STATS_PREFIX + stat for stat in STAT_NAMES])
+
+
+class ResponseCache:
+    """Cached LLM responses for one kind of prompt (e.g. 'chat')"""
+
+    def __init__(self, namespace: str, timeout: Optional[int] = None,
+                 fuzzy: Optional[bool] = None, threshold: Optional[float] = None):
+        self.namespace = namespace
+        self.timeout = settings.AI_RESPONSE_CACHE_TIMEOUT if timeout is None else timeout
+        self.fuzzy = settings.AI_RESPONSE_CACHE_FUZZY if fuzzy is None else fuzzy
+        self.threshold = settings.AI_RESPONSE_CACHE_SIMILARITY if threshold is None else threshold
+
+    def _scope(self, business_id, context) -> str:
+        version = get_business_cache_version(business_id) if business_id else 0
+        return f'llm_response:{self.namespace}:business_{business_id or "none"}.v{version}:{context_hash(context)}'
+
+    def _entry_key(self, scope: str, normalized: str) -> str:
+        return f'{scope}:{hashlib.sha256(normalized.encode()).hexdigest()[:32]}'
+
+    def lookup(self, business_id, prompt: str, context: Any = None) -> Tuple[Optional[str], Optional[str]]:
+        """Cached response and how it was found ('exact' or 'fuzzy'), or (None, None)"""
+        normalized = normalize_prompt(prompt)
+        scope = self._scope(business_id, context)
+        response = cache.get(self._entry_key(scope, normalized))
+        if response is not None:
+            _record('hits')
+            return response, 'exact'
+
+        if self.fuzzy and normalized:
+            response = self._fuzzy_lookup(scope, normalized)
+            if response is not None:
+                _record('fuzzy_hits')
+                return response, 'fuzzy'
+
+        _record('misses')
+        return None, None
+
+    def _fuzzy_lookup(self, scope: str, normalized: str) -> Optional[str]:
+        index = cache.get(f'{scope}:index')
+        if not index or not index['keys']:
+            return None
+        similarities = index['vectors'] @ embed(normalized)
+        numbers = _numbers(normalized)
+        for position in np.argsort(similarities)[::-1]:
+            if similarities[position] < self.threshold:
+                break
+            # "cash flow in 2023" must not be answered with "cash flow in 2024"
+            if _numbers(index['prompts'][position]) == numbers:
+                return cache.get(index['keys'][position])
+        return None
+
+    def store(self, business_id, prompt: str, context: Any, response: str) -> None:
+        normalized = normalize_prompt(prompt)
+        scope = self._scope(business_id, context)
+        key = self._entry_key(scope, normalized)
+        cache.set(key, response, self.timeout)
+        if self.fuzzy and normalized:
+            self._add_to_index(scope, normalized, key)
+
+    def _add_to_index(self, scope: str, normalized: str, key: str) -> None:
+        index_key = f'{scope}:index'
+        index = cache.get(index_key) or {
+            'keys': [], 'prompts': [], 'vectors': np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        }
+        if key in index['keys']:
+            return
+        limit = settings.AI_RESPONSE_CACHE_INDEX_SIZE
+        index = {
+            'keys': (index['keys'] + [key])[-limit:],
+            'prompts': (index['prompts'] + [normalized])[-limit:],
+            'vectors': np.vstack([index['vectors'], embed(normalized)])[-limit:],
+        }
+        cache.set(index_key, index, self.timeout)
+
+    def get_or_compute(self, business_id, prompt: str, context: Any,
+                       compute: Callable[[], str]) -> Tuple[str, Optional[str]]:
+        """Cached response, or compute() stored for next time. Returns (response, hit)."""
+        response, hit = self.lookup(business_id, prompt, context)
+        if response is None:
+            response = compute()
+            self.store(business_id, prompt, context, response)
+        return response, hit
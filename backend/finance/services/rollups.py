@@ -0,0 +1,133 @@
+# backend/finance/services/rollups.py
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ..models import Transaction, TransactionDailyRollup
+
+# Transaction fields that make up a rollup row key
+ROLLUP_KEY_FIELDS = ('business_id', 'user_id', 'transaction_type', 'category', 'payment_method')
+
+
+def rollup_day(value) -> Optional[Any]:
+    """Return the calendar day (in the current timezone) a transaction_date falls on"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            return parse_date(value)
+        value = parsed
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def rollup_key(values: Dict[str, Any]) -> Optional[tuple]:
+    """Build the rollup key for a dict of transaction field values"""
+    day = rollup_day(values.get('transaction_date'))
+    if day is None or values.get('business_id') is None:
+        return None
+    return (
+        values['business_id'],
+        values['user_id'],
+        day,
+        values['transaction_type'],
+        values.get('category') or '',
+        values['payment_method'],
+    )
+
+
+def transaction_values(instance: Transaction) -> Dict[str, Any]:
+    """Snapshot of the fields of a transaction instance that feed the rollup and budgets"""
+    return {
+        'business_id': instance.business_id,
+        'user_id': instance.user_id,
+        'transaction_type': instance.transaction_type,
+        'category': instance.category,
+        'payment_method': instance.payment_method,
+        'transaction_date': instance.transaction_date,
+        'status': instance.status,
+        'amount': Decimal(str(instance.amount)),
+    }
+
+
+def apply_rollup_delta(key: tuple, count: int, amount: Decimal) -> None:
+    """Atomically add count/amount to the rollup row for key, creating it if needed"""
+    if not count and not amount:
+        return
+    business_id, user_id, day, transaction_type, category, payment_method = key
+    lookup = {
+        'business_id': business_id,
+        'user_id': user_id,
+        'day': day,
+        'transaction_type': transaction_type,
+        'category': category,
+        'payment_method': payment_method,
+    }
+    updates = {
+        'transaction_count': F('transaction_count') + count,
+        'total_amount': F('total_amount') + amount,
+        'updated_at': timezone.now(),
+    }
+    if TransactionDailyRollup.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            TransactionDailyRollup.objects.create(transaction_count=count, total_amount=amount, **lookup)
+    except IntegrityError:
+        # Another writer created the row first; fold our delta into it
+        TransactionDailyRollup.objects.filter(**lookup).update(**updates)
+
+
+def record_transaction_change(previous: Optional[Dict[str, Any]], current: Optional[Dict[str, Any]]) -> None:
+    """Apply the rollup deltas for a transaction moving from previous to current.
+
+    Either side may be None (create / delete).
+    """
+    old_key = rollup_key(previous) if previous else None
+    new_key = rollup_key(current) if current else None
+
+    if old_key and old_key == new_key:
+        delta = current['amount'] - previous['amount']
+        apply_rollup_delta(new_key, 0, delta)
+        return
+    if old_key:
+        apply_rollup_delta(old_key, -1, -previous['amount'])
+    if new_key:
+        apply_rollup_delta(new_key, 1, current['amount'])
+
+
+def rebuild_rollups(business_ids: Optional[Iterable[int]] = None, batch_size: int = 1000) -> int:
+    """Recompute rollup rows from the Transaction table.
+
+    Existing rows for the selected businesses (or all businesses) are replaced.
+    Returns the number of rollup rows written.
+    """
+    transactions = Transaction.objects.all()
+    rollups = TransactionDailyRollup.objects.all()
+    if business_ids is not None:
+        business_ids = list(business_ids)
+        transactions = transactions.filter(business_id__in=business_ids)
+        rollups = rollups.filter(business_id__in=business_ids)
+
+    grouped = transactions.annotate(day=TruncDate('transaction_date')).values(
+        'business_id', 'user_id', 'day', 'transaction_type', 'category', 'payment_method'
+    ).annotate(
+        transaction_count=Count('id'),
+        total_amount=Sum('amount'),
+    ).order_by()
+
+    with transaction.atomic():
+        rollups.delete()
+        rows = [TransactionDailyRollup(**row) for row in grouped.iterator()]
+        TransactionDailyRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,129 @@
+# backend/finance/services/summary.py
+"""
+Shared financial-summary queries for the dashboard endpoints.
+
+Each helper computes all of its figures with conditional aggregation
+(``Sum(..., filter=Q(...))``) so a summary costs one query per model instead
+of one query per figure.
+"""
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.db.models import Count, Q, Sum
+
+from users.access import get_business_access
+from ..models import Budget, CreditScore, Invoice, TransactionDailyRollup
+
+ZERO = Decimal('0')
+
+OUTSTANDING_INVOICE_STATUSES = ['sent', 'overdue']
+PENDING_INVOICE_STATUSES = ['draft', 'sent']
+
+
+def transaction_totals(queryset) -> Dict[str, Any]:
+    """Income, expenses, net profit and transaction count for a Transaction
+    or TransactionDailyRollup queryset, in one query."""
+    if queryset.model is TransactionDailyRollup:
+        amount, count = 'total_amount', Sum('transaction_count')
+    else:
+        amount, count = 'amount', Count('id')
+
+    totals = queryset.aggregate(
+        total_income=Sum(amount, filter=Q(transaction_type='income')),
+        total_expenses=Sum(amount, filter=Q(transaction_type='expense')),
+        transaction_count=count,
+    )
+    total_income = totals['total_income'] or ZERO
+    total_expenses = totals['total_expenses'] or ZERO
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_profit': total_income - total_expenses,
+        'transaction_count': totals['transaction_count'] or 0,
+    }
+
+
+def invoice_totals(queryset, user=None) -> Dict[str, Any]:
+    """Invoice counts and amounts by status in one query.
+
+    When ``user`` is given, ``mine`` and ``mine_pending`` count the invoices
+    created by that user.
+    """
+    aggregates = {
+        'total': Count('id'),
+        'paid': Count('id', filter=Q(status='paid')),
+        'pending': Count('id', filter=Q(status__in=PENDING_INVOICE_STATUSES)),
+        'overdue_count': Count('id', filter=Q(status='overdue')),
+        'overdue_amount': Sum('total_amount', filter=Q(status='overdue')),
+        'outstanding_amount': Sum('total_amount', filter=Q(status__in=OUTSTANDING_INVOICE_STATUSES)),
+    }
+    if user is not None:
+        aggregates['mine'] = Count('id', filter=Q(user=user))
+        aggregates['mine_pending'] = Count('id', filter=Q(user=user, status__in=PENDING_INVOICE_STATUSES))
+
+    totals = queryset.aggregate(**aggregates)
+    totals['overdue_amount'] = totals['overdue_amount'] or ZERO
+    totals['outstanding_amount'] = totals['outstanding_amount'] or ZERO
+    return totals
+
+
+def budget_totals(queryset) -> Dict[str, Any]:
+    """Budgeted and spent totals plus utilization percentage in one query"""
+    totals = queryset.aggregate(
+        total_budgeted=Sum('budgeted_amount'),
+        total_spent=Sum('spent_amount'),
+    )
+    total_budgeted = totals['total_budgeted'] or ZERO
+    total_spent = totals['total_spent'] or ZERO
+    utilization = (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0
+    return {
+        'total_budgeted': total_budgeted,
+        'total_spent': total_spent,
+        'utilization': round(utilization, 2),
+    }
+
+
+def latest_credit_score(**filters) -> Optional[CreditScore]:
+    """Most recent credit score matching filters (one query)"""
+    return CreditScore.objects.filter(**filters).order_by('-created_at').first()
+
+
+def financial_scope_user(user, business_id):
+    """User whose records a business summary is limited to, or None for the whole business.
+
+    As in the list endpoints, admins and superusers see the whole business
+    and staff only their own records.
+    """
+    return None if get_business_access(user).is_admin(business_id) else user
+
+
+def financial_scope(user=None) -> str:
+    return f'user_{user.id}' if user is not None else 'business'
+
+
+def business_financial_context(business_id, user=None) -> Dict[str, Any]:
+    """JSON-safe financial snapshot of a business, used as LLM prompt context.
+
+    With ``user`` only that user's records are included. ``scope`` names
+    what the figures cover, so cached answers (keyed by the context) are
+    never shared between scopes.
+    """
+    filters = {'business_id': business_id}
+    if user is not None:
+        filters['user'] = user
+    transactions = transaction_totals(TransactionDailyRollup.objects.filter(**filters))
+    invoices = invoice_totals(Invoice.objects.filter(**filters))
+    budgets = budget_totals(Budget.objects.filter(is_active=True, **filters))
+    credit_score = latest_credit_score(**filters)
+    context = {
+        'scope': financial_scope(user),
+        'transactions': transactions,
+        'invoices': invoices,
+        'budgets': budgets,
+        'credit_score': credit_score.score if credit_score else None,
+    }
+    return {
+        section: {key: float(value) if isinstance(value, Decimal) else value for key, value in figures.items()}
+        if isinstance(figures, dict) else figures
+        for section, figures in context.items()
+    }
@@ -0,0 +1,106 @@
+# backend/finance/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache_utils import bump_business_cache_version, bump_user_cache_version
+from .models import Transaction, Invoice, InvoiceItem, Budget, CashFlow, CreditScore
+from .services.budgets import record_transaction_budget_change
+from .services.customer_balances import invoice_values, record_invoice_balance_change
+from .services.rollups import record_transaction_change, transaction_values
+
+# Models whose changes affect cached dashboard responses
+CACHE_VERSIONED_MODELS = (Transaction, Invoice, Budget, CashFlow, CreditScore)
+
+
+@receiver(pre_save, sender=Transaction)
+def capture_previous_transaction(sender, instance, raw=False, **kwargs):
+    """Remember the stored state of a transaction so the rollup and budget deltas can be computed"""
+    instance._rollup_previous = None
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(
+        'business_id', 'user_id', 'transaction_type', 'category',
+        'payment_method', 'transaction_date', 'status', 'amount'
+    ).first()
+    instance._rollup_previous = previous
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep TransactionDailyRollup in sync with created/updated transactions"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_rollup_previous', None)
+    record_transaction_change(previous, transaction_values(instance))
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Remove a deleted transaction from its rollup row"""
+    record_transaction_change(transaction_values(instance), None)
+
+
+@receiver(post_save, sender=Transaction)
+def update_budgets_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep Budget.spent_amount in sync and queue alerts for budgets crossing their threshold"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_rollup_previous', None)
+    record_transaction_budget_change(
+        previous, transaction_values(instance), f'transaction:{instance.pk}:{instance.updated_at.isoformat()}'
+    )
+
+
+@receiver(post_delete, sender=Transaction)
+def update_budgets_on_delete(sender, instance, **kwargs):
+    """Give a deleted expense back to its budgets"""
+    record_transaction_budget_change(transaction_values(instance), None, f'transaction:{instance.pk}:deleted')
+
+
+@receiver(pre_save, sender=Invoice)
+def capture_previous_invoice(sender, instance, raw=False, **kwargs):
+    """Remember the stored state of an invoice so the customer balance delta can be computed"""
+    instance._balance_previous = None
+    if raw or instance._state.adding:
+        return
+    instance._balance_previous = sender.objects.filter(pk=instance.pk).values(
+        'customer_id', 'status', 'total_amount'
+    ).first()
+
+
+@receiver(post_save, sender=Invoice)
+def update_customer_balance_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keep Customer.total_invoiced/total_paid in sync with created/updated invoices"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_balance_previous', None)
+    record_invoice_balance_change(previous, invoice_values(instance))
+
+
+@receiver(post_delete, sender=Invoice)
+def update_customer_balance_on_delete(sender, instance, **kwargs):
+    """Take a deleted invoice off its customer's balance"""
+    record_invoice_balance_change(invoice_values(instance), None)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def touch_invoice_on_item_change(sender, instance, raw=False, **kwargs):
+    """Move the invoice's updated_at forward so its rendered documents get a new cache key"""
+    if raw:
+        return
+    Invoice.objects.filter(pk=instance.invoice_id).update(updated_at=timezone.now())
+
+
+def bump_cache_versions(sender, instance, raw=False, **kwargs):
+    """Invalidate cached responses that depend on the changed record"""
+    if raw:
+        return
+    bump_business_cache_version(instance.business_id)
+    bump_user_cache_version(instance.user_id)
+
+
+for model in CACHE_VERSIONED_MODELS:
+    post_save.connect(bump_cache_versions, sender=model, dispatch_uid=f'bump_cache_versions_save_{model.__name__}')
+    post_delete.connect(bump_cache_versions, sender=model, dispatch_uid=f'bump_cache_versions_delete_{model.__name__}')
@@ -1,13 +1,25 @@
 # backend/finance/tests.py
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from users.models import Business, UserProfile
-from .models import Transaction, Invoice, InvoiceItem, Budget, CashFlow, FinancialForecast, CreditScore
+from users.models import Business, UserProfile, Membership
+from .models import (
+    Transaction, Invoice, InvoiceItem, Budget, CashFlow, FinancialForecast, CreditScore,
+    TransactionDailyRollup, AIJob, OutboxEvent, CashFlowSyncState, InvoiceNumberSequence
+)
+from datetime import timedelta
 from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from .cache_utils import bump_business_cache_version, get_business_cache_version
 import json
 
 
@@ -145,7 +157,7 @@ class InvoiceAPITest(APITestCase):
     def test_send_invoice(self):
         """Test sending invoice"""
         response = self.client.post(f'/api/finance/invoices/{self.invoice.id}/send_invoice/')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.invoice.refresh_from_db()
         self.assertEqual(self.invoice.status, 'sent')
     
@@ -315,6 +327,16 @@ class CreditScoreAPITest(APITestCase):
         self.assertIn('score_category', response.data)
         self.assertIn('factors', response.data)
     
+    def test_calculate_credit_score_queues_category_alert(self):
+        """The first score of a business is a category change; an unchanged rescore is not"""
+        for _ in range(2):
+            response = self.client.post(
+                '/api/finance/credit-scores/calculate_score/', {'business_id': self.business.id}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        alerts = OutboxEvent.objects.filter(event_type='credit_score_alert', business=self.business)
+        self.assertEqual(alerts.count(), 1)
+    
     def test_get_credit_score_list(self):
         """Test getting credit score list"""
         # Create a credit score first
@@ -367,3 +389,2123 @@ class FinancialForecastAPITest(APITestCase):
         self.assertIn('forecast_type', response.data)
         self.assertIn('forecast_data', response.data)
         self.assertIn('confidence_score', response.data)
+
+
+class TransactionDailyRollupTest(APITestCase):
+    """Test incremental maintenance of the daily transaction rollups"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.business = Business.objects.create(
+            owner=self.user,
+            legal_name='Test Business'
+        )
+        Membership.objects.create(business=self.business, user=self.user, role_in_business='business_admin')
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.today = timezone.now()
+    
+    def _create(self, amount, transaction_type='income', category='Sales', payment_method='mpesa'):
+        return Transaction.objects.create(
+            business=self.business,
+            user=self.user,
+            amount=Decimal(amount),
+            transaction_type=transaction_type,
+            payment_method=payment_method,
+            category=category,
+            description='Rollup test',
+            transaction_date=self.today
+        )
+    
+    def test_rollup_tracks_create_update_delete(self):
+        """Rollup rows follow transaction writes"""
+        first = self._create('100.00')
+        self._create('50.00')
+        
+        rollup = TransactionDailyRollup.objects.get(business=self.business, category='Sales')
+        self.assertEqual(rollup.transaction_count, 2)
+        self.assertEqual(rollup.total_amount, Decimal('150.00'))
+        
+        first.amount = Decimal('120.00')
+        first.save()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.total_amount, Decimal('170.00'))
+        
+        first.category = 'Services'
+        first.save()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.transaction_count, 1)
+        self.assertEqual(rollup.total_amount, Decimal('50.00'))
+        moved = TransactionDailyRollup.objects.get(business=self.business, category='Services')
+        self.assertEqual(moved.total_amount, Decimal('120.00'))
+        
+        first.delete()
+        moved.refresh_from_db()
+        self.assertEqual(moved.transaction_count, 0)
+        self.assertEqual(moved.total_amount, Decimal('0.00'))
+    
+    def test_backfill_command_rebuilds_rollups(self):
+        """Backfill recomputes rollups from the transaction table"""
+        self._create('100.00')
+        self._create('40.00', transaction_type='expense', category='Rent', payment_method='bank_transfer')
+        TransactionDailyRollup.objects.all().delete()
+        
+        call_command('backfill_transaction_rollups', stdout=StringIO())
+        
+        self.assertEqual(TransactionDailyRollup.objects.count(), 2)
+        expense = TransactionDailyRollup.objects.get(transaction_type='expense')
+        self.assertEqual(expense.total_amount, Decimal('40.00'))
+        self.assertEqual(expense.payment_method, 'bank_transfer')
+    
+    def test_analytics_reads_rollups(self):
+        """Analytics endpoint reports totals from the rollups"""
+        self._create('100.00')
+        self._create('300.00', category='Services', payment_method='card')
+        self._create('40.00', transaction_type='expense', category='Rent')
+        
+        response = self.client.get('/api/finance/transactions/analytics/', {'business': self.business.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_transactions'], 3)
+        self.assertEqual(response.data['total_amount'], '440.00')
+        self.assertEqual(response.data['income_count'], 2)
+        self.assertEqual(response.data['expense_count'], 1)
+        self.assertEqual(response.data['top_categories'][0]['category'], 'Services')
+        
+        response = self.client.get('/api/finance/transactions/summary/', {'business': self.business.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_income'], '400.00')
+        self.assertEqual(response.data['total_expenses'], '40.00')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardQueryCountTest(APITestCase):
+    """Benchmark: dashboard endpoints issue a fixed number of queries regardless of data volume"""
+    
+    # Expected queries per endpoint (including JWT user lookup and access checks)
+    EXPECTED_QUERIES = {
+        'dashboard_data': 8,
+        'transaction_summary': 7,
+        'business_admin_dashboard': 10,
+        'user_dashboard': 6,
+    }
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.business = Business.objects.create(
+            owner=self.user,
+            legal_name='Test Business'
+        )
+        Membership.objects.create(business=self.business, user=self.user, role_in_business='business_admin')
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def _seed(self, rows):
+        today = timezone.now()
+        for i in range(rows):
+            Transaction.objects.create(
+                business=self.business, user=self.user, amount=Decimal('100.00'),
+                transaction_type='income' if i % 2 else 'expense', payment_method='mpesa',
+                category=f'Category {i % 3}', description='Seed', transaction_date=today
+            )
+            invoice = Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'INV-Q{rows}-{i}',
+                customer_name='Customer', subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                status='overdue' if i % 2 else 'sent', issue_date=today.date(), due_date=today.date()
+            )
+            InvoiceItem.objects.create(invoice=invoice, description='Item', quantity=1, unit_price=Decimal('100.00'))
+            Budget.objects.create(
+                business=self.business, user=self.user, name=f'Budget {i}', budget_type='monthly',
+                category='Ops', budgeted_amount=Decimal('1000.00'), spent_amount=Decimal('100.00'),
+                start_date=today.date(), end_date=today.date()
+            )
+        CreditScore.objects.create(business=self.business, user=self.user, score=700)
+    
+    def _endpoints(self):
+        return {
+            'dashboard_data': '/api/finance/dashboard/',
+            'transaction_summary': f'/api/finance/transactions/summary/?business={self.business.id}',
+            'business_admin_dashboard': f'/api/users/business/{self.business.id}/dashboard/',
+            'user_dashboard': '/api/users/user/dashboard/',
+        }
+    
+    def _count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return len(context.captured_queries)
+    
+    def test_query_count_per_endpoint(self):
+        """Each endpoint stays within its query budget"""
+        self._seed(3)
+        for name, url in self._endpoints().items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(self._count_queries(url), self.EXPECTED_QUERIES[name])
+    
+    def test_query_count_independent_of_row_count(self):
+        """Query count does not grow with the number of rows"""
+        self._seed(2)
+        small = {name: self._count_queries(url) for name, url in self._endpoints().items()}
+        self._seed(12)
+        large = {name: self._count_queries(url) for name, url in self._endpoints().items()}
+        self.assertEqual(small, large)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardCacheInvalidationTest(APITestCase):
+    """Test version-based invalidation of cached dashboard responses"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.business = Business.objects.create(
+            owner=self.user,
+            legal_name='Test Business'
+        )
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def _income(self, amount):
+        return Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal(amount),
+            transaction_type='income', payment_method='mpesa',
+            description='Sale', transaction_date=timezone.now()
+        )
+    
+    def test_write_invalidates_any_period(self):
+        """A new transaction invalidates cached dashboards for non-standard periods"""
+        self._income('100.00')
+        url = f'/api/finance/dashboard/?business_id={self.business.id}&period=45'
+        
+        first = self.client.get(url)
+        self.assertEqual(first.data['summary']['total_income'], Decimal('100.00'))
+        
+        self._income('50.00')
+        second = self.client.get(url)
+        self.assertEqual(second.data['summary']['total_income'], Decimal('150.00'))
+    
+    def test_unrelated_models_invalidate(self):
+        """Invoice and credit score writes invalidate the cached dashboard"""
+        url = '/api/finance/dashboard/'
+        self.assertIsNone(self.client.get(url).data['credit_score'])
+        
+        CreditScore.objects.create(business=self.business, user=self.user, score=720)
+        self.assertEqual(self.client.get(url).data['credit_score']['score'], 720)
+    
+    def test_cached_response_is_reused(self):
+        """Unchanged data is served from the cache"""
+        url = '/api/finance/dashboard/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        # Only the JWT user lookup hits the database
+        self.assertEqual(len(context.captured_queries), 1)
+    
+    def test_version_bumps_are_scoped(self):
+        """Bumping one business's version leaves other businesses untouched"""
+        other = Business.objects.create(owner=self.user, legal_name='Other Business')
+        other_before = get_business_cache_version(other.id)
+        own_before = get_business_cache_version(self.business.id)
+        self._income('10.00')
+        self.assertEqual(get_business_cache_version(other.id), other_before)
+        self.assertGreater(get_business_cache_version(self.business.id), own_before)
+    
+    def test_bump_of_missing_version_keeps_concurrent_seed(self):
+        """A bump that loses the race to seed a missing version increments the winner's"""
+        key = f'cache_version:business_{self.business.id}'
+        cache.delete(key)
+        real_add = cache.add
+        
+        def add_after_other_process(k, value, timeout=None):
+            # Another process seeds and bumps the key between our incr and add
+            cache.set(k, 5)
+            return real_add(k, value, timeout)
+        
+        with mock.patch.object(cache, 'add', side_effect=add_after_other_process):
+            self.assertEqual(bump_business_cache_version(self.business.id), 6)
+        self.assertEqual(cache.get(key), 6)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Test cursor pagination of the finance list endpoints"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pageuser', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Page Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        # Several transactions share a timestamp so the id tie-breaker matters
+        dates = ['2024-01-01T10:00:00Z'] * 3 + ['2024-01-02T10:00:00Z'] * 2 + ['2024-01-03T10:00:00Z'] * 2
+        for index, date in enumerate(dates):
+            Transaction.objects.create(
+                business=self.business, user=self.user, amount=Decimal('10.00') + index,
+                transaction_type='income', payment_method='mpesa', description=f'Txn {index}',
+                transaction_date=date
+            )
+        self.expected = list(
+            Transaction.objects.order_by('-transaction_date', '-id').values_list('id', flat=True)
+        )
+    
+    def collect(self, url, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[direction]
+        return pages
+    
+    def test_walks_every_row_once_in_order(self):
+        """Following next links returns each transaction once, in keyset order"""
+        pages = self.collect('/api/finance/transactions/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([row for page in pages for row in page], [str(pk) for pk in self.expected])
+    
+    def test_previous_links_walk_back(self):
+        """Previous links return the same pages in reverse"""
+        forward = self.collect('/api/finance/transactions/?page_size=3')
+        response = self.client.get('/api/finance/transactions/?page_size=3')
+        last_url = response.data['next']
+        last_url = self.client.get(last_url).data['next']
+        backward = self.collect(last_url, direction='previous')
+        self.assertEqual(backward, list(reversed(forward)))
+    
+    def test_page_size_cap_is_opt_in(self):
+        """page_size is capped per viewset and ignored where not enabled"""
+        from unittest import mock
+        from .views import TransactionViewSet
+        with mock.patch.object(TransactionViewSet, 'max_page_size', 5):
+            response = self.client.get('/api/finance/transactions/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 5)
+        
+        with mock.patch.object(TransactionViewSet, 'max_page_size', None), \
+                mock.patch.object(TransactionViewSet, 'page_size', 4, create=True):
+            response = self.client.get('/api/finance/transactions/?page_size=1')
+        self.assertEqual(len(response.data['results']), 4)
+    
+    def test_deep_pages_do_not_use_offset(self):
+        """Later pages are selected by keyset filter, not OFFSET"""
+        response = self.client.get('/api/finance/transactions/?page_size=2')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        page_sql = [q['sql'] for q in queries.captured_queries if 'finance_transaction' in q['sql']]
+        self.assertTrue(page_sql)
+        self.assertFalse(any('OFFSET' in sql for sql in page_sql))
+    
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/finance/transactions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_invoice_list_is_paginated(self):
+        """Invoices paginate on (issue_date, id)"""
+        for number in range(3):
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'PAGE-{number}',
+                customer_name='Customer', subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                issue_date=f'2024-01-0{number + 1}', due_date='2024-02-01'
+            )
+        pages = self.collect('/api/finance/invoices/?page_size=2')
+        numbers = [
+            Invoice.objects.get(id=pk).invoice_number for page in pages for pk in page
+        ]
+        self.assertEqual(numbers, ['PAGE-2', 'PAGE-1', 'PAGE-0'])
+
+
+class ListQueryPlanTest(APITestCase):
+    """Test harness: list endpoints issue a constant number of queries regardless of length"""
+    
+    LIST_ENDPOINTS = [
+        '/api/finance/transactions/',
+        '/api/finance/invoices/',
+        '/api/finance/budgets/',
+        '/api/finance/cash-flows/',
+        '/api/finance/forecasts/',
+        '/api/finance/credit-scores/',
+        '/api/finance/suppliers/',
+        '/api/users/customers/',
+    ]
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='planuser', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Plan Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.seeded = 0
+    
+    def _seed(self, rows):
+        from finance.models import Supplier
+        from users.models import Customer
+        today = timezone.now()
+        owned = {'business': self.business, 'user': self.user}
+        for _ in range(rows):
+            i = self.seeded = self.seeded + 1
+            Transaction.objects.create(
+                amount=Decimal('10.00'), transaction_type='income', payment_method='mpesa',
+                description='Seed', transaction_date=today, **owned
+            )
+            invoice = Invoice.objects.create(
+                invoice_number=f'PLAN-{i}', customer_name='Customer', subtotal=Decimal('10.00'),
+                total_amount=Decimal('10.00'), issue_date=today.date(), due_date=today.date(), **owned
+            )
+            InvoiceItem.objects.create(invoice=invoice, description='Item', quantity=1, unit_price=Decimal('10.00'))
+            InvoiceItem.objects.create(invoice=invoice, description='Item', quantity=2, unit_price=Decimal('10.00'))
+            Budget.objects.create(
+                name=f'Budget {i}', budget_type='monthly', category='Ops', budgeted_amount=Decimal('100.00'),
+                start_date=today.date(), end_date=today.date(), **owned
+            )
+            CashFlow.objects.create(
+                flow_type='inflow', category='Sales', amount=Decimal('10.00'),
+                period_start=today.date(), period_end=today.date(), **owned
+            )
+            FinancialForecast.objects.create(
+                forecast_type='revenue', name=f'Forecast {i}', forecast_data={}, confidence_score=Decimal('80.00'),
+                forecast_start=today.date(), forecast_end=today.date(), **owned
+            )
+            CreditScore.objects.create(score=650, **owned)
+            Supplier.objects.create(supplier_name=f'Supplier {i}', phone_number='0700000000', **owned)
+            Customer.objects.create(
+                business=self.business, owner=self.user, onboarded_by=self.user,
+                customer_name=f'Customer {i}', email=f'c{i}@example.com', phone_number='0700000000'
+            )
+    
+    def _count_queries(self):
+        counts = {}
+        for url in self.LIST_ENDPOINTS:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertEqual(len(response.data['results']), self.seeded, url)
+            counts[url] = len(context.captured_queries)
+        return counts
+    
+    def test_query_count_independent_of_list_length(self):
+        self._seed(2)
+        small = self._count_queries()
+        self._seed(20)
+        large = self._count_queries()
+        self.assertEqual(small, large)
+    
+    def test_invoice_items_are_prefetched(self):
+        """Nested invoice items come from one prefetch query"""
+        self._seed(5)
+        response = self.client.get('/api/finance/invoices/')
+        self.assertEqual([len(invoice['items']) for invoice in response.data['results']], [2] * 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TransactionImportTest(APITestCase):
+    """Test bulk transaction import (endpoint and management command)"""
+    
+    CSV_DATA = (
+        "transaction_date,amount,transaction_type,payment_method,description,category,external_id,tags\n"
+        "2024-01-01,1000.00,income,mpesa,Sale,Sales,MP001,\n"
+        "2024-01-01 14:30:00,\"1,250.50\",Income,MPESA,Sale,Sales,MP002,retail;walk-in\n"
+        "2024-01-02,300.00,expense,cash,Fuel,Transport,,\n"
+        "2024-01-02,-5,expense,cash,Bad amount,Transport,,\n"
+        "not-a-date,10,expense,barter,Bad row,Misc,,\n"
+    )
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Import Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def upload(self, content, name, business=None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(
+            '/api/finance/transactions/import/',
+            {'file': upload, 'business': business or self.business.id},
+            format='multipart'
+        )
+    
+    def test_csv_import_with_error_report(self):
+        version = get_business_cache_version(self.business.id)
+        response = self.upload(self.CSV_DATA, 'statement.csv')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rows'], 5)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['error_count'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            set(response.data['errors'][1]['errors']), {'transaction_date', 'payment_method'}
+        )
+        
+        imported = Transaction.objects.get(external_id='MP002')
+        self.assertEqual(imported.amount, Decimal('1250.50'))
+        self.assertEqual(imported.payment_method, 'mpesa')
+        self.assertEqual(imported.tags, ['retail', 'walk-in'])
+        self.assertEqual(imported.user, self.user)
+        self.assertNotEqual(get_business_cache_version(self.business.id), version)
+    
+    def test_import_updates_rollups(self):
+        """Rollups written by the importer match a full rebuild"""
+        self.upload(self.CSV_DATA, 'statement.csv')
+        fields = ('day', 'transaction_type', 'category', 'payment_method', 'transaction_count', 'total_amount')
+        imported = sorted(TransactionDailyRollup.objects.values_list(*fields))
+        call_command('backfill_transaction_rollups', stdout=StringIO())
+        self.assertEqual(imported, sorted(TransactionDailyRollup.objects.values_list(*fields)))
+        self.assertEqual(sum(row[4] for row in imported), 3)
+    
+    def test_jsonl_import_skips_duplicates(self):
+        lines = [
+            {'transaction_date': '2024-02-01T09:00:00Z', 'amount': '50.00', 'transaction_type': 'income',
+             'payment_method': 'mpesa', 'description': 'Till', 'external_id': 'MP100'},
+            {'transaction_date': '2024-02-01T09:05:00Z', 'amount': '75.00', 'transaction_type': 'income',
+             'payment_method': 'mpesa', 'description': 'Till', 'external_id': 'MP100'},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines) + '\n{broken\n'
+        response = self.upload(content, 'mpesa.jsonl')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['skipped_duplicates'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+        
+        # Re-importing the same file creates nothing new
+        response = self.upload(content, 'mpesa.jsonl')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['skipped_duplicates'], 2)
+        self.assertEqual(Transaction.objects.filter(external_id='MP100').count(), 1)
+    
+    def test_malformed_csv_is_rejected(self):
+        header = self.CSV_DATA.splitlines()[0]
+        # The csv module refuses fields over its size limit
+        response = self.upload(f"{header}\n2024-01-01,1.00,income,cash,{'x' * 200000},Sales,,\n", 'huge.csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Malformed CSV', response.data['error'])
+    
+    def test_malformed_csv_reports_rows_imported_before_it(self):
+        from .services.imports import import_transactions
+        header, *rows = self.CSV_DATA.splitlines()
+        content = '\n'.join([header, *rows[:3], f"2024-01-03,1.00,income,cash,{'x' * 200000},Sales,,", rows[0]])
+        
+        response = self.upload(content, 'huge.csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], response.data['file_error'])
+        self.assertIn('stopped after row 3', response.data['error'])
+        self.assertEqual((response.data['rows'], response.data['created']), (3, 3))
+        
+        # Chunks committed before the fault stay committed, and so does the partial chunk
+        Transaction.objects.all().delete()
+        result = import_transactions(BytesIO(content.encode()), 'csv', self.business, self.user, batch_size=2)
+        self.assertEqual((result.rows, result.created), (3, 3))
+        self.assertEqual(Transaction.objects.count(), 3)
+    
+    def test_import_requires_membership(self):
+        other = Business.objects.create(owner=self.user, legal_name='Not Mine')
+        response = self.upload(self.CSV_DATA, 'statement.csv', business=other.id)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Transaction.objects.exists())
+    
+    def test_management_command(self):
+        import tempfile, os
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(self.CSV_DATA)
+        try:
+            out, err = StringIO(), StringIO()
+            call_command(
+                'import_transactions', handle.name, business=self.business.id, user='importer',
+                batch_size=2, stdout=out, stderr=err
+            )
+        finally:
+            os.unlink(handle.name)
+        self.assertEqual(Transaction.objects.filter(business=self.business).count(), 3)
+        self.assertIn('Imported 3 of 5 rows', out.getvalue())
+        self.assertIn('Row 4', err.getvalue())
+
+
+class CreditScoringEngineTest(TestCase):
+    """Test the vectorized credit scoring engine"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='scorer', password='testpass123')
+        self.business = Business.objects.create(
+            owner=self.user, legal_name='Scored Business', year_founded=timezone.now().year - 6,
+            business_model='B2B', employee_count=12
+        )
+        self.empty = Business.objects.create(owner=self.user, legal_name='Empty Business')
+        for amount, transaction_type, month in [
+            (100, 'income', 1), (200, 'income', 2), (300, 'income', 3), (400, 'income', 4),
+            (150, 'expense', 2), (350, 'expense', 4),
+        ]:
+            Transaction.objects.create(
+                business=self.business, user=self.user, amount=Decimal(amount),
+                transaction_type=transaction_type, payment_method='mpesa', description='Seed',
+                transaction_date=f'2024-{month:02d}-15T10:00:00Z'
+            )
+        for number, invoice_status in enumerate(['paid', 'paid', 'paid', 'overdue']):
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'CS-{number}',
+                customer_name='Customer', subtotal=Decimal('10.00'), total_amount=Decimal('10.00'),
+                status=invoice_status, issue_date='2024-01-01', due_date='2024-02-01'
+            )
+    
+    def test_factors(self):
+        from .services.credit_scoring import CreditScoringEngine
+        factors = CreditScoringEngine().compute_factors([self.business.id, self.empty.id])
+        
+        scored = factors[self.business.id]
+        self.assertEqual(scored['payment_history'], 75.0)
+        self.assertEqual(scored['credit_utilization'], 50.0)
+        self.assertEqual(scored['debt_to_income'], 50.0)
+        self.assertEqual(scored['business_age'], 80.0)
+        # Income 100..400: mean 250, population std ~111.8, CV ~0.447
+        self.assertAlmostEqual(scored['revenue_stability'], 55.28, places=2)
+        # Rolling 3-month means 200 and 300: CV 20%
+        self.assertAlmostEqual(scored['monthly_revenue_volatility'], 20.0, places=2)
+        
+        empty = factors[self.empty.id]
+        self.assertEqual(empty['payment_history'], 100.0)
+        self.assertEqual(empty['credit_utilization'], 0.0)
+        self.assertEqual(empty['revenue_stability'], 50.0)
+        self.assertEqual(empty['business_age'], 50.0)
+        self.assertIsNone(empty['monthly_revenue_volatility'])
+    
+    def test_batch_query_count_is_constant(self):
+        """Scoring many businesses costs the same queries as scoring one"""
+        from .services.credit_scoring import CreditScoringEngine
+        for number in range(5):
+            Business.objects.create(owner=self.user, legal_name=f'Batch {number}')
+        ids = list(Business.objects.values_list('id', flat=True))
+        
+        with CaptureQueriesContext(connection) as single:
+            CreditScoringEngine().score_businesses([self.business.id])
+        with CaptureQueriesContext(connection) as batch:
+            results = CreditScoringEngine().score_businesses(ids)
+        self.assertEqual(len(single.captured_queries), 3)
+        self.assertEqual(len(batch.captured_queries), 3)
+        self.assertEqual(set(results), set(ids))
+        self.assertTrue(all(300 <= result['score'] <= 850 for result in results.values()))
+    
+    def test_analyzer_uses_engine(self):
+        from .services.ai_services import AIFinancialAnalyzer
+        result = AIFinancialAnalyzer().calculate_credit_score(self.business.id, self.user.id)
+        credit_score = CreditScore.objects.get(id=result['credit_score_id'])
+        self.assertEqual(credit_score.payment_history, Decimal('75.00'))
+        self.assertEqual(credit_score.revenue_stability, Decimal('55.28'))
+        self.assertEqual(
+            result['score'],
+            AIFinancialAnalyzer().calculate_credit_scores([self.business.id], user_id=self.user.id)[self.business.id]['score']
+        )
+    
+    def test_rolling_volatility_ignores_months_outside_history(self):
+        """Another business's longer history does not pad this one's rolling windows"""
+        from .services.credit_scoring import CreditScoringEngine
+        other = Business.objects.create(owner=self.user, legal_name='Older Business')
+        Transaction.objects.create(
+            business=other, user=self.user, amount=Decimal('50.00'), transaction_type='income',
+            payment_method='cash', description='Seed', transaction_date='2023-06-15T10:00:00Z'
+        )
+        factors = CreditScoringEngine().compute_factors([self.business.id, other.id])
+        self.assertAlmostEqual(factors[self.business.id]['monthly_revenue_volatility'], 20.0, places=2)
+        self.assertIsNone(factors[other.id]['monthly_revenue_volatility'])
+
+
+class RecomputeCreditScoresCommandTest(TestCase):
+    """Test the batch credit score recomputation command"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='batchowner', password='testpass123')
+        self.businesses = [
+            Business.objects.create(owner=self.user, legal_name=f'Batch Business {number}')
+            for number in range(3)
+        ]
+        for business in self.businesses:
+            Transaction.objects.create(
+                business=business, user=self.user, amount=Decimal('500.00'), transaction_type='income',
+                payment_method='mpesa', description='Seed', transaction_date='2024-03-01T10:00:00Z'
+            )
+    
+    def run_command(self, **options):
+        out = StringIO()
+        call_command('recompute_credit_scores', workers=1, chunk_size=2, stdout=out, **options)
+        return out.getvalue()
+    
+    def test_scores_every_business(self):
+        output = self.run_command()
+        self.assertEqual(CreditScore.objects.count(), 3)
+        self.assertIn('Scored 3 businesses, skipped 0 unchanged', output)
+        self.assertIn('3/3 businesses', output)
+        score = CreditScore.objects.get(business=self.businesses[0])
+        self.assertEqual(score.user, self.user)
+        self.assertEqual(score.score_category, CreditScore.categorize(score.score))
+        self.assertTrue(score.data_fingerprint)
+    
+    def test_skips_unchanged_businesses(self):
+        self.run_command()
+        output = self.run_command()
+        self.assertIn('Scored 0 businesses, skipped 3 unchanged', output)
+        self.assertEqual(CreditScore.objects.count(), 3)
+        
+        # New data or a deleted row marks the business as changed
+        Transaction.objects.filter(business=self.businesses[1]).delete()
+        Invoice.objects.create(
+            business=self.businesses[2], user=self.user, invoice_number='BATCH-1', customer_name='Customer',
+            subtotal=Decimal('10.00'), total_amount=Decimal('10.00'), issue_date='2024-03-01', due_date='2024-04-01'
+        )
+        output = self.run_command()
+        self.assertIn('Scored 2 businesses, skipped 1 unchanged', output)
+        
+        output = self.run_command(force=True)
+        self.assertIn('Scored 3 businesses, skipped 0 unchanged', output)
+    
+    def test_calculate_score_endpoint_uses_history(self):
+        """The on-demand endpoint computes a real score instead of a placeholder"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = client.post(
+            '/api/finance/credit-scores/calculate_score/', {'business_id': self.businesses[0].id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(response.data['payment_history']), Decimal('100.00'))
+        self.assertEqual(Decimal(response.data['credit_utilization']), Decimal('0.00'))
+
+
+class ForecastEngineTest(TestCase):
+    """Test the statistical forecasting engine and its incremental refits"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='forecaster', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Forecast Business')
+        # Steady revenue growth through 2024, with March missing entirely
+        for month in range(1, 13):
+            if month != 3:
+                self._income(2024, month, 1000 + 100 * month)
+        self._expense(2024, 6, 500)
+    
+    def _create(self, year, month, amount, transaction_type):
+        return Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal(amount),
+            transaction_type=transaction_type, payment_method='mpesa', description='Seed',
+            transaction_date=f'{year}-{month:02d}-10T10:00:00Z'
+        )
+    
+    def _income(self, year, month, amount):
+        return self._create(year, month, amount, 'income')
+    
+    def _expense(self, year, month, amount):
+        return self._create(year, month, amount, 'expense')
+    
+    def _engine(self, year, month):
+        from .services.forecasting import ForecastEngine
+        return ForecastEngine(now=timezone.make_aware(timezone.datetime(year, month, 5)))
+    
+    def _generate(self, year, month, forecast_type='revenue'):
+        from .services.forecasting import generate_forecast
+        return generate_forecast(
+            self.business, self.user, forecast_type, 6,
+            now=timezone.make_aware(timezone.datetime(year, month, 5))
+        )
+    
+    def test_monthly_series_single_query(self):
+        engine = self._engine(2025, 1)
+        with self.assertNumQueries(1):
+            months, series = engine.monthly_series(self.business.id)
+        
+        self.assertEqual(len(months), 12)
+        self.assertEqual(series['income'][2], 0)  # gap filled
+        self.assertEqual(series['income'][11], 2200)
+        self.assertEqual(series['expense'][5], 500)
+        self.assertEqual(series['net'][5], 1100)
+    
+    def test_forecast_follows_trend(self):
+        forecast = self._generate(2025, 1)
+        data = forecast.forecast_data
+        
+        self.assertEqual(data['periods'], ['2025-01', '2025-02', '2025-03', '2025-04', '2025-05', '2025-06'])
+        self.assertEqual(data['trend'], 'growing')
+        self.assertEqual(data['method'], 'linear_trend')
+        self.assertGreater(data['monthly_forecast'][-1], data['monthly_forecast'][0])
+        self.assertEqual(forecast.model_version, 'stats-v1')
+        self.assertEqual(str(forecast.forecast_start), '2025-01-01')
+        self.assertEqual(str(forecast.forecast_end), '2025-06-30')
+        self.assertEqual(forecast.training_data_period, '12 months')
+    
+    def test_new_months_roll_model_forward(self):
+        from .services.forecasting import fit_linear_trend
+        first = self._generate(2025, 1).forecast_data['model']
+        self.assertEqual(first['updates_since_fit'], 0)
+        
+        self._income(2025, 1, 2300)
+        self._income(2025, 2, 2400)
+        second = self._generate(2025, 3).forecast_data['model']
+        self.assertEqual(second['updates_since_fit'], 2)
+        self.assertEqual(second['months'], 14)
+        
+        # Rolling the sufficient statistics forward matches a full refit
+        months, series = self._engine(2025, 3).monthly_series(self.business.id)
+        refit, _ = fit_linear_trend(series['income'])
+        for key, value in refit.items():
+            self.assertAlmostEqual(second['params'][key], value, places=6)
+        
+        # Editing an already-fitted month forces a full refit
+        self._income(2024, 3, 1300)
+        third = self._generate(2025, 3).forecast_data['model']
+        self.assertEqual(third['updates_since_fit'], 0)
+    
+    def test_no_history(self):
+        Transaction.objects.all().delete()
+        data = self._generate(2025, 1, 'cash_flow').forecast_data
+        self.assertEqual(data['monthly_forecast'], [0.0] * 6)
+        self.assertEqual(data['trend'], 'stable')
+        self.assertIsNone(data['model'])
+
+
+@override_settings(AI_LLM_BACKEND='fake', AI_JOBS_MAX_PENDING_PER_USER=2)
+class AIJobQueueTest(APITestCase):
+    """Test the AI job queue endpoints and worker"""
+    
+    def setUp(self):
+        from .services.llm import get_llm
+        self.user = User.objects.create_user(username='asker', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='AI Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal('1500.00'), transaction_type='income',
+            payment_method='mpesa', description='Sale', transaction_date=timezone.now()
+        )
+        self.llm = get_llm()
+        self.llm.reset()
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+    
+    def submit(self, kind, payload=None):
+        return self.client.post(
+            '/api/finance/ai-jobs/', {'business_id': self.business.id, 'kind': kind, 'payload': payload or {}},
+            format='json'
+        )
+    
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_ai_jobs', '--burst', '--concurrency', '1', stdout=out)
+        return out.getvalue()
+    
+    def test_submit_poll_result(self):
+        self.llm.reset(responses=['You should chase overdue invoices.'])
+        response = self.submit('chat', {'question': 'How do I improve cash flow?'})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertFalse(response.data['deduplicated'])
+        job_id = response.data['id']
+        
+        result = self.client.get(f'/api/finance/ai-jobs/{job_id}/result/')
+        self.assertEqual(result.status_code, status.HTTP_202_ACCEPTED)
+        # Nothing reaches the LLM until the worker runs
+        self.assertEqual(self.llm.prompts, [])
+        
+        output = self.run_worker()
+        self.assertIn('Processed 1 jobs (1 succeeded, 0 failed, 0 retried)', output)
+        self.assertIn('How do I improve cash flow?', self.llm.prompts[0])
+        self.assertIn('1500.0', self.llm.prompts[0])
+        
+        poll = self.client.get(f'/api/finance/ai-jobs/{job_id}/')
+        self.assertEqual(poll.data['status'], 'succeeded')
+        result = self.client.get(f'/api/finance/ai-jobs/{job_id}/result/')
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['result']['answer'], 'You should chase overdue invoices.')
+    
+    def test_health_and_forecast_jobs(self):
+        self.llm.reset(default=json.dumps({'health_score': 72, 'summary': 'Solid'}))
+        health = self.submit('health_analysis').data['id']
+        narrative = self.submit('forecast_narrative', {'forecast_type': 'revenue'}).data['id']
+        self.run_worker()
+        
+        health = AIJob.objects.get(id=health)
+        self.assertEqual(health.status, 'succeeded')
+        self.assertEqual(health.result['analysis']['health_score'], 72)
+        self.assertEqual(health.result['context']['transactions']['total_income'], 1500.0)
+        
+        narrative = AIJob.objects.get(id=narrative)
+        self.assertEqual(narrative.status, 'succeeded')
+        # The statistical forecast is generated first and only explained by the LLM
+        forecast = FinancialForecast.objects.get(id=narrative.result['forecast_id'])
+        self.assertEqual(forecast.model_version, 'stats-v1')
+        self.assertEqual(narrative.result['narrative']['summary'], 'Solid')
+    
+    def test_staff_context_is_limited_to_their_records(self):
+        staff = User.objects.create_user(username='ai-staff', password='testpass123')
+        Membership.objects.create(user=staff, business=self.business, role_in_business='staff')
+        Transaction.objects.create(
+            business=self.business, user=staff, amount=Decimal('200.00'), transaction_type='income',
+            payment_method='cash', description='Staff sale', transaction_date=timezone.now()
+        )
+        self.llm.reset(default='Keep going.')
+        admin_job = self.submit('chat', {'question': 'How are sales?'}).data['id']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(staff).access_token}')
+        staff_job = self.submit('chat', {
+            'question': 'How are sales?', 'context': {'scope': 'business'}
+        }).data['id']
+        self.run_worker()
+        
+        self.assertIn('1700.0', self.llm.prompts[0])
+        # Staff see only their own figures and never get the business-wide cached answer
+        self.assertEqual(len(self.llm.prompts), 2)
+        self.assertIn('200.0', self.llm.prompts[1])
+        self.assertNotIn('1700.0', self.llm.prompts[1])
+        self.assertIn(f'user_{staff.id}', self.llm.prompts[1])
+        self.assertIsNone(AIJob.objects.get(id=staff_job).result['cached'])
+        self.assertEqual(AIJob.objects.get(id=admin_job).status, 'succeeded')
+    
+    def test_duplicate_requests_share_a_job(self):
+        first = self.submit('chat', {'question': 'Should I hire?'})
+        second = self.submit('chat', {'question': ' Should I hire? '})
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertTrue(second.data['deduplicated'])
+        
+        # Still shared after it succeeds, within the dedup window
+        self.run_worker()
+        third = self.submit('chat', {'question': 'Should I hire?'})
+        self.assertEqual(third.data['id'], first.data['id'])
+        self.assertEqual(AIJob.objects.count(), 1)
+        self.assertEqual(len(self.llm.prompts), 1)
+        
+        # A differently worded duplicate is a new job, answered from the response cache
+        fourth = self.submit('chat', {'question': 'should i hire'})
+        self.assertNotEqual(fourth.data['id'], first.data['id'])
+        self.run_worker()
+        self.assertEqual(AIJob.objects.get(id=fourth.data['id']).result['cached'], 'exact')
+        self.assertEqual(len(self.llm.prompts), 1)
+    
+    def test_pending_job_limit_and_validation(self):
+        self.assertEqual(self.submit('chat', {'question': 'One'}).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.submit('chat', {'question': 'Two'}).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.submit('chat', {'question': 'Three'}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        self.assertEqual(self.submit('chat', {}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.submit('poetry').status_code, status.HTTP_400_BAD_REQUEST)
+        
+        other = Business.objects.create(owner=self.user, legal_name='Not A Member')
+        response = self.client.post(
+            '/api/finance/ai-jobs/', {'business_id': other.id, 'kind': 'health_analysis'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    @override_settings(AI_JOBS_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_failed(self):
+        from .services.llm import LLMError
+        self.llm.reset(responses=[LLMError('timeout'), LLMError('timeout')])
+        job_id = self.submit('health_analysis').data['id']
+        
+        with self.assertLogs('finance.services.ai_jobs', 'WARNING'):
+            self.assertIn('0 succeeded, 0 failed, 1 retried', self.run_worker())
+        job = AIJob.objects.get(id=job_id)
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_after, timezone.now())
+        
+        AIJob.objects.filter(id=job_id).update(run_after=timezone.now())
+        with self.assertLogs('finance.services.ai_jobs', 'WARNING'):
+            self.assertIn('0 succeeded, 1 failed, 0 retried', self.run_worker())
+        result = self.client.get(f'/api/finance/ai-jobs/{job_id}/result/')
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['status'], 'failed')
+        self.assertEqual(result.data['error'], 'timeout')
+
+
+class ChatMemoryAndSharedChainsTest(TestCase):
+    """Test the bounded chat memory and lazy, shared LangChain construction"""
+    
+    def test_memory_is_bounded(self):
+        from .services.chat_memory import ConversationMemoryStore
+        store = ConversationMemoryStore(max_sessions=2, max_turns=3, ttl=3600)
+        for turn in range(5):
+            store.append('a', f'q{turn}', f'a{turn}')
+        self.assertEqual(store.history('a'), [('q2', 'a2'), ('q3', 'a3'), ('q4', 'a4')])
+        
+        store.append('b', 'q', 'a')
+        store.history('a')  # 'a' is now the most recently used
+        store.append('c', 'q', 'a')
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.history('b'), [])
+        self.assertEqual(len(store.history('a')), 3)
+        
+        # Anonymous chats are not remembered
+        store.append(None, 'q', 'a')
+        self.assertEqual(store.history(None), [])
+    
+    def test_idle_sessions_expire(self):
+        from .services.chat_memory import ConversationMemoryStore
+        store = ConversationMemoryStore(ttl=60)
+        with mock.patch('finance.services.chat_memory.time.monotonic', return_value=1000.0):
+            store.append('a', 'q', 'a')
+        with mock.patch('finance.services.chat_memory.time.monotonic', return_value=1061.0):
+            self.assertEqual(store.history('a'), [])
+            self.assertEqual(len(store), 0)
+    
+    def test_chains_are_built_once_on_first_use(self):
+        from .services import langchain_service
+        built = []
+        
+        def factory():
+            built.append(1)
+            return object()
+        
+        with mock.patch.dict(langchain_service._shared, clear=True):
+            langchain_service.FinancialChatbot()
+            langchain_service.LangChainFinancialAdvisor()
+            self.assertEqual(langchain_service._shared, {})
+            
+            first = langchain_service._get_shared('chain:test', factory)
+            second = langchain_service._get_shared('chain:test', factory)
+            self.assertIs(first, second)
+            self.assertEqual(len(built), 1)
+
+
+@override_settings(AI_RESPONSE_CACHE_FUZZY=True, AI_RESPONSE_CACHE_SIMILARITY=0.9)
+class ResponseCacheTest(TestCase):
+    """Test the LLM response cache"""
+    
+    def setUp(self):
+        from .services.response_cache import ResponseCache, reset_response_cache_stats
+        cache.clear()
+        reset_response_cache_stats()
+        self.user = User.objects.create_user(username='cached', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Cached Business')
+        self.cache = ResponseCache('chat')
+        self.context = {'total_income': 1000}
+    
+    def test_exact_hits_ignore_case_and_punctuation(self):
+        self.assertEqual(self.cache.lookup(self.business.id, 'How is my cash flow?', self.context), (None, None))
+        self.cache.store(self.business.id, 'How is my cash flow?', self.context, 'Healthy')
+        
+        self.assertEqual(self.cache.lookup(self.business.id, 'how is my  CASH flow', self.context), ('Healthy', 'exact'))
+        # Different business context, different answer
+        self.assertEqual(self.cache.lookup(self.business.id, 'How is my cash flow?', {'total_income': 5}), (None, None))
+    
+    def test_data_changes_invalidate_business_entries(self):
+        self.cache.store(self.business.id, 'How is my cash flow?', self.context, 'Healthy')
+        Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal('10.00'), transaction_type='expense',
+            payment_method='cash', description='Change', transaction_date=timezone.now()
+        )
+        self.assertEqual(self.cache.lookup(self.business.id, 'How is my cash flow?', self.context), (None, None))
+    
+    def test_fuzzy_hits_require_the_same_numbers(self):
+        self.cache.store(self.business.id, 'Should I hire more staff?', self.context, 'Not yet')
+        self.cache.store(self.business.id, 'What were my expenses in 2023?', self.context, 'KES 10,000')
+        
+        self.assertEqual(
+            self.cache.lookup(self.business.id, 'should I hire more staff now?', self.context), ('Not yet', 'fuzzy')
+        )
+        self.assertEqual(self.cache.lookup(self.business.id, 'What were my expenses in 2024?', self.context), (None, None))
+        self.assertEqual(self.cache.lookup(self.business.id, 'How can I increase sales?', self.context), (None, None))
+    
+    def test_hit_ratio_metric(self):
+        from .services.response_cache import response_cache_stats
+        self.cache.get_or_compute(self.business.id, 'How is my cash flow?', self.context, lambda: 'Healthy')
+        self.cache.get_or_compute(self.business.id, 'How is my cash flow', self.context, lambda: 'Recomputed')
+        self.cache.get_or_compute(self.business.id, 'Should I hire more staff?', self.context, lambda: 'Not yet')
+        self.cache.get_or_compute(self.business.id, 'Should I hire more staff now?', self.context, lambda: 'Later')
+        
+        stats = response_cache_stats()
+        self.assertEqual((stats['hits'], stats['fuzzy_hits'], stats['misses']), (1, 1, 2))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        
+        admin = User.objects.create_superuser(username='admin', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/finance/ai-cache/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/finance/ai-cache/stats/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(AI_LLM_BACKEND='fake')
+class ChatStreamTest(APITestCase):
+    """Test the streaming chat endpoint"""
+    
+    answer = 'Your cash flow is healthy this month.'
+    
+    def setUp(self):
+        from .services.llm import get_llm
+        self.user = User.objects.create_user(username='streamer', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Stream Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        self.llm = get_llm('chat')
+        self.llm.reset(default=self.answer)
+        cache.clear()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+    
+    def ask(self, question='How is my cash flow?'):
+        return self.client.post(
+            '/api/finance/chat/stream/', {'business_id': self.business.id, 'question': question}, format='json'
+        )
+    
+    def parse(self, chunks):
+        events = []
+        for block in ''.join(chunks).split('\n\n'):
+            if block:
+                event, data = block.split('\n')
+                events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+    
+    def test_tokens_stream_before_the_answer_completes(self):
+        response = self.ask()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        chunks = iter(response.streaming_content)
+        first = [next(chunks).decode(), next(chunks).decode()]
+        # Only the first token has been generated when it reaches the client
+        self.assertEqual(self.llm.tokens_streamed, 1)
+        events = self.parse(first + [chunk.decode() for chunk in chunks])
+        
+        self.assertEqual(events[0], ('start', {'cached': None}))
+        tokens = [data['text'] for name, data in events if name == 'token']
+        self.assertEqual(len(tokens), len(self.answer.split()))
+        self.assertEqual(''.join(tokens), self.answer)
+        name, done = events[-1]
+        self.assertEqual(name, 'done')
+        self.assertEqual(done['answer'], self.answer)
+        self.assertLessEqual(done['first_token_ms'], done['total_ms'])
+    
+    def test_cached_answer_is_streamed_in_one_event(self):
+        b''.join(self.ask().streaming_content)
+        self.llm.reset(default='A different answer')
+        
+        events = self.parse(chunk.decode() for chunk in self.ask('how is my cash flow').streaming_content)
+        self.assertEqual(events[0], ('start', {'cached': 'exact'}))
+        self.assertEqual(events[1], ('token', {'text': self.answer}))
+        self.assertEqual(events[2][1]['answer'], self.answer)
+        self.assertEqual(self.llm.prompts, [])
+    
+    def test_llm_errors_and_invalid_requests(self):
+        self.llm.reset(responses=[RuntimeError('upstream timeout')])
+        with self.assertLogs('finance.services.chat_stream', 'WARNING'):
+            events = self.parse(chunk.decode() for chunk in self.ask().streaming_content)
+        self.assertEqual(events[-1], ('error', {'error': 'upstream timeout'}))
+        
+        self.assertEqual(self.ask('').status_code, status.HTTP_400_BAD_REQUEST)
+        other = Business.objects.create(owner=self.user, legal_name='Not a member')
+        response = self.client.post(
+            '/api/finance/chat/stream/', {'business_id': other.id, 'question': 'Hi'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    async def test_asgi_requests_stream_asynchronously(self):
+        from django.test import AsyncClient
+        self.llm.reset(default=self.answer, token_delay=0.01)
+        response = await AsyncClient().post(
+            '/api/finance/chat/stream/', {'business_id': str(self.business.id), 'question': 'Any advice?'},
+            content_type='application/json', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        
+        chunks = []
+        async for chunk in response.streaming_content:
+            chunks.append(chunk.decode())
+            if len(chunks) == 2:
+                self.assertEqual(self.llm.tokens_streamed, 1)
+        events = self.parse(chunks)
+        self.assertEqual(events[-1][1]['answer'], self.answer)
+
+
+class StubN8NServer:
+    """Local stand-in for the n8n webhook, run on a background thread.
+    
+    Records each request as (client port, JSON body) and answers with the
+    queued ``statuses`` in order, then 200, after ``delay`` seconds.
+    ``peak`` is the most requests it has handled at once.
+    """
+    
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        import threading
+        import time
+        stub = self
+        self.requests = []
+        self.statuses = []
+        self.delay = 0
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.requests.append((self.client_address[1], body))
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.active -= 1
+                code = stub.statuses.pop(0) if stub.statuses else 200
+                if body.get('workflow') == 'batch':
+                    reply = {'results': [{'workflow_id': f'wf-{i}'} for i in range(len(body['events']))]}
+                else:
+                    reply = {'workflow_id': f'wf-{len(stub.requests)}'}
+                data = json.dumps(reply).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/webhook'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class N8NAutomationTest(TestCase):
+    """Test the pooled n8n client against a local stub server"""
+    
+    def setUp(self):
+        self.stub = StubN8NServer()
+        self.addCleanup(self.stub.stop)
+        overrides = override_settings(
+            N8N_WEBHOOK_URL=self.stub.url, N8N_RETRY_BACKOFF=0, N8N_CIRCUIT_FAILURES=2, N8N_CIRCUIT_RESET_SECONDS=0.2
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='automator', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Automation Business')
+    
+    def service(self):
+        from .services.automation_service import N8NAutomationService
+        service = N8NAutomationService()
+        self.addCleanup(service.client.close)
+        return service
+    
+    def test_webhooks_reuse_one_connection(self):
+        service = self.service()
+        for _ in range(5):
+            result = service.trigger_mpesa_reconciliation(str(self.business.id), self.user.id)
+            self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(self.stub.requests), 5)
+        self.assertEqual(len({port for port, _ in self.stub.requests}), 1)
+    
+    def test_transient_errors_are_retried(self):
+        self.stub.statuses = [503, 502]
+        result = self.service().trigger_mpesa_reconciliation(str(self.business.id), self.user.id)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(self.stub.requests), 3)
+    
+    def test_circuit_opens_after_repeated_failures(self):
+        import time
+        service = self.service()
+        self.stub.statuses = [500, 500]
+        for _ in range(2):
+            self.assertIn('error', service.trigger_mpesa_reconciliation(str(self.business.id), self.user.id))
+        
+        result = service.trigger_mpesa_reconciliation(str(self.business.id), self.user.id)
+        self.assertIn('circuit is open', result['error'])
+        self.assertEqual(len(self.stub.requests), 2)
+        
+        time.sleep(0.25)
+        result = service.trigger_mpesa_reconciliation(str(self.business.id), self.user.id)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(service.client.breaker.state, 'closed')
+    
+    def test_daily_automation_sends_one_batch(self):
+        from .services.automation_service import AutomationWorkflowManager
+        today = timezone.now().date()
+        for number in range(3):
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'LATE-{number}',
+                customer_name='Customer', subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                status='sent', issue_date=today - timedelta(days=40), due_date=today - timedelta(days=10)
+            )
+        manager = AutomationWorkflowManager()
+        self.addCleanup(manager.n8n_service.client.close)
+        
+        summary = manager.process_daily_automation(str(self.business.id))
+        self.assertEqual(summary['tasks_processed'], 3)
+        self.assertTrue(all(task['result']['status'] == 'success' for task in summary['results']))
+        self.assertEqual(len(self.stub.requests), 1)
+        batch = self.stub.requests[0][1]
+        self.assertEqual(batch['workflow'], 'batch')
+        self.assertEqual({event['invoice_number'] for event in batch['events']}, {'LATE-0', 'LATE-1', 'LATE-2'})
+        self.assertEqual(Invoice.objects.filter(business=self.business, status='overdue').count(), 3)
+
+
+
+class DailyAutomationRunnerTest(TestCase):
+    """Test the daily automation runner across businesses"""
+    
+    def setUp(self):
+        self.stub = StubN8NServer()
+        self.addCleanup(self.stub.stop)
+        overrides = override_settings(N8N_WEBHOOK_URL=self.stub.url, N8N_RETRY_BACKOFF=0, N8N_BATCH_SIZE=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='runner', password='testpass123')
+        self.businesses = [
+            Business.objects.create(owner=self.user, legal_name=f'Runner {number}') for number in range(3)
+        ]
+        today = timezone.now().date()
+        for business in self.businesses:
+            for number in range(3):
+                Invoice.objects.create(
+                    business=business, user=self.user, invoice_number=f'R{business.id}-{number}',
+                    customer_name='Customer', subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                    status='sent', issue_date=today - timedelta(days=40), due_date=today - timedelta(days=number)
+                )
+    
+    def runner(self, webhook_concurrency):
+        from .services.automation_runner import DailyAutomationRunner
+        runner = DailyAutomationRunner(workers=1, webhook_concurrency=webhook_concurrency)
+        self.addCleanup(runner.manager.n8n_service.client.close)
+        return runner
+    
+    def test_overdue_invoices_are_flagged_in_one_update_per_business(self):
+        version = get_business_cache_version(self.businesses[0].id)
+        with CaptureQueriesContext(connection) as queries:
+            summary = self.runner(1).run()
+        
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "finance_invoice"')]
+        self.assertEqual(len(updates), 3)
+        # Two invoices per business are past due; the third is due today
+        self.assertEqual(summary['overdue_invoices'], 6)
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 6)
+        self.assertGreater(get_business_cache_version(self.businesses[0].id), version)
+        self.assertEqual((summary['events'], summary['delivered'], summary['webhooks']), (6, 6, 3))
+        self.assertEqual(set(summary['phases']), {'collect', 'dispatch', 'total'})
+    
+    def test_webhooks_are_sent_concurrently_up_to_the_cap(self):
+        self.stub.delay = 0.2
+        with override_settings(N8N_BATCH_SIZE=1):
+            summary = self.runner(3).run()
+        self.assertEqual(summary['webhooks'], 6)
+        self.assertEqual(self.stub.peak, 3)
+        # Six 0.2s calls, three at a time
+        self.assertLess(summary['phases']['dispatch'], 1.0)
+    
+    def test_command_reports_phase_times(self):
+        out = StringIO()
+        call_command('run_daily_automation', '--workers', '1', '--business', str(self.businesses[0].id), stdout=out)
+        output = out.getvalue()
+        self.assertIn('collect', output)
+        self.assertIn('dispatch', output)
+        self.assertIn('Processed 1 businesses: 2 invoices marked overdue, 2 events queued, 2 delivered', output)
+
+
+
+class OutboxTest(TestCase):
+    """Test the automation event outbox and its dispatcher"""
+    
+    def setUp(self):
+        self.stub = StubN8NServer()
+        self.addCleanup(self.stub.stop)
+        overrides = override_settings(
+            N8N_WEBHOOK_URL=self.stub.url, N8N_RETRY_BACKOFF=0, OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BASE_SECONDS=60
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='outbox', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Outbox Business')
+        today = timezone.now().date()
+        for number in range(5):
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'OUT-{number}',
+                customer_name='Customer', subtotal=Decimal('100.00'), total_amount=Decimal('100.00'),
+                status='sent', issue_date=today - timedelta(days=40), due_date=today - timedelta(days=5)
+            )
+    
+    def collect(self):
+        from .services.automation_service import AutomationWorkflowManager
+        manager = AutomationWorkflowManager()
+        self.addCleanup(manager.n8n_service.client.close)
+        return manager.collect_daily_tasks(str(self.business.id))
+    
+    def dispatcher(self, **kwargs):
+        from .services.outbox import OutboxDispatcher
+        dispatcher = OutboxDispatcher(**kwargs)
+        self.addCleanup(dispatcher.client.close)
+        return dispatcher
+    
+    def test_events_are_written_in_the_same_transaction(self):
+        with mock.patch('finance.services.automation_service.enqueue', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.collect()
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 0)
+        
+        self.collect()
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 5)
+        self.assertEqual(OutboxEvent.objects.filter(event_type='invoice_reminder', status='pending').count(), 5)
+        self.assertEqual(self.stub.requests, [])
+    
+    def test_dispatcher_batches_with_idempotency_keys(self):
+        from .services.outbox import enqueue
+        self.collect()
+        event = OutboxEvent.objects.first()
+        # Re-queueing the same change is a no-op
+        enqueue([(self.business.id, event.idempotency_key, event.payload)])
+        self.assertEqual(OutboxEvent.objects.count(), 5)
+        
+        totals = self.dispatcher(batch_size=2, concurrency=2).drain()
+        self.assertEqual((totals['sent'], totals['webhooks']), (5, 3))
+        self.assertEqual(OutboxEvent.objects.filter(status='sent').count(), 5)
+        keys = [item['idempotency_key'] for _, body in self.stub.requests for item in body['events']]
+        self.assertEqual(sorted(keys), sorted(OutboxEvent.objects.values_list('idempotency_key', flat=True)))
+        self.assertEqual(self.dispatcher().drain()['claimed'], 0)
+    
+    def test_failures_back_off_then_dead_letter(self):
+        self.collect()
+        self.stub.statuses = [500]
+        totals = self.dispatcher().drain()
+        self.assertEqual((totals['retried'], totals['webhooks']), (5, 1))
+        event = OutboxEvent.objects.first()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'Batch webhook failed: 500'))
+        self.assertGreater(event.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.stub.statuses = [503] * 4
+        with self.assertLogs('finance.services.outbox', 'ERROR'):
+            totals = self.dispatcher().drain()
+        self.assertEqual(totals['dead'], 5)
+        self.assertEqual(OutboxEvent.objects.filter(status='dead', attempts=2).count(), 5)
+    
+    def test_dispatch_command_and_credit_score_alerts(self):
+        from .services.automation_service import queue_credit_score_alerts
+        for value in (600, 620, 700):
+            score = CreditScore.objects.create(
+                business=self.business, user=self.user, score=value, score_category=CreditScore.categorize(value)
+            )
+            queue_credit_score_alerts([score])
+        # Fair, still fair, then good
+        alerts = OutboxEvent.objects.filter(event_type='credit_score_alert')
+        self.assertEqual(sorted(alert.payload['credit_score'] for alert in alerts), [600, 700])
+        
+        self.collect()
+        out = StringIO()
+        call_command('dispatch_outbox', '--burst', '--batch-size', '4', stdout=out)
+        self.assertIn('Delivered 7 events in 2 webhook calls (0 retrying, 0 dead-lettered)', out.getvalue())
+
+
+class BudgetConsumptionTest(TestCase):
+    """Test budget spend maintained from expense transactions"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='budgeter', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Budget Business')
+        self.budget = Budget.objects.create(
+            business=self.business, user=self.user, name='Marketing', budget_type='monthly',
+            category='Marketing', budgeted_amount=Decimal('1000.00'), remaining_amount=Decimal('1000.00'),
+            alert_threshold=Decimal('80.00'), start_date='2024-01-01', end_date='2024-01-31'
+        )
+    
+    def expense(self, amount, **kwargs):
+        values = {
+            'business': self.business, 'user': self.user, 'amount': Decimal(amount), 'transaction_type': 'expense',
+            'category': 'Marketing', 'payment_method': 'cash', 'description': 'Ads',
+            'transaction_date': '2024-01-15T10:00:00Z',
+        }
+        values.update(kwargs)
+        return Transaction.objects.create(**values)
+    
+    def test_expenses_update_spent_amount(self):
+        expense = self.expense('300.00')
+        self.expense('50.00', status='pending')
+        self.expense('999.00', transaction_type='income')
+        self.expense('999.00', category='Rent')
+        self.expense('999.00', status='failed')
+        self.expense('999.00', transaction_date='2024-02-01T10:00:00Z')
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('350.00'))
+        self.assertEqual(self.budget.remaining_amount, Decimal('650.00'))
+        self.assertEqual(self.budget.utilization_percentage, 35.0)
+        
+        expense.amount = Decimal('200.00')
+        expense.save()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('250.00'))
+        
+        expense.transaction_date = '2024-03-01T10:00:00Z'
+        expense.save()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('50.00'))
+        
+        Transaction.objects.get(status='pending').delete()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('0.00'))
+    
+    def test_crossing_threshold_queues_one_alert(self):
+        self.expense('500.00')
+        self.assertFalse(OutboxEvent.objects.exists())
+        
+        self.expense('400.00')
+        self.expense('50.00')
+        events = list(OutboxEvent.objects.all())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].event_type, 'budget_alert')
+        self.assertEqual(events[0].payload['budget_id'], str(self.budget.id))
+        self.assertEqual(events[0].payload['utilization_percentage'], 90.0)
+    
+    def test_import_updates_budgets(self):
+        from .services.imports import import_transactions
+        rows = (
+            'transaction_date,amount,transaction_type,payment_method,description,category\n'
+            '2024-01-10,600.00,expense,cash,Ads,Marketing\n'
+            '2024-01-11,600.00,expense,cash,Flyers,Marketing\n'
+        )
+        import_transactions(BytesIO(rows.encode('utf-8')), 'csv', self.business, self.user)
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('1200.00'))
+        self.assertEqual(OutboxEvent.objects.filter(event_type='budget_alert').count(), 1)
+    
+    def test_reconcile_fixes_drift(self):
+        self.expense('300.00')
+        Budget.objects.filter(pk=self.budget.pk).update(spent_amount=Decimal('5.00'))
+        out = StringIO()
+        call_command('reconcile_budgets', stdout=out)
+        self.assertIn('Reconciled 1 budgets (1 corrected)', out.getvalue())
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_amount, Decimal('300.00'))
+        self.assertEqual(self.budget.remaining_amount, Decimal('700.00'))
+        self.assertFalse(OutboxEvent.objects.exists())
+    
+    def test_reconcile_on_save_queues_alert(self):
+        """Expenses recorded before the budget existed can put it over its threshold when it is saved"""
+        self.expense('900.00', category='Travel')
+        budget = Budget.objects.create(
+            business=self.business, user=self.user, name='Travel', budget_type='monthly',
+            category='Travel', budgeted_amount=Decimal('1000.00'), remaining_amount=Decimal('1000.00'),
+            alert_threshold=Decimal('80.00'), start_date='2024-01-01', end_date='2024-01-31'
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(f'/api/finance/budgets/{budget.id}/', {'name': 'Travel 2024'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['spent_amount'], '900.00')
+        
+        events = list(OutboxEvent.objects.filter(event_type='budget_alert'))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].payload['budget_id'], str(budget.id))
+        
+        # Nothing to correct on the next save, so no second alert
+        client.patch(f'/api/finance/budgets/{budget.id}/', {'name': 'Travel'}, format='json')
+        self.assertEqual(OutboxEvent.objects.filter(event_type='budget_alert').count(), 1)
+
+
+class CashFlowMaterializationTest(APITestCase):
+    """Test cash flows materialized from transactions"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='cashflow', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Cash Flow Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.add('income', '1000.00', '2024-01-03T10:00:00Z')
+        self.add('income', '500.00', '2024-01-20T10:00:00Z')
+        self.add('expense', '300.00', '2024-01-04T10:00:00Z')
+        self.add('expense', '999.00', '2024-01-04T10:00:00Z', status='pending')
+        self.add('transfer', '999.00', '2024-01-04T10:00:00Z')
+    
+    def add(self, transaction_type, amount, when, **kwargs):
+        return Transaction.objects.create(
+            business=self.business, user=self.user, amount=Decimal(amount), transaction_type=transaction_type,
+            payment_method='cash', description='Cash', transaction_date=when, **kwargs
+        )
+    
+    def materialize(self):
+        from .services.cash_flows import materialize_cash_flows
+        totals = materialize_cash_flows([self.business.id])
+        # Make everything so far older than the sync overlap
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Transaction.objects.update(updated_at=an_hour_ago)
+        TransactionDailyRollup.objects.update(updated_at=an_hour_ago)
+        CashFlowSyncState.objects.update(synced_at=timezone.now() - timedelta(minutes=30))
+        return totals
+    
+    def flows(self, granularity):
+        return {
+            (flow.period_start.isoformat(), flow.flow_type): flow.amount
+            for flow in CashFlow.objects.filter(granularity=granularity)
+        }
+    
+    def test_materializes_completed_income_and_expenses(self):
+        self.materialize()
+        self.assertEqual(self.flows('month'), {
+            ('2024-01-01', 'inflow'): Decimal('1500.00'),
+            ('2024-01-01', 'outflow'): Decimal('300.00'),
+            ('2024-01-01', 'net'): Decimal('1200.00'),
+        })
+        weeks = self.flows('week')
+        self.assertEqual(weeks[('2024-01-01', 'net')], Decimal('700.00'))
+        self.assertEqual(weeks[('2024-01-15', 'net')], Decimal('500.00'))
+        self.assertEqual(len(weeks), 6)
+    
+    def test_only_changed_periods_are_recomputed(self):
+        self.materialize()
+        first_week = set(CashFlow.objects.filter(granularity='week', period_start='2024-01-01').values_list('id', flat=True))
+        
+        self.assertEqual(self.materialize()['businesses'], 0)
+        
+        self.add('expense', '100.00', '2024-01-21T10:00:00Z')
+        totals = self.materialize()
+        self.assertEqual(totals['periods'], 2)  # week of 15 Jan and January
+        self.assertEqual(self.flows('month')[('2024-01-01', 'net')], Decimal('1100.00'))
+        self.assertEqual(self.flows('week')[('2024-01-15', 'net')], Decimal('400.00'))
+        self.assertTrue(first_week <= set(CashFlow.objects.values_list('id', flat=True)))
+        
+        Transaction.objects.get(amount=Decimal('500.00')).delete()
+        self.materialize()
+        self.assertEqual(self.flows('week')[('2024-01-15', 'net')], Decimal('-100.00'))
+    
+    def test_periods_endpoint(self):
+        response = self.client.get(f'/api/finance/cash-flows/periods/?business={self.business.id}&granularity=week'
+                                   '&start=2024-01-10')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['periods'], [
+            {'period_start': '2024-01-15', 'period_end': '2024-01-21',
+             'inflow': '500.00', 'outflow': '0.00', 'net': '500.00'},
+        ])
+        
+        response = self.client.get(f'/api/finance/cash-flows/periods/?business={self.business.id}&granularity=day')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/api/finance/cash-flows/periods/?business={self.business.id}&end=2024-02-30')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        other = User.objects.create_user(username='outsider', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        response = self.client.get(f'/api/finance/cash-flows/periods/?business={self.business.id}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_periods_endpoint_only_materializes_stale_data(self):
+        from .services import cash_flows
+        url = f'/api/finance/cash-flows/periods/?business={self.business.id}&start=2024-01-01'
+        self.assertEqual(self.client.get(url).data['periods'][0]['net'], '1200.00')
+        
+        version = get_business_cache_version(self.business.id)
+        with mock.patch.object(cash_flows, 'materialize_cash_flows') as materialize:
+            self.assertEqual(self.client.get(url).data['periods'][0]['net'], '1200.00')
+        materialize.assert_not_called()
+        self.assertEqual(get_business_cache_version(self.business.id), version)
+        
+        pending = Transaction.objects.get(status='pending')
+        pending.status = 'completed'
+        pending.save()
+        self.assertEqual(self.client.get(url).data['periods'][0]['net'], '201.00')
+    
+    def test_summary_reports_cash_flow(self):
+        self.add('income', '200.00', timezone.now())
+        self.add('expense', '50.00', timezone.now(), status='pending')
+        call_command('materialize_cash_flows', stdout=StringIO())
+        response = self.client.get(f'/api/finance/transactions/summary/?business={self.business.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data['net_profit']), Decimal('150.00'))
+        self.assertEqual(Decimal(response.data['cash_flow']), Decimal('200.00'))
+
+
+class ReceivablesAgingTest(APITestCase):
+    """Test the aged receivables report"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='receivables', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Receivables Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        
+        self.today = timezone.localdate()
+        for number, (customer, days_past_due, amount, invoice_status) in enumerate([
+            ('Acme', -5, '100.00', 'sent'),
+            ('Acme', 0, '50.00', 'sent'),
+            ('Acme', 1, '200.00', 'sent'),
+            ('Acme', 45, '300.00', 'overdue'),
+            ('Beta', 30, '400.00', 'overdue'),
+            ('Beta', 75, '500.00', 'overdue'),
+            ('Beta', 91, '600.00', 'overdue'),
+            ('Beta', 120, '999.00', 'paid'),
+            ('Beta', 10, '999.00', 'draft'),
+        ]):
+            Invoice.objects.create(
+                business=self.business, user=self.user, invoice_number=f'AGE-{number}', customer_name=customer,
+                subtotal=Decimal(amount), total_amount=Decimal(amount), status=invoice_status,
+                issue_date=self.today - timedelta(days=150), due_date=self.today - timedelta(days=days_past_due)
+            )
+    
+    def test_buckets_per_customer_in_one_query(self):
+        from .services.receivables import aged_receivables
+        with self.assertNumQueries(1):
+            report = aged_receivables(self.business.id)
+        
+        acme, beta = sorted(report['customers'], key=lambda row: row['customer_name'])
+        self.assertEqual(acme['current'], Decimal('150.00'))
+        self.assertEqual(acme['days_1_30'], Decimal('200.00'))
+        self.assertEqual(acme['days_31_60'], Decimal('300.00'))
+        self.assertEqual(acme['invoice_count'], 4)
+        self.assertEqual(beta['days_1_30'], Decimal('400.00'))
+        self.assertEqual(beta['days_61_90'], Decimal('500.00'))
+        self.assertEqual(beta['days_over_90'], Decimal('600.00'))
+        self.assertEqual(beta['current'], Decimal('0'))
+        self.assertEqual(report['customers'][0]['customer_name'], 'Beta')
+        self.assertEqual(report['totals']['total'], Decimal('2150.00'))
+        self.assertEqual(report['totals']['invoice_count'], 7)
+    
+    def test_aging_endpoint(self):
+        url = f'/api/finance/invoices/aging/?business={self.business.id}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['days_over_90'], '600.00')
+        self.assertEqual(response.data['as_of'], self.today.isoformat())
+        self.assertEqual(len(response.data['customers']), 2)
+        
+        # Repeat requests are served from the cache until an invoice changes
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse(any('finance_invoice' in query['sql'] for query in context.captured_queries))
+        Invoice.objects.filter(invoice_number='AGE-6').get().delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data['totals']['days_over_90'], '0.00')
+        
+        response = self.client.get(f'{url}&as_of={(self.today + timedelta(days=30)).isoformat()}')
+        self.assertEqual(response.data['totals']['current'], '0.00')
+        
+        for as_of in ('yesterday', '2024-02-30'):
+            response = self.client.get(f'{url}&as_of={as_of}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_aging_requires_membership(self):
+        other = User.objects.create_user(username='stranger', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        response = self.client.get(f'/api/finance/invoices/aging/?business={self.business.id}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CustomerBalanceTest(APITestCase):
+    """Test Customer.total_invoiced/total_paid maintained from invoices"""
+    
+    def setUp(self):
+        from users.models import Customer
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='balances', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Balance Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.customer = Customer.objects.create(
+            business=self.business, owner=self.user, customer_name='Acme', email='billing@acme.test',
+            phone_number='0700000000'
+        )
+    
+    def invoice(self, number, amount, **kwargs):
+        values = {
+            'business': self.business, 'user': self.user, 'invoice_number': number, 'customer': self.customer,
+            'customer_name': 'Acme', 'subtotal': Decimal(amount), 'total_amount': Decimal(amount),
+            'issue_date': '2024-01-01', 'due_date': '2024-01-31',
+        }
+        values.update(kwargs)
+        return Invoice.objects.create(**values)
+    
+    def assertBalance(self, invoiced, paid):
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.total_invoiced, self.customer.total_paid), (Decimal(invoiced), Decimal(paid)))
+    
+    def test_invoice_lifecycle_updates_balance(self):
+        draft = self.invoice('BAL-1', '100.00')
+        self.assertBalance('0', '0')
+        
+        response = self.client.post(f'/api/finance/invoices/{draft.id}/send_invoice/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertBalance('100.00', '0')
+        
+        self.invoice('BAL-2', '250.00', status='sent')
+        self.client.post(f'/api/finance/invoices/{draft.id}/mark_paid/')
+        self.assertBalance('350.00', '100.00')
+        
+        cancelled = Invoice.objects.get(invoice_number='BAL-2')
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        self.assertBalance('100.00', '100.00')
+        
+        draft.refresh_from_db()
+        draft.delete()
+        self.assertBalance('0', '0')
+    
+    def test_create_links_customer_by_email(self):
+        response = self.client.post('/api/finance/invoices/', {
+            'business': self.business.id, 'user': self.user.id, 'invoice_number': 'BAL-3', 'customer_name': 'Acme',
+            'customer_email': 'Billing@Acme.test', 'subtotal': '500.00', 'total_amount': '500.00',
+            'status': 'sent', 'issue_date': '2024-01-02', 'due_date': '2024-02-01'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['customer'], self.customer.id)
+        self.assertBalance('500.00', '0')
+    
+    def test_recompute_command(self):
+        self.invoice('BAL-4', '80.00', status='paid')
+        self.invoice('BAL-5', '20.00', status='overdue', customer=None, customer_email='BILLING@acme.test')
+        from users.models import Customer
+        Customer.objects.filter(pk=self.customer.pk).update(total_invoiced=Decimal('1.00'))
+        
+        out = StringIO()
+        call_command('recompute_customer_balances', '--link', stdout=out)
+        self.assertIn('Recomputed 1 customers (1 corrected, 1 invoices linked)', out.getvalue())
+        self.assertBalance('100.00', '80.00')
+    
+    def test_customer_of_another_business_is_rejected(self):
+        from users.models import Customer
+        other_owner = User.objects.create_user(username='other-tenant', password='testpass123')
+        other_business = Business.objects.create(owner=other_owner, legal_name='Other Tenant')
+        victim = Customer.objects.create(business=other_business, owner=other_owner, customer_name='Victim')
+        invoice = self.invoice('BAL-6', '1000.00', status='sent')
+        
+        response = self.client.patch(f'/api/finance/invoices/{invoice.id}/', {'customer': victim.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('customer', response.data)
+        
+        response = self.client.post('/api/finance/invoices/with-items/', {
+            'business': self.business.id, 'invoice_number': 'BAL-7', 'customer': victim.id,
+            'customer_name': 'Victim', 'status': 'sent', 'issue_date': '2024-01-02', 'due_date': '2024-02-01',
+            'items': [{'description': 'Work', 'quantity': '1', 'unit_price': '500.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('customer', response.data)
+        
+        victim.refresh_from_db()
+        self.assertEqual(victim.total_invoiced, Decimal('0'))
+        self.assertBalance('1000.00', '0')
+
+
+class InvoiceWithItemsTest(APITestCase):
+    """Test creating an invoice with its items in one request"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='nested', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Nested Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def payload(self, number, lines):
+        return {
+            'business': self.business.id, 'invoice_number': number, 'customer_name': 'Acme',
+            'tax_amount': '16.00', 'issue_date': '2024-01-02', 'due_date': '2024-02-01',
+            'subtotal': '1.00', 'total_amount': '1.00',  # Ignored: computed from the items
+            'items': [
+                {'description': f'Line {i}', 'quantity': '1.50', 'unit_price': '10.01'} for i in range(lines)
+            ],
+        }
+    
+    def post(self, payload):
+        return self.client.post('/api/finance/invoices/with-items/', payload, format='json')
+    
+    def test_totals_are_computed_server_side(self):
+        response = self.post(self.payload('NEST-1', 3))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['subtotal'], '45.06')
+        self.assertEqual(response.data['total_amount'], '61.06')
+        self.assertEqual([item['total_price'] for item in response.data['items']], ['15.02'] * 3)
+        invoice = Invoice.objects.get(invoice_number='NEST-1')
+        self.assertEqual(invoice.user, self.user)
+        self.assertEqual(invoice.items.count(), 3)
+    
+    def test_query_count_independent_of_line_count(self):
+        self.post(self.payload('NEST-WARM', 1))
+        counts = []
+        for lines in (2, 50):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post(self.payload(f'NEST-{lines}', lines))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(InvoiceItem.objects.filter(invoice__invoice_number='NEST-50').count(), 50)
+    
+    def test_invalid_item_creates_nothing(self):
+        payload = self.payload('NEST-BAD', 2)
+        payload['items'][1]['quantity'] = '0'
+        response = self.post(payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.data)
+        
+        payload = self.payload('NEST-EMPTY', 0)
+        self.assertEqual(self.post(payload).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Invoice.objects.exists())
+
+
+class InvoiceNumberingTest(APITestCase):
+    """Test per-business invoice number allocation"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='numbering', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Numbering Business')
+        self.other = Business.objects.create(owner=self.user, legal_name='Other Business')
+        for business in (self.business, self.other):
+            Membership.objects.create(user=self.user, business=business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def create(self, business, **extra):
+        data = {
+            'business': business.id, 'user': self.user.id, 'customer_name': 'Acme', 'subtotal': '10.00',
+            'total_amount': '10.00', 'issue_date': '2024-01-02', 'due_date': '2024-02-01',
+        }
+        data.update(extra)
+        return self.client.post('/api/finance/invoices/', data, format='json')
+    
+    def test_numbers_are_allocated_per_business(self):
+        year = timezone.localdate().year
+        numbers = [self.create(self.business).data['invoice_number'] for _ in range(2)]
+        self.assertEqual(numbers, [f'INV-{year}-00001', f'INV-{year}-00002'])
+        self.assertEqual(self.create(self.other).data['invoice_number'], f'INV-{year}-00001')
+        
+        # Client-supplied numbers are still accepted, once per business
+        self.assertEqual(self.create(self.business, invoice_number='MANUAL-1').status_code, status.HTTP_201_CREATED)
+        response = self.create(self.business, invoice_number='MANUAL-1')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('invoice_number', response.data)
+    
+    def test_manually_used_numbers_are_skipped(self):
+        year = timezone.localdate().year
+        self.assertEqual(self.create(self.business, invoice_number=f'INV-{year}-00002').status_code,
+                         status.HTTP_201_CREATED)
+        numbers = [self.create(self.business).data['invoice_number'] for _ in range(2)]
+        self.assertEqual(numbers, [f'INV-{year}-00001', f'INV-{year}-00003'])
+    
+    def test_format_and_yearly_restart(self):
+        from .services.invoice_numbers import allocate_invoice_number
+        from datetime import date
+        self.assertEqual(allocate_invoice_number(self.business.id, date(2024, 12, 31)), 'INV-2024-00001')
+        self.assertEqual(allocate_invoice_number(self.business.id, date(2024, 12, 31)), 'INV-2024-00002')
+        self.assertEqual(allocate_invoice_number(self.business.id, date(2025, 1, 1)), 'INV-2025-00001')
+        
+        InvoiceNumberSequence.objects.filter(business=self.business).update(
+            prefix='ACME/', include_year=False, padding=3
+        )
+        self.assertEqual(allocate_invoice_number(self.business.id, date(2025, 1, 2)), 'ACME/002')
+    
+    def test_rolled_back_invoice_returns_its_number(self):
+        from .services.invoice_numbers import allocate_invoice_number
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                allocate_invoice_number(self.business.id)
+                raise RuntimeError('invoice insert failed')
+        self.assertTrue(allocate_invoice_number(self.business.id).endswith('-00001'))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CashFlowMaterializationConcurrencyTest(TransactionTestCase):
+    """Stress test: concurrent materializations of the same business"""
+    
+    THREADS = 8
+    
+    def test_concurrent_runs_do_not_conflict(self):
+        import threading
+        from django.db import connections
+        from .services.cash_flows import materialize_cash_flows
+        
+        user = User.objects.create_user(username='cashflow-stress', password='testpass123')
+        business = Business.objects.create(owner=user, legal_name='Cash Flow Stress')
+        for day in range(1, 29):
+            Transaction.objects.create(
+                business=business, user=user, amount=Decimal('10.00'), transaction_type='income',
+                payment_method='cash', description='Sale', transaction_date=f'2024-02-{day:02d}T10:00:00Z'
+            )
+        errors = []
+        start = threading.Barrier(self.THREADS)
+        
+        def worker():
+            try:
+                start.wait()
+                materialize_cash_flows([business.id], full=True)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+        
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        monthly = CashFlow.objects.get(business=business, granularity='month', flow_type='net')
+        self.assertEqual(monthly.amount, Decimal('280.00'))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class InvoiceNumberConcurrencyTest(TransactionTestCase):
+    """Stress test: many threads allocating numbers for the same businesses"""
+    
+    THREADS = 16
+    INVOICES_PER_THREAD = 25
+    
+    def test_concurrent_allocation_is_gapless_and_unique(self):
+        import threading
+        from django.db import connections
+        from .services.invoice_numbers import allocate_invoice_number
+        
+        user = User.objects.create_user(username='stress', password='testpass123')
+        businesses = [Business.objects.create(owner=user, legal_name=f'Stress {i}') for i in range(2)]
+        today = timezone.localdate()
+        errors = []
+        start = threading.Barrier(self.THREADS)
+        
+        def worker(index):
+            business = businesses[index % len(businesses)]
+            try:
+                start.wait()
+                for _ in range(self.INVOICES_PER_THREAD):
+                    with transaction.atomic():
+                        Invoice.objects.create(
+                            business=business, user=user, invoice_number=allocate_invoice_number(business.id),
+                            customer_name='Load', subtotal=Decimal('1.00'), total_amount=Decimal('1.00'),
+                            issue_date=today, due_date=today
+                        )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        per_business = self.THREADS * self.INVOICES_PER_THREAD // len(businesses)
+        for business in businesses:
+            numbers = sorted(
+                int(number.rsplit('-', 1)[1])
+                for number in Invoice.objects.filter(business=business).values_list('invoice_number', flat=True)
+            )
+            self.assertEqual(numbers, list(range(1, per_business + 1)))
+
+
+class InvoiceDocumentTest(APITestCase):
+    """Test rendering invoice documents and their on-disk cache"""
+    
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(INVOICE_DOCUMENT_DIR=directory.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='documents', password='testpass123')
+        self.business = Business.objects.create(owner=self.user, legal_name='Documents Business')
+        Membership.objects.create(user=self.user, business=self.business, role_in_business='business_admin')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.invoice = self.create_invoice('DOC-1', '2024-01-15')
+    
+    def create_invoice(self, number, issue_date):
+        invoice = Invoice.objects.create(
+            business=self.business, user=self.user, invoice_number=number, customer_name='Acme (Kenya)',
+            subtotal=Decimal('1500.00'), tax_amount=Decimal('240.00'), total_amount=Decimal('1740.00'),
+            issue_date=issue_date, due_date='2024-02-15',
+        )
+        InvoiceItem.objects.create(invoice=invoice, description='Consulting', quantity=Decimal('3'),
+                                   unit_price=Decimal('500.00'))
+        return invoice
+    
+    def download(self, fmt, **headers):
+        response = self.client.get(f'/api/finance/invoices/{self.invoice.pk}/document/', {'type': fmt}, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+    
+    def test_repeat_downloads_are_not_rerendered(self):
+        from .services import invoice_documents
+        render_pdf = mock.Mock(wraps=invoice_documents.render_pdf)
+        with mock.patch.dict(invoice_documents.RENDERERS, {'pdf': render_pdf}):
+            response, content = self.download('pdf')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(content.startswith(b'%PDF-1.4'))
+            self.assertIn(b'(INVOICE DOC-1) Tj', content)
+            self.assertIn(b'Acme \\(Kenya\\)', content)
+            
+            again, cached = self.download('pdf')
+            self.assertEqual(cached, content)
+            self.assertEqual(again['ETag'], response['ETag'])
+            not_modified, _ = self.download('pdf', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(render_pdf.call_count, 1)
+    
+    def test_changes_render_a_new_document(self):
+        response, content = self.download('html')
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn(b'Consulting', content)
+        self.assertIn(b'KES 1,740.00', content)
+        
+        InvoiceItem.objects.create(invoice=self.invoice, description='Travel', quantity=Decimal('1'),
+                                   unit_price=Decimal('240.00'))
+        updated, updated_content = self.download('html')
+        self.assertNotEqual(updated['ETag'], response['ETag'])
+        self.assertIn(b'Travel', updated_content)
+        
+        self.assertEqual(self.download('docx')[0].status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_render_invoices_command(self):
+        self.create_invoice('DOC-2', '2024-01-31')
+        self.create_invoice('DOC-3', '2024-02-01')
+        out = StringIO()
+        call_command('render_invoices', '--month', '2024-01', '--type', 'all', '--workers', '1', stdout=out)
+        self.assertIn('Rendered 4 documents (0 already cached)', out.getvalue())
+        
+        out = StringIO()
+        call_command('render_invoices', '--month', '2024-01', '--type', 'all', '--workers', '1', stdout=out)
+        self.assertIn('Rendered 0 documents (4 already cached)', out.getvalue())
+        response, _ = self.download('pdf')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_sent_invoice_is_rendered_off_the_request(self):
+        from .services import invoice_documents
+        render_pdf = mock.Mock(wraps=invoice_documents.render_pdf)
+        with mock.patch.dict(invoice_documents.RENDERERS, {'pdf': render_pdf}):
+            response = self.client.post(f'/api/finance/invoices/{self.invoice.pk}/send_invoice/')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertTrue(response.data['document'].endswith(f'/api/finance/invoices/{self.invoice.pk}/document/'))
+            self.assertEqual(render_pdf.call_count, 0)
+            
+            out = StringIO()
+            call_command('render_invoices', '--changed-since', '10', '--workers', '1', stdout=out)
+            self.assertIn('Rendered 1 documents (0 already cached)', out.getvalue())
+            self.assertEqual(self.download('pdf')[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(render_pdf.call_count, 1)
@@ -4,7 +4,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     TransactionViewSet, InvoiceViewSet, InvoiceItemViewSet,
     BudgetViewSet, CashFlowViewSet, FinancialForecastViewSet,
-    CreditScoreViewSet, SupplierViewSet, dashboard_data, VoiceConversationViewSet
+    CreditScoreViewSet, SupplierViewSet, AIJobViewSet, dashboard_data, ai_cache_stats, chat_stream,
+    VoiceConversationViewSet
 )
 
 router = DefaultRouter()
@@ -16,9 +17,12 @@ router.register(r'cash-flows', CashFlowViewSet)
 router.register(r'forecasts', FinancialForecastViewSet)
 router.register(r'credit-scores', CreditScoreViewSet)
 router.register(r'suppliers', SupplierViewSet)
+router.register(r'ai-jobs', AIJobViewSet)
 router.register(r'voice-conversations', VoiceConversationViewSet, basename='voice-conversation')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', dashboard_data, name='dashboard_data'),
+    path('ai-cache/stats/', ai_cache_stats, name='ai_cache_stats'),
+    path('chat/stream/', chat_stream, name='chat_stream'),
 ]
@@ -1,7 +1,8 @@
 # backend/finance/views.py
-from .cache_utils import cached_response, invalidate_dashboard_cache
+from .cache_utils import cached_response
+from .services.summary import transaction_totals, invoice_totals, budget_totals, latest_credit_score
 from django.shortcuts import render
-from django.db.models import Sum, Count, Avg, Q, F
+from django.db.models import Sum, Q, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -12,35 +13,26 @@ from rest_framework.response import Response
 from django.contrib.auth.models import User
 from .models import (
     Transaction, Invoice, InvoiceItem, Budget, CashFlow, 
-    FinancialForecast, CreditScore, Supplier
+    FinancialForecast, CreditScore, Supplier, TransactionDailyRollup, AIJob
 )
 from .serializers import (
     TransactionSerializer, InvoiceSerializer, InvoiceItemSerializer,
     BudgetSerializer, CashFlowSerializer, FinancialForecastSerializer,
     CreditScoreSerializer, FinancialSummarySerializer, TransactionAnalyticsSerializer,
-    BudgetAnalyticsSerializer, SupplierSerializer
+    BudgetAnalyticsSerializer, SupplierSerializer, AIJobSerializer, CashFlowPeriodSerializer,
+    AgedReceivablesSerializer, InvoiceWithItemsSerializer
 )
-from users.models import Business, Membership
+from users.models import Business
+from users.access import get_business_access
+from core.query_plans import QueryPlanMixin
 
 def get_user_businesses(user):
     """Get all businesses a user is a member of"""
-    if user.is_superuser:
-        return Business.objects.all()
-    memberships = Membership.objects.filter(user=user, is_active=True)
-    return Business.objects.filter(id__in=[m.business_id for m in memberships])
+    return Business.objects.filter(id__in=get_business_access(user).business_ids)
 
 def get_business_queryset(user, business_id=None):
-    """Get queryset filtered by user's business access"""
-    if user.is_superuser:
-        businesses = Business.objects.all()
-    else:
-        memberships = Membership.objects.filter(user=user, is_active=True)
-        businesses = Business.objects.filter(id__in=[m.business_id for m in memberships])
-    
-    if business_id:
-        businesses = businesses.filter(id=business_id)
-    
-    return businesses.values_list('id', flat=True)
+    """Get IDs of the businesses the user can access (see users.access)"""
+    return get_business_access(user).filter_business_ids(business_id)
 
 
 class IsOwner(permissions.BasePermission):
@@ -49,38 +41,57 @@ class IsOwner(permissions.BasePermission):
         return getattr(obj, 'user_id', None) == request.user.id
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing transactions"""
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-transaction_date', '-id')
+    max_page_size = 200
     
-    def get_queryset(self):
+    def get_visibility_filters(self):
+        """Filters limiting transaction data to what the current user may see.
+        
+        Returns None when the user has no access at all. Shared by the
+        Transaction queryset and the daily rollup queryset used for analytics.
+        """
         user = self.request.user
         if not user.is_authenticated:
-            return Transaction.objects.none()
+            return None
         
         business_id = self.request.query_params.get('business')
         business_ids = list(get_business_queryset(user, business_id))
         
         if not business_ids:
-            return Transaction.objects.none()
+            return None
         
         # Filter by business and user (for members)
-        qs = Transaction.objects.filter(business_id__in=business_ids)
+        filters = {'business_id__in': business_ids}
         
         # If user is not superuser, also filter by user or check membership role
         if not user.is_superuser:
             # Staff can see their own transactions, admins see all in business
-            from users.views import user_is_business_admin
-            if business_id and user_is_business_admin(user, business_id):
+            if business_id and get_business_access(user).is_admin(business_id):
                 # Business admin sees all transactions in their business
                 pass
             else:
                 # Staff sees only their own transactions
-                qs = qs.filter(user=user)
+                filters['user'] = user
         
-        return qs.order_by('-transaction_date')
+        return filters
+    
+    def get_queryset(self):
+        filters = self.get_visibility_filters()
+        if filters is None:
+            return Transaction.objects.none()
+        return Transaction.objects.filter(**filters).order_by('-transaction_date')
+    
+    def get_rollup_queryset(self):
+        """Daily rollup rows visible to the current user"""
+        filters = self.get_visibility_filters()
+        if filters is None:
+            return TransactionDailyRollup.objects.none()
+        return TransactionDailyRollup.objects.filter(**filters)
     
     def get_permissions(self):
         # Allow list access for unauthenticated users (demo mode)
@@ -102,8 +113,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Invalid business ID format'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id_int))
-        if not business_ids or business_id_int not in business_ids:
+        if not get_business_access(self.request.user).is_member(business_id_int):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
@@ -133,50 +143,84 @@ class TransactionViewSet(viewsets.ModelViewSet):
                     serializer.validated_data['transaction_date'] = dt
         
         serializer.save(user=self.request.user, business=business)
-    
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Bulk import transactions from an uploaded CSV or JSON-lines file"""
+        from .services.imports import import_transactions, detect_format, SUPPORTED_FORMATS
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A CSV or JSON-lines file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        business_id = request.data.get('business')
+        if not business_id:
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not get_business_access(request.user).is_member(business_id):
+            return Response({'error': 'You do not have access to this business'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            return Response({'error': 'Business not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in SUPPORTED_FORMATS:
+            return Response({'error': f"Unsupported file format '{file_format}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload.open('rb')
+        result = import_transactions(upload.file, file_format, business, request.user)
+        if result.file_error:
+            # Rows before the fault were committed; report them so a retry can resume
+            return Response({'error': result.file_error, **result.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_status = status.HTTP_201_CREATED if result.created else status.HTTP_200_OK
+        return Response(result.as_dict(), status=response_status)
+
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         """Get transaction analytics for the user's businesses"""
         business_id = request.query_params.get('business_id')
         period = request.query_params.get('period', '30')  # days
         
-        # Calculate date range
+        # Calculate date range (rollups are kept per calendar day)
         end_date = timezone.now()
         start_date = end_date - timedelta(days=int(period))
         
-        # Filter transactions
-        queryset = self.get_queryset().filter(transaction_date__gte=start_date)
+        # Read from the pre-aggregated daily rollups instead of scanning transactions
+        rollups = self.get_rollup_queryset().filter(day__gte=timezone.localtime(start_date).date())
         if business_id:
-            queryset = queryset.filter(business_id=business_id)
+            rollups = rollups.filter(business_id=business_id)
         
         # Calculate analytics
-        total_transactions = queryset.count()
-        total_amount = queryset.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        avg_transaction = queryset.aggregate(avg=Avg('amount'))['avg'] or Decimal('0')
-        
-        # Income vs Expenses
-        income_count = queryset.filter(transaction_type='income').count()
-        expense_count = queryset.filter(transaction_type='expense').count()
+        totals = rollups.aggregate(
+            total_transactions=Sum('transaction_count'),
+            total_amount=Sum('total_amount'),
+            income_count=Sum('transaction_count', filter=Q(transaction_type='income')),
+            expense_count=Sum('transaction_count', filter=Q(transaction_type='expense')),
+        )
+        total_transactions = totals['total_transactions'] or 0
+        total_amount = totals['total_amount'] or Decimal('0')
+        avg_transaction = (total_amount / total_transactions) if total_transactions else Decimal('0')
         
         # Top categories
-        top_categories = queryset.values('category').annotate(
-            count=Count('id'),
-            total=Sum('amount')
+        top_categories = rollups.values('category').annotate(
+            count=Sum('transaction_count'),
+            total=Sum('total_amount')
         ).order_by('-total')[:5]
         
         # Payment methods
-        payment_methods = queryset.values('payment_method').annotate(
-            count=Count('id'),
-            total=Sum('amount')
-        )
+        payment_methods = rollups.values('payment_method').annotate(
+            count=Sum('transaction_count'),
+            total=Sum('total_amount')
+        ).order_by('payment_method')
         
         analytics_data = {
             'period': f"{period} days",
             'total_transactions': total_transactions,
             'total_amount': total_amount,
             'average_transaction': avg_transaction,
-            'income_count': income_count,
-            'expense_count': expense_count,
+            'income_count': totals['income_count'] or 0,
+            'expense_count': totals['expense_count'] or 0,
             'top_categories': list(top_categories),
             'payment_methods': list(payment_methods),
             'currency': 'KES'
@@ -195,79 +239,65 @@ class TransactionViewSet(viewsets.ModelViewSet):
         end_date = timezone.now()
         start_date = end_date - timedelta(days=int(period))
         
-        # Filter transactions
-        transactions = self.get_queryset().filter(transaction_date__gte=start_date)
+        # Income and expenses come from the daily rollups
+        rollups = self.get_rollup_queryset().filter(day__gte=timezone.localtime(start_date).date())
         if business_id:
-            transactions = transactions.filter(business_id=business_id)
-        
-        # Calculate summary
-        total_income = transactions.filter(transaction_type='income').aggregate(
-            total=Sum('amount'))['total'] or Decimal('0')
-        total_expenses = transactions.filter(transaction_type='expense').aggregate(
-            total=Sum('amount'))['total'] or Decimal('0')
-        net_profit = total_income - total_expenses
+            rollups = rollups.filter(business_id=business_id)
+        transaction_summary = transaction_totals(rollups)
         
         # Outstanding invoices
         invoices = Invoice.objects.filter(user=request.user)
         if business_id:
             invoices = invoices.filter(business_id=business_id)
-        
-        outstanding_invoices = invoices.filter(status__in=['sent', 'overdue']).aggregate(
-            total=Sum('total_amount'))['total'] or Decimal('0')
-        overdue_invoices = invoices.filter(status='overdue').aggregate(
-            total=Sum('total_amount'))['total'] or Decimal('0')
+        invoice_summary = invoice_totals(invoices)
         
         # Budget utilization
         budgets = Budget.objects.filter(user=request.user, is_active=True)
         if business_id:
             budgets = budgets.filter(business_id=business_id)
-        
-        total_budgeted = budgets.aggregate(total=Sum('budgeted_amount'))['total'] or Decimal('0')
-        total_spent = budgets.aggregate(total=Sum('spent_amount'))['total'] or Decimal('0')
-        budget_utilization = (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0
+        budget_summary = budget_totals(budgets)
+        
+        # Net cash flow of completed transactions, from the materialized weekly
+        # cash flows (the period is rounded out to whole weeks)
+        cash_flow = Decimal('0')
+        filters = self.get_visibility_filters()
+        if filters is not None:
+            from .services.cash_flows import period_start
+            cash_flows = CashFlow.objects.filter(
+                source='transactions', granularity='week', flow_type='net',
+                period_start__gte=period_start(timezone.localtime(start_date).date(), 'week'), **filters
+            )
+            if business_id:
+                cash_flows = cash_flows.filter(business_id=business_id)
+            cash_flow = cash_flows.aggregate(total=Sum('amount'))['total'] or Decimal('0')
         
         # Credit score
-        credit_score = CreditScore.objects.filter(user=request.user).order_by('-created_at').first()
+        credit_score = latest_credit_score(user=request.user)
         score = credit_score.score if credit_score else 0
         
         summary_data = {
-            'total_income': total_income,
-            'total_expenses': total_expenses,
-            'net_profit': net_profit,
-            'cash_flow': net_profit,  # Simplified for now
-            'outstanding_invoices': outstanding_invoices,
-            'overdue_invoices': overdue_invoices,
-            'budget_utilization': round(budget_utilization, 2),
+            'total_income': transaction_summary['total_income'],
+            'total_expenses': transaction_summary['total_expenses'],
+            'net_profit': transaction_summary['net_profit'],
+            'cash_flow': cash_flow,
+            'outstanding_invoices': invoice_summary['outstanding_amount'],
+            'overdue_invoices': invoice_summary['overdue_amount'],
+            'budget_utilization': budget_summary['utilization'],
             'credit_score': score,
             'currency': 'KES'
         }
         
         serializer = FinancialSummarySerializer(summary_data)
-        return Response(serializer.data)#
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        
-        # Invalidate dashboard cache for this user
-        if response.status_code in [200, 201]:
-            user_id = request.user.id
-            business_id = request.data.get('business', '')
-            cache_key_pattern = f"dashboard:user_{user_id}:business_{business_id}:period_*"
-            # For database cache, we need to delete specific keys
-            # Delete common periods
-            for period in ['30', '7', '90', '365']:
-                cache_key = f"dashboard:user_{user_id}:business_{business_id}:period_{period}"
-                cache.delete(cache_key)
-                cache_key_no_biz = f"dashboard:user_{user_id}:business_:period_{period}"
-                cache.delete(cache_key_no_biz)
-        
-        return response 
+        return Response(serializer.data)
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing invoices"""
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-issue_date', '-id')
+    max_page_size = 100
     
     def get_queryset(self):
         user = self.request.user
@@ -285,8 +315,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         
         # If user is not superuser, filter by user or check membership role
         if not user.is_superuser:
-            from users.views import user_is_business_admin
-            if business_id and user_is_business_admin(user, business_id):
+            if business_id and get_business_access(user).is_admin(business_id):
                 # Business admin sees all invoices in their business
                 pass
             else:
@@ -315,8 +344,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Invalid business ID format'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id_int))
-        if not business_ids or business_id_int not in business_ids:
+        if not get_business_access(self.request.user).is_member(business_id_int):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
@@ -328,16 +356,126 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Business not found'})
         
-        serializer.save(user=self.request.user, business=business)
+        # Link the invoice to the customer whose balance it counts towards
+        # (InvoiceSerializer.validate checks a given customer is this business's)
+        from .services.customer_balances import customer_for_email
+        customer = serializer.validated_data.get('customer')
+        if customer is None:
+            customer = customer_for_email(business.id, serializer.validated_data.get('customer_email'))
+        
+        invoice_number = serializer.validated_data.get('invoice_number')
+        if invoice_number and Invoice.objects.filter(business=business, invoice_number=invoice_number).exists():
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'invoice_number': 'This business already has an invoice with this number'})
+        
+        # Allocating in the invoice's transaction keeps the numbering gapless
+        from django.db import IntegrityError, transaction
+        from .services.invoice_numbers import allocate_invoice_number
+        try:
+            with transaction.atomic():
+                if not invoice_number:
+                    invoice_number = allocate_invoice_number(business.id)
+                serializer.save(user=self.request.user, business=business, customer=customer,
+                                invoice_number=invoice_number)
+        except IntegrityError:
+            # Another request took the number since it was checked
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'invoice_number': 'This business already has an invoice with this number'})
+    
+    @action(detail=False, methods=['post'], url_path='with-items')
+    def create_with_items(self, request):
+        """Create an invoice and all of its items in one request and one transaction"""
+        serializer = InvoiceWithItemsSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        """Aged receivables report: open invoices bucketed by days past due, per customer"""
+        from django.core.cache import cache
+        from django.utils.dateparse import parse_date
+        from .cache_utils import get_business_cache_version
+        from .services.receivables import aged_receivables
+        
+        business_id = request.query_params.get('business')
+        if not business_id:
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            business_id = int(business_id)
+        except ValueError:
+            return Response({'error': 'Invalid business ID format'}, status=status.HTTP_400_BAD_REQUEST)
+        access = get_business_access(request.user)
+        if not access.is_member(business_id):
+            return Response({'error': 'You do not have access to this business'}, status=status.HTTP_403_FORBIDDEN)
+        
+        as_of = timezone.localdate()
+        if request.query_params.get('as_of'):
+            try:
+                # None when malformed, ValueError for impossible dates such as 2024-02-30
+                as_of = parse_date(request.query_params['as_of'])
+            except ValueError:
+                as_of = None
+            if as_of is None:
+                return Response({'error': 'Invalid as_of date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Admins see the whole business, staff their own invoices
+        user = None if request.user.is_superuser or access.is_admin(business_id) else request.user
+        
+        # Invoice changes bump the business cache version (see finance.signals)
+        cache_key = (
+            f"receivables:business_{business_id}.v{get_business_cache_version(business_id)}"
+            f":user_{user.id if user else 'all'}:as_of_{as_of.isoformat()}"
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            report = aged_receivables(business_id, as_of=as_of, user=user)
+            data = AgedReceivablesSerializer(dict(report, currency='KES')).data
+            cache.set(cache_key, data, 300)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def document(self, request, pk=None):
+        """Rendered invoice (?type=pdf|html), served from the document cache when unchanged"""
+        from django.http import FileResponse, HttpResponseNotModified
+        from .services.invoice_documents import CONTENT_TYPES, document_key, invoice_document
+        
+        fmt = request.query_params.get('type', 'pdf')
+        if fmt not in CONTENT_TYPES:
+            return Response({'error': f"Invalid type, use one of: {', '.join(CONTENT_TYPES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        invoice = self.get_object()
+        
+        # The key changes whenever the invoice does, so it doubles as the ETag
+        etag = f'"{document_key(invoice, fmt)}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        
+        path, _, _ = invoice_document(invoice, fmt)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=CONTENT_TYPES[fmt],
+            as_attachment=request.query_params.get('download') in ('1', 'true'),
+            filename=f'{invoice.invoice_number}.{fmt}',
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     
     @action(detail=True, methods=['post'])
     def send_invoice(self, request, pk=None):
         """Send invoice to customer"""
+        from django.urls import reverse
+        
         invoice = self.get_object()
         # TODO: Implement email/SMS sending logic
         invoice.status = 'sent'
         invoice.save()
-        return Response({'message': 'Invoice sent successfully'})
+        # The PDF is rendered off the request path by `render_invoices --changed-since`
+        return Response({
+            'message': 'Invoice sent successfully',
+            'document': request.build_absolute_uri(reverse('invoice-document', args=[invoice.pk])),
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['post'])
     def mark_paid(self, request, pk=None):
@@ -348,44 +486,13 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         invoice.save()
         return Response({'message': 'Invoice marked as paid'})
 
-    # In InvoiceViewSet class, update/create these methods:
-
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        if response.status_code in [200, 201]:
-            from .cache_utils import invalidate_dashboard_cache
-            business_id = request.data.get('business', '')
-            invalidate_dashboard_cache(request.user.id, business_id)
-        return response
-
-    def update(self, request, *args, **kwargs):
-        response = super().update(request, *args, **kwargs)
-        if response.status_code in [200]:
-            from .cache_utils import invalidate_dashboard_cache
-            invoice = self.get_object()
-            business_id = str(invoice.business_id) if invoice.business_id else None
-            invalidate_dashboard_cache(request.user.id, business_id)
-        return response
-
-    @action(detail=True, methods=['post'])
-    def mark_paid(self, request, pk=None):
-        """Mark invoice as paid"""
-        invoice = self.get_object()
-        invoice.status = 'paid'
-        invoice.paid_date = timezone.now().date()
-        invoice.save()
-        # Invalidate cache
-        from .cache_utils import invalidate_dashboard_cache
-        business_id = str(invoice.business_id) if invoice.business_id else None
-        invalidate_dashboard_cache(request.user.id, business_id)
-        return Response({'message': 'Invoice marked as paid'})
-
 
 class InvoiceItemViewSet(viewsets.ModelViewSet):
     """ViewSet for managing invoice items"""
     queryset = InvoiceItem.objects.all()
     serializer_class = InvoiceItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ('id',)
     
     def get_queryset(self):
         invoice_id = self.request.query_params.get('invoice_id')
@@ -408,11 +515,13 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
             raise ValidationError({'invoice': 'Invoice ID is required'})
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing budgets"""
     queryset = Budget.objects.all()
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-start_date', '-id')
+    max_page_size = 100
     
     def get_queryset(self):
         return Budget.objects.filter(user=self.request.user).order_by('-start_date')
@@ -424,23 +533,32 @@ class BudgetViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Business ID is required'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id))
-        if not business_ids or business_id not in [str(bid) for bid in business_ids]:
+        if not get_business_access(self.request.user).is_member(business_id):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
-        # Convert business_id to Business object if needed
-        if isinstance(business_id, str):
-            from users.models import Business
-            try:
-                business = Business.objects.get(id=business_id)
-            except Business.DoesNotExist:
-                from rest_framework.exceptions import ValidationError
-                raise ValidationError({'business': 'Business not found'})
-        else:
-            business = business_id
+        # Convert business_id to Business object
+        from users.models import Business
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'business': 'Business not found'})
         
-        serializer.save(user=self.request.user, business=business)
+        budget = serializer.save(user=self.request.user, business=business)
+        self._reconcile(budget)
+    
+    def perform_update(self, serializer):
+        self._reconcile(serializer.save())
+    
+    def _reconcile(self, budget):
+        """Count the expenses already recorded in the budget's category and period.
+        
+        Queues the budget's threshold alert if that takes it across the threshold.
+        """
+        from .services.budgets import reconcile_budgets
+        reconcile_budgets(Budget.objects.filter(pk=budget.pk))
+        budget.refresh_from_db(fields=['spent_amount', 'remaining_amount', 'updated_at'])
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
@@ -476,33 +594,70 @@ class BudgetViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-    def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        if response.status_code in [200, 201]:
-            from .cache_utils import invalidate_dashboard_cache
-            business_id = request.data.get('business', '')
-            invalidate_dashboard_cache(request.user.id, business_id)
-        return response
-
-    def update(self, request, *args, **kwargs):
-        response = super().update(request, *args, **kwargs)
-        if response.status_code in [200]:
-            from .cache_utils import invalidate_dashboard_cache
-            budget = self.get_object()
-            business_id = str(budget.business_id) if budget.business_id else None
-            invalidate_dashboard_cache(request.user.id, business_id)
-        return response
-
-
-class CashFlowViewSet(viewsets.ModelViewSet):
+class CashFlowViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing cash flow data"""
     queryset = CashFlow.objects.all()
     serializer_class = CashFlowSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-period_start', '-id')
+    max_page_size = 100
     
     def get_queryset(self):
         return CashFlow.objects.filter(user=self.request.user).order_by('-period_start')
     
+    @action(detail=False, methods=['get'])
+    def periods(self, request):
+        """Weekly or monthly inflow, outflow and net cash flow from completed transactions"""
+        from django.utils.dateparse import parse_date
+        from .services.cash_flows import cash_flows_stale, materialize_cash_flows
+        
+        business_id = request.query_params.get('business')
+        if not business_id:
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            business_id = int(business_id)
+        except ValueError:
+            return Response({'error': 'Invalid business ID format'}, status=status.HTTP_400_BAD_REQUEST)
+        access = get_business_access(request.user)
+        if not access.is_member(business_id):
+            return Response({'error': 'You do not have access to this business'}, status=status.HTTP_403_FORBIDDEN)
+        
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in dict(CashFlow.GRANULARITIES):
+            return Response({'error': "granularity must be 'week' or 'month'"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if cash_flows_stale(business_id):
+            materialize_cash_flows([business_id])
+        flows = CashFlow.objects.filter(business_id=business_id, source='transactions', granularity=granularity)
+        # Admins see the whole business, staff their own transactions
+        if not request.user.is_superuser and not access.is_admin(business_id):
+            flows = flows.filter(user=request.user)
+        for param, lookup in (('start', 'period_end__gte'), ('end', 'period_start__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    # None when malformed, ValueError for impossible dates such as 2024-02-30
+                    day = parse_date(value)
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({'error': f'Invalid {param} date'}, status=status.HTTP_400_BAD_REQUEST)
+                flows = flows.filter(**{lookup: day})
+        
+        periods = flows.values('period_start', 'period_end').annotate(
+            inflow=Sum('amount', filter=Q(flow_type='inflow')),
+            outflow=Sum('amount', filter=Q(flow_type='outflow')),
+            net=Sum('amount', filter=Q(flow_type='net')),
+        ).order_by('period_start')
+        
+        serializer = CashFlowPeriodSerializer(periods, many=True)
+        return Response({
+            'business': business_id,
+            'granularity': granularity,
+            'periods': serializer.data,
+            'currency': 'KES'
+        })
+    
     def perform_create(self, serializer):
         # Validate business exists and user has access
         business_id = self.request.data.get('business')
@@ -510,30 +665,27 @@ class CashFlowViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Business ID is required'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id))
-        if not business_ids or business_id not in [str(bid) for bid in business_ids]:
+        if not get_business_access(self.request.user).is_member(business_id):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
-        # Convert business_id to Business object if needed
-        if isinstance(business_id, str):
-            from users.models import Business
-            try:
-                business = Business.objects.get(id=business_id)
-            except Business.DoesNotExist:
-                from rest_framework.exceptions import ValidationError
-                raise ValidationError({'business': 'Business not found'})
-        else:
-            business = business_id
+        # Convert business_id to Business object
+        from users.models import Business
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'business': 'Business not found'})
         
         serializer.save(user=self.request.user, business=business)
 
 
-class FinancialForecastViewSet(viewsets.ModelViewSet):
+class FinancialForecastViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing financial forecasts"""
     queryset = FinancialForecast.objects.all()
     serializer_class = FinancialForecastSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         return FinancialForecast.objects.filter(user=self.request.user).order_by('-created_at')
@@ -545,59 +697,55 @@ class FinancialForecastViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Business ID is required'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id))
-        if not business_ids or business_id not in [str(bid) for bid in business_ids]:
+        if not get_business_access(self.request.user).is_member(business_id):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
-        # Convert business_id to Business object if needed
-        if isinstance(business_id, str):
-            from users.models import Business
-            try:
-                business = Business.objects.get(id=business_id)
-            except Business.DoesNotExist:
-                from rest_framework.exceptions import ValidationError
-                raise ValidationError({'business': 'Business not found'})
-        else:
-            business = business_id
+        # Convert business_id to Business object
+        from users.models import Business
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'business': 'Business not found'})
         
         serializer.save(user=self.request.user, business=business)
     
     @action(detail=False, methods=['post'])
     def generate_forecast(self, request):
-        """Generate AI-powered financial forecast"""
-        # TODO: Implement AI forecasting logic using LangChain and OpenAI
+        """Generate a statistical forecast from the business's monthly history"""
         forecast_type = request.data.get('forecast_type', 'revenue')
         business_id = request.data.get('business_id')
         
-        # Placeholder implementation
-        forecast_data = {
-            'forecast_type': forecast_type,
-            'name': f'{forecast_type.title()} Forecast',
-            'description': f'AI-generated {forecast_type} forecast',
-            'forecast_data': {
-                'monthly': [1000, 1200, 1100, 1300, 1400, 1500],
-                'confidence': 85.5
-            },
-            'confidence_score': 85.5,
-            'forecast_start': timezone.now().date(),
-            'forecast_end': timezone.now().date() + timedelta(days=180),
-            'model_version': 'v1.0',
-            'training_data_period': '6 months'
-        }
+        if not business_id:
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if forecast_type not in dict(FinancialForecast.FORECAST_TYPES):
+            return Response({'error': f'Unknown forecast type: {forecast_type}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            months = int(request.data.get('months', 6))
+        except (TypeError, ValueError):
+            return Response({'error': 'months must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            business = Business.objects.get(id=business_id, owner=request.user)
+        except (Business.DoesNotExist, ValueError):
+            return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Fitted locally; the previous forecast's model state is rolled forward when possible
+        from .services.forecasting import generate_forecast
+        forecast = generate_forecast(business, request.user, forecast_type, months)
         
-        serializer = self.get_serializer(data=forecast_data)
-        if serializer.is_valid():
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(forecast)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class CreditScoreViewSet(viewsets.ModelViewSet):
+class CreditScoreViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing credit scores"""
     queryset = CreditScore.objects.all()
     serializer_class = CreditScoreSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         return CreditScore.objects.filter(user=self.request.user).order_by('-created_at')
@@ -609,21 +757,17 @@ class CreditScoreViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Business ID is required'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id))
-        if not business_ids or business_id not in [str(bid) for bid in business_ids]:
+        if not get_business_access(self.request.user).is_member(business_id):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
-        # Convert business_id to Business object if needed
-        if isinstance(business_id, str):
-            from users.models import Business
-            try:
-                business = Business.objects.get(id=business_id)
-            except Business.DoesNotExist:
-                from rest_framework.exceptions import ValidationError
-                raise ValidationError({'business': 'Business not found'})
-        else:
-            business = business_id
+        # Convert business_id to Business object
+        from users.models import Business
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({'business': 'Business not found'})
         
         serializer.save(user=self.request.user, business=business)
     
@@ -640,42 +784,78 @@ class CreditScoreViewSet(viewsets.ModelViewSet):
         except Business.DoesNotExist:
             return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # TODO: Implement AI-powered credit scoring using LangChain and OpenAI
-        # For now, return a placeholder score
-        score_data = {
-            'business': business.id,
-            'score': 750,
-            'payment_history': 85.0,
-            'credit_utilization': 70.0,
-            'business_age': 80.0,
-            'revenue_stability': 75.0,
-            'debt_to_income': 65.0,
-            'factors': {
-                'payment_history': 'Good payment history',
-                'credit_utilization': 'Moderate utilization',
-                'business_age': 'Established business',
-                'revenue_stability': 'Stable revenue stream'
-            },
-            'recommendations': [
-                'Maintain consistent payment history',
-                'Consider reducing credit utilization',
-                'Continue building business credit'
-            ],
-            'calculation_method': 'ai_enhanced',
-            'data_sources': ['transactions', 'invoices', 'business_profile']
-        }
+        # Score from the business's transaction and invoice history
+        from django.db import transaction
+        from .services.automation_service import queue_credit_score_alerts
+        from .services.credit_scoring import build_credit_scores, score_chunk
+        results, _ = score_chunk([business.id], force=True)
+        credit_score = build_credit_scores(results)[0]
+        credit_score.user = request.user
+        with transaction.atomic():
+            credit_score.save()
+            queue_credit_score_alerts([credit_score])
+        
+        serializer = self.get_serializer(credit_score)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AIJobViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
+    """Submit LLM-backed analysis jobs and poll for their results.
+    
+    Jobs are answered by the run_ai_jobs worker; the request thread never
+    waits on the LLM.
+    """
+    queryset = AIJob.objects.all()
+    serializer_class = AIJobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-created_at', '-id')
+    max_page_size = 100
+    
+    def get_queryset(self):
+        return AIJob.objects.filter(user=self.request.user).order_by('-created_at')
+    
+    def create(self, request, *args, **kwargs):
+        """Queue a job (or return the identical pending/recent one)"""
+        business_id = request.data.get('business_id')
+        if not business_id:
+            return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not get_business_access(request.user).is_member(business_id):
+            return Response({'error': 'You do not have access to this business'}, status=status.HTTP_403_FORBIDDEN)
         
-        serializer = self.get_serializer(data=score_data)
-        if serializer.is_valid():
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            business = Business.objects.get(id=business_id)
+        except (Business.DoesNotExist, ValueError):
+            return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        from .services.ai_jobs import JobLimitExceeded, submit_job
+        try:
+            job, created = submit_job(business, request.user, request.data.get('kind'), request.data.get('payload'))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except JobLimitExceeded as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        data = dict(self.get_serializer(job).data, deduplicated=not created)
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        """Job result: 202 while pending, 200 once it has succeeded or failed"""
+        job = self.get_object()
+        data = {'id': str(job.id), 'kind': job.kind, 'status': job.status}
+        if job.status in ('queued', 'running'):
+            return Response(data, status=status.HTTP_202_ACCEPTED)
+        if job.status == 'failed':
+            data['error'] = job.error
+        else:
+            data['result'] = job.result
+        return Response(data)
 
 
 # Additional API endpoints
-@cached_response(timeout=300, key_prefix="dashboard")  # Cache for 5 minutes
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@cached_response(timeout=300, key_prefix="dashboard")  # Cache for 5 minutes
 def dashboard_data(request):
     """Get comprehensive dashboard data"""
     business_id = request.query_params.get('business_id')
@@ -699,17 +879,13 @@ def dashboard_data(request):
         transactions = transactions.filter(business_id=business_id)
     
     # Calculate key metrics
-    total_income = transactions.filter(transaction_type='income').aggregate(
-        total=Sum('amount'))['total'] or Decimal('0')
-    total_expenses = transactions.filter(transaction_type='expense').aggregate(
-        total=Sum('amount'))['total'] or Decimal('0')
-    net_profit = total_income - total_expenses
+    transaction_summary = transaction_totals(transactions)
     
     # Get recent transactions
-    recent_transactions = transactions.order_by('-transaction_date')[:10]
+    recent_transactions = transactions.select_related('business', 'user').order_by('-transaction_date')[:10]
     
     # Get budgets
-    budgets = Budget.objects.filter(user=request.user, is_active=True)
+    budgets = Budget.objects.filter(user=request.user, is_active=True).select_related('business', 'user')
     if business_id:
         budgets = budgets.filter(business_id=business_id)
     
@@ -718,33 +894,35 @@ def dashboard_data(request):
     if business_id:
         invoices = invoices.filter(business_id=business_id)
     
-    overdue_invoices = invoices.filter(status='overdue')
+    overdue_invoices = invoices.filter(status='overdue').select_related('business', 'user').prefetch_related('items')
     
     # Get credit score
-    credit_score = CreditScore.objects.filter(user=request.user).order_by('-created_at').first()
+    credit_score = CreditScore.objects.filter(user=request.user).select_related('business', 'user').order_by('-created_at').first()
     
     dashboard_data = {
         'summary': {
-            'total_income': total_income,
-            'total_expenses': total_expenses,
-            'net_profit': net_profit,
+            'total_income': transaction_summary['total_income'],
+            'total_expenses': transaction_summary['total_expenses'],
+            'net_profit': transaction_summary['net_profit'],
             'currency': 'KES'
         },
         'recent_transactions': TransactionSerializer(recent_transactions, many=True).data,
         'budgets': BudgetSerializer(budgets, many=True).data,
         'overdue_invoices': InvoiceSerializer(overdue_invoices, many=True).data,
         'credit_score': CreditScoreSerializer(credit_score).data if credit_score else None,
-        'businesses': [{'id': b.id, 'name': b.legal_name} for b in businesses]
+        'businesses': [{'id': b.id, 'name': b.legal_name} for b in businesses.only('id', 'legal_name')]
     }
     
     return Response(dashboard_data)
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing suppliers"""
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    ordering = ('-created_at', '-id')
+    max_page_size = 100
     
     def get_queryset(self):
         user = self.request.user
@@ -762,8 +940,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
         
         # If user is not superuser, filter by user or check membership role
         if not user.is_superuser:
-            from users.views import user_is_business_admin
-            if business_id and user_is_business_admin(user, business_id):
+            if business_id and get_business_access(user).is_admin(business_id):
                 # Business admin sees all suppliers in their business
                 pass
             else:
@@ -792,8 +969,7 @@ class SupplierViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError({'business': 'Invalid business ID format'})
         
-        business_ids = list(get_business_queryset(self.request.user, business_id_int))
-        if not business_ids or business_id_int not in business_ids:
+        if not get_business_access(self.request.user).is_member(business_id_int):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied('You do not have access to this business')
         
@@ -808,6 +984,54 @@ class SupplierViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user, business=business)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ai_cache_stats(request):
+    """Hit ratio of the LLM response cache across all workers"""
+    from .services.response_cache import response_cache_stats
+    return Response(response_cache_stats())
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def chat_stream(request):
+    """Answer a chat question as a stream of server-sent events.
+
+    Under ASGI the stream is an async generator, so waiting on the LLM
+    does not hold a worker thread.
+    """
+    business_id = request.data.get('business_id')
+    if not business_id:
+        return Response({'error': 'Business ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if not get_business_access(request.user).is_member(business_id):
+        return Response({'error': 'You do not have access to this business'}, status=status.HTTP_403_FORBIDDEN)
+
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from .services.ai_jobs import validate_payload
+    from .services.chat_stream import ChatStream
+    try:
+        payload = validate_payload('chat', {'question': request.data.get('question')}, business_id)
+    except ValueError as exc:
+        return Response({'error': str(exc).replace('payload.', '')}, status=status.HTTP_400_BAD_REQUEST)
+    context = request.data.get('context')
+    session_id = request.data.get('session_id')
+
+    stream = ChatStream(
+        business_id,
+        request.user,
+        payload['question'],
+        # Sessions are per user so one user cannot read another's conversation
+        session_id=f'{request.user.id}:{session_id}' if session_id else None,
+        context=context if isinstance(context, dict) else None,
+    )
+    events = stream.aevents() if isinstance(request._request, ASGIRequest) else stream.events()
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class VoiceConversationViewSet(viewsets.ModelViewSet):
     """ViewSet for storing voice conversation history"""
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,106 @@
+# backend/users/access.py
+"""
+Business access resolution.
+
+A user's accessible businesses and roles are loaded with one query over
+Membership, memoized on the request's user object, and cached across
+requests under the user's cache version. Membership signals (see
+users.signals) bump that version, so changes apply on the next request.
+"""
+from django.core.cache import cache
+
+from finance.cache_utils import get_user_cache_version
+
+from .models import Business, Membership
+
+ACCESS_CACHE_TIMEOUT = 60 * 60
+ADMIN_ROLE = 'business_admin'
+
+
+def _normalize_business_id(business_id):
+    try:
+        return int(business_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class BusinessAccess:
+    """Businesses a user can access and their role in each"""
+
+    def __init__(self, roles=None, is_superuser=False):
+        self.roles = dict(roles or {})
+        self.is_superuser = is_superuser
+
+    @property
+    def business_ids(self):
+        """Accessible business IDs; a lazy subquery for superusers"""
+        if self.is_superuser:
+            return Business.objects.values_list('id', flat=True)
+        return sorted(self.roles)
+
+    def role(self, business_id):
+        return self.roles.get(_normalize_business_id(business_id))
+
+    def is_member(self, business_id):
+        if self.is_superuser:
+            return True
+        return _normalize_business_id(business_id) in self.roles
+
+    def is_admin(self, business_id):
+        if self.is_superuser:
+            return True
+        return self.role(business_id) == ADMIN_ROLE
+
+    def filter_business_ids(self, business_id=None):
+        """Accessible business IDs, optionally narrowed to one business"""
+        if business_id in (None, ''):
+            return self.business_ids
+        business_id = _normalize_business_id(business_id)
+        if business_id is None:
+            return []
+        if self.is_superuser:
+            return Business.objects.filter(id=business_id).values_list('id', flat=True)
+        return [business_id] if business_id in self.roles else []
+
+
+NO_ACCESS = BusinessAccess()
+
+
+def _access_cache_key(user_id):
+    return f"business_access:user_{user_id}.v{get_user_cache_version(user_id)}"
+
+
+def load_business_access(user):
+    """Resolve access from the cache or with a single Membership query"""
+    if user.is_superuser:
+        return BusinessAccess(is_superuser=True)
+
+    key = _access_cache_key(user.id)
+    roles = cache.get(key)
+    if roles is None:
+        roles = dict(
+            Membership.objects.filter(user_id=user.id, is_active=True)
+            .values_list('business_id', 'role_in_business')
+        )
+        cache.set(key, roles, ACCESS_CACHE_TIMEOUT)
+    return BusinessAccess(roles)
+
+
+def get_business_access(user):
+    """Business access for user, resolved at most once per request.
+
+    The result is memoized on the user instance; authentication creates a
+    fresh user object for every request.
+    """
+    if user is None or not user.is_authenticated:
+        return NO_ACCESS
+    access = getattr(user, '_business_access', None)
+    if access is None:
+        access = load_business_access(user)
+        user._business_access = access
+    return access
+
+
+def clear_business_access(user):
+    """Drop the memoized access on a user instance (e.g. after changing its memberships)"""
+    user.__dict__.pop('_business_access', None)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_businessregistration_id_document_url_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', '-total_invoiced'], include=('customer_name', 'total_paid'), name='customer_top_invoiced_idx'),
+        ),
+    ]
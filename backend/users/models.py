@@ -140,6 +140,14 @@ class Customer(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = [['owner', 'email']]
+        indexes = [
+            # Top customers on the business admin dashboard
+            models.Index(
+                fields=['business', '-total_invoiced'],
+                include=['customer_name', 'total_paid'],
+                name='customer_top_invoiced_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.customer_name} ({self.email})"
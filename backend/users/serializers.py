@@ -1,6 +1,7 @@
 # backend/users/serializers.py
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from core.query_plans import QueryPlanSerializerMixin
 from .models import Business, UserProfile, Customer, Membership, BusinessInvitation, BusinessRegistration, IndividualRegistration
 
 
@@ -89,7 +90,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(QueryPlanSerializerMixin, serializers.ModelSerializer):
     """Serializer for Customer model"""
     owner = UserSerializer(read_only=True)
     onboarded_by = UserSerializer(read_only=True)
@@ -97,6 +98,7 @@ class CustomerSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Customer
+        select_related = ('owner', 'onboarded_by')
         fields = [
             'id', 'business', 'owner', 'customer_name', 'email', 'phone_number',
             'customer_type', 'company_name', 'physical_address', 'payment_terms',
@@ -0,0 +1,14 @@
+# backend/users/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from finance.cache_utils import bump_business_cache_version, bump_user_cache_version
+from .models import Membership
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_business_access(sender, instance, **kwargs):
+    """Membership changes alter the user's business access and the business's team data"""
+    bump_user_cache_version(instance.user_id)
+    bump_business_cache_version(instance.business_id)
@@ -22,6 +22,8 @@ from .serializers import (
     IndividualRegistrationSerializer, IndividualRegistrationCreateSerializer
 )
 from core.services.firecrawl import classify_business_from_website
+from core.query_plans import QueryPlanMixin
+from .access import get_business_access
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import AllowAny
 from finance.serializers import TransactionSerializer
@@ -41,9 +43,7 @@ class IsSuperAdmin(permissions.BasePermission):
 def user_is_business_admin(user, business_id):
     if not user.is_authenticated:
         return False
-    if user.is_superuser:
-        return True
-    return Membership.objects.filter(user=user, business_id=business_id, role_in_business='business_admin', is_active=True).exists()
+    return get_business_access(user).is_admin(business_id)
 
 
 class IsBusinessAdminOfBusiness(permissions.BasePermission):
@@ -69,14 +69,10 @@ class IsMemberOfBusiness(permissions.BasePermission):
         if not business_id:
             # If no business is specified, allow to list own memberships
             return True
-        if request.user.is_superuser:
-            return True
-        return Membership.objects.filter(user=request.user, business_id=business_id, is_active=True).exists()
+        return get_business_access(request.user).is_member(business_id)
     
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser:
-            return True
-        return obj.user_id == request.user.id or Membership.objects.filter(user=request.user, business_id=obj.business_id, is_active=True).exists()
+        return obj.user_id == request.user.id or get_business_access(request.user).is_member(obj.business_id)
 
 class BusinessViewSet(viewsets.ModelViewSet):
     serializer_class = BusinessSerializer
@@ -361,9 +357,11 @@ class IsCustomerOwner(permissions.BasePermission):
         return getattr(obj, 'owner_id', None) == request.user.id
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing customers/clients - Only business admins can add clients"""
     permission_classes = [permissions.IsAuthenticated, IsCustomerOwner]
+    ordering = ('-created_at', '-id')
+    max_page_size = 100
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -381,9 +379,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             queryset = Customer.objects.all()
         else:
-            memberships = Membership.objects.filter(user=user, is_active=True)
-            business_ids = [m.business_id for m in memberships]
-            queryset = Customer.objects.filter(business_id__in=business_ids)
+            queryset = Customer.objects.filter(business_id__in=get_business_access(user).business_ids)
         
         if business_id:
             queryset = queryset.filter(business_id=business_id)
@@ -618,11 +614,9 @@ def super_admin_dashboard(request):
 @permission_classes([permissions.IsAuthenticated])
 def business_admin_dashboard(request, business_id):
     """Business Admin dashboard stats"""
-    from django.db.models import Sum, Count, Q, Avg
     from django.utils import timezone
-    from datetime import timedelta
-    from decimal import Decimal
-    from finance.models import Transaction, Invoice, Budget, CashFlow
+    from finance.models import Transaction, Invoice, Budget
+    from finance.services.summary import transaction_totals, invoice_totals, budget_totals
     
     # Verify user is business admin
     if not user_is_business_admin(request.user, business_id):
@@ -636,26 +630,16 @@ def business_admin_dashboard(request, business_id):
     # Date ranges
     today = timezone.now().date()
     this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    last_30_days = today - timedelta(days=30)
     
     # Transactions
     transactions = Transaction.objects.filter(business_id=business_id)
-    monthly_transactions = transactions.filter(transaction_date__gte=this_month_start)
-    last_30_transactions = transactions.filter(transaction_date__gte=last_30_days)
-    
-    total_income = monthly_transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    total_expenses = monthly_transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    net_profit = total_income - total_expenses
+    monthly_summary = transaction_totals(transactions.filter(transaction_date__gte=this_month_start))
+    total_income = monthly_summary['total_income']
+    total_expenses = monthly_summary['total_expenses']
+    net_profit = monthly_summary['net_profit']
     
     # Invoices
-    invoices = Invoice.objects.filter(business_id=business_id)
-    total_invoices = invoices.count()
-    paid_invoices = invoices.filter(status='paid').count()
-    overdue_invoices = invoices.filter(status='overdue')
-    overdue_count = overdue_invoices.count()
-    overdue_amount = overdue_invoices.aggregate(Sum('total_amount'))['total_amount__sum'] or Decimal('0')
-    pending_invoices = invoices.filter(status__in=['draft', 'sent']).count()
+    invoice_summary = invoice_totals(Invoice.objects.filter(business_id=business_id))
     
     # Customers
     from users.models import Customer
@@ -663,16 +647,13 @@ def business_admin_dashboard(request, business_id):
     top_customers = Customer.objects.filter(business_id=business_id).order_by('-total_invoiced')[:5].values('id', 'customer_name', 'total_invoiced', 'total_paid')
     
     # Budgets
-    budgets = Budget.objects.filter(business_id=business_id, is_active=True)
-    total_budgeted = budgets.aggregate(Sum('budgeted_amount'))['budgeted_amount__sum'] or Decimal('0')
-    total_spent = budgets.aggregate(Sum('spent_amount'))['spent_amount__sum'] or Decimal('0')
-    budget_utilization = (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0
+    budget_summary = budget_totals(Budget.objects.filter(business_id=business_id, is_active=True))
     
     # Team members
     team_size = Membership.objects.filter(business_id=business_id, is_active=True).count()
     
     # Recent transactions
-    recent_transactions = transactions.order_by('-transaction_date')[:10]
+    recent_transactions = transactions.select_related('business', 'user').order_by('-transaction_date')[:10]
     
     return Response({
         'business': {
@@ -687,12 +668,12 @@ def business_admin_dashboard(request, business_id):
             'currency': 'KES'
         },
         'invoices': {
-            'total': total_invoices,
-            'paid': paid_invoices,
-            'pending': pending_invoices,
+            'total': invoice_summary['total'],
+            'paid': invoice_summary['paid'],
+            'pending': invoice_summary['pending'],
             'overdue': {
-                'count': overdue_count,
-                'amount': float(overdue_amount)
+                'count': invoice_summary['overdue_count'],
+                'amount': float(invoice_summary['overdue_amount'])
             }
         },
         'customers': {
@@ -700,9 +681,9 @@ def business_admin_dashboard(request, business_id):
             'top_customers': list(top_customers)
         },
         'budgets': {
-            'total_budgeted': float(total_budgeted),
-            'total_spent': float(total_spent),
-            'utilization_percent': round(budget_utilization, 2)
+            'total_budgeted': float(budget_summary['total_budgeted']),
+            'total_spent': float(budget_summary['total_spent']),
+            'utilization_percent': budget_summary['utilization']
         },
         'team': {
             'size': team_size
@@ -725,11 +706,8 @@ class CurrentUserView(APIView):
 @permission_classes([permissions.IsAuthenticated])
 def user_dashboard(request, business_id=None):
     """Normal user dashboard stats"""
-    from django.db.models import Sum, Count
-    from django.utils import timezone
-    from datetime import timedelta
-    from decimal import Decimal
     from finance.models import Transaction, Invoice
+    from finance.services.summary import invoice_totals
     
     user = request.user
     
@@ -739,17 +717,17 @@ def user_dashboard(request, business_id=None):
         try:
             business = Business.objects.get(id=business_id)
             if not user.is_superuser:
-                if not Membership.objects.filter(user=user, business_id=business_id, is_active=True).exists():
+                if not get_business_access(user).is_member(business_id):
                     return Response({'error': 'Not a member of this business'}, status=status.HTTP_403_FORBIDDEN)
         except Business.DoesNotExist:
             return Response({'error': 'Business not found'}, status=status.HTTP_404_NOT_FOUND)
     else:
-        # Get all businesses user is member of
-        memberships = Membership.objects.filter(user=user, is_active=True)
-        business_ids = [m.business_id for m in memberships]
-        businesses = Business.objects.filter(id__in=business_ids)
+        # Get the first business user is member of
+        business = Business.objects.filter(
+            memberships__user=user, memberships__is_active=True
+        ).order_by('id').first()
         
-        if not businesses.exists():
+        if business is None:
             # Return empty dashboard for users with no businesses
             return Response({
                 'business': None,
@@ -761,16 +739,9 @@ def user_dashboard(request, business_id=None):
                 'recent_transactions': [],
                 'message': 'No business assigned yet. Please contact your administrator.'
             }, status=status.HTTP_200_OK)
-        # Use first business for now (can be enhanced to support multiple)
-        business = businesses.first()
     
     # Get user's role in business
-    membership = Membership.objects.filter(user=user, business_id=business.id, is_active=True).first()
-    role = membership.role_in_business if membership else 'viewer'
-    
-    # Date ranges
-    today = timezone.now().date()
-    last_30_days = today - timedelta(days=30)
+    role = get_business_access(user).role(business.id) or 'viewer'
     
     # Transactions (user can see their own or all depending on role)
     if role == 'viewer':
@@ -781,7 +752,7 @@ def user_dashboard(request, business_id=None):
     else:
         transactions = Transaction.objects.filter(business_id=business.id)
     
-    recent_transactions = transactions.order_by('-transaction_date')[:5]
+    recent_transactions = transactions.select_related('business', 'user').order_by('-transaction_date')[:5]
     
     # Invoices (similar logic)
     if role == 'viewer':
@@ -791,8 +762,9 @@ def user_dashboard(request, business_id=None):
     else:
         invoices = Invoice.objects.filter(business_id=business.id)
     
-    my_invoices = invoices.filter(user=user).count()
-    pending_tasks = invoices.filter(status__in=['draft', 'sent'], user=user).count()
+    invoice_summary = invoice_totals(invoices, user=user)
+    my_invoices = invoice_summary['mine']
+    pending_tasks = invoice_summary['mine_pending']
     
     # Customers (staff can see customers they onboarded)
     from users.models import Customer
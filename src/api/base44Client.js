@@ -29,6 +29,12 @@ const toEntities = (data) => {
   return [toEntity(data)];
 };
 
+// list(sort, limit) callers pass a number of items; anything else means the first page
+const listLimit = (limit) => (typeof limit === 'number' && limit > 0 ? limit : undefined);
+
+// Ask for the whole limit in one page where the endpoint allows it
+const listQuery = (limit) => (listLimit(limit) ? `?page_size=${listLimit(limit)}` : '');
+
 /**
  * Base entity class for API interactions
  */
@@ -42,25 +48,14 @@ class Entity {
 
   /**
    * Fetches a list of entities
-   * @param {string} sort - Sort field with optional - prefix for descending
-   * @param {Object} params - Query parameters
+   * @param {string} sort - Ignored: list endpoints page over their own fixed
+   *   order (newest first), so a client-chosen ordering cannot be applied
+   * @param {number} limit - Maximum number of entities (default: the first page)
    * @returns {Promise<Array>} List of entities
    */
-  async list(sort = '', params = {}) {
+  async list(sort = '', limit = undefined) {
     try {
-      // Ensure params is an object, not a number
-      if (typeof params !== 'object' || params === null || Array.isArray(params)) {
-        params = {};
-      }
-      
-      if (sort) {
-        const [field, order] = sort.startsWith('-') 
-          ? [sort.substring(1), 'desc'] 
-          : [sort, 'asc'];
-        params.ordering = order === 'desc' ? `-${field}` : field;
-      }
-      
-      const data = await apiClient.get(`/finance/${this.endpoint}/`, { params });
+      const data = await apiClient.getList(`/finance/${this.endpoint}/${listQuery(limit)}`, { limit: listLimit(limit) });
       return toEntities(data);
     } catch (error) {
       console.error(`Error listing ${this.endpoint}:`, error);
@@ -148,21 +143,9 @@ class Entity {
 
 // Create entities with custom endpoint prefixes
 class UserEntity extends Entity {
-  async list(sort = '', params = {}) {
+  async list(sort = '', limit = undefined) {
     try {
-      // Ensure params is an object, not a number
-      if (typeof params !== 'object' || params === null || Array.isArray(params)) {
-        params = {};
-      }
-      
-      if (sort) {
-        const [field, order] = sort.startsWith('-') 
-          ? [sort.substring(1), 'desc'] 
-          : [sort, 'asc'];
-        params.ordering = order === 'desc' ? `-${field}` : field;
-      }
-      
-      const data = await apiClient.get(`/users/${this.endpoint}/`, { params });
+      const data = await apiClient.getList(`/users/${this.endpoint}/${listQuery(limit)}`, { limit: listLimit(limit) });
       return toEntities(data);
     } catch (error) {
       console.error(`Error listing ${this.endpoint}:`, error);
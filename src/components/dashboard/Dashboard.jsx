@@ -49,7 +49,7 @@ const Dashboard = () => {
         // Try the correct endpoint first
         const params = businessId ? { business: businessId } : {};
         const queryString = Object.keys(params).length > 0 ? '?' + new URLSearchParams(params).toString() : '';
-        return await apiClient.request(`/users/customers/${queryString}`);
+        return await apiClient.getList(`/users/customers/${queryString}`);
       } catch (error) {
         // If 404, return empty array (endpoint doesn't exist yet)
         if (error.status === 404 || error.message?.includes('404')) {
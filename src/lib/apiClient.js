@@ -37,6 +37,41 @@ class ApiClient {
     return this.request(endpoint, { ...options, method: 'GET' });
   }
 
+  // One page of a paginated list endpoint ({ next, previous, results }) as
+  // { results, next }. Pass `next` back in to load the following page on
+  // demand; it is null on the last page.
+  async getPage(endpoint, options = {}) {
+    const page = await this.get(endpoint, options);
+    if (!page || !Array.isArray(page.results)) {
+      return { results: page, next: null }; // Not paginated
+    }
+    return { results: page.results, next: page.next ? this.toEndpoint(page.next) : null };
+  }
+
+  // Items of a list endpoint as an array: the first page, or with `limit`
+  // up to that many items, fetching further pages only until it is reached.
+  async getList(endpoint, { limit, ...options } = {}) {
+    let { results, next } = await this.getPage(endpoint, options);
+    if (!Array.isArray(results)) {
+      return results;
+    }
+    const items = [...results];
+    while (next && limit && items.length < limit) {
+      ({ results, next } = await this.getPage(next, options));
+      items.push(...results);
+    }
+    return limit ? items.slice(0, limit) : items;
+  }
+
+  // Absolute URL from the API (e.g. a next page link) -> endpoint relative to baseURL
+  toEndpoint(url) {
+    const base = new URL(this.baseURL, window.location.origin);
+    const target = new URL(url, base);
+    const basePath = base.pathname.replace(/\/$/, '');
+    const path = target.pathname.startsWith(basePath) ? target.pathname.slice(basePath.length) : target.pathname;
+    return path + target.search;
+  }
+
   async post(endpoint, data, options = {}) {
     return this.request(endpoint, {
       ...options,
@@ -229,7 +264,7 @@ class ApiClient {
 
   // Business methods
   async getBusinesses() {
-    return this.request('/users/businesses/');
+    return this.getList('/users/businesses/');
   }
 
   async getBusiness(id) {
@@ -246,7 +281,13 @@ class ApiClient {
   // Transaction methods
   async getTransactions(params = {}) {
     const queryString = new URLSearchParams(params).toString();
-    return this.request(`/finance/transactions/${queryString ? '?' + queryString : ''}`);
+    return this.getList(`/finance/transactions/${queryString ? '?' + queryString : ''}`);
+  }
+
+  // A page of transactions; pass the previous page's `next` for the following one
+  async getTransactionsPage(params = {}, next = null) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.getPage(next || `/finance/transactions/${queryString ? '?' + queryString : ''}`);
   }
 
   async getTransaction(id) {
@@ -268,13 +309,19 @@ class ApiClient {
   // Invoice methods
   async getInvoices(params = {}) {
     const queryString = new URLSearchParams(params).toString();
-    return this.request(`/finance/invoices/${queryString ? '?' + queryString : ''}`);
+    return this.getList(`/finance/invoices/${queryString ? '?' + queryString : ''}`);
+  }
+
+  // A page of invoices; pass the previous page's `next` for the following one
+  async getInvoicesPage(params = {}, next = null) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.getPage(next || `/finance/invoices/${queryString ? '?' + queryString : ''}`);
   }
   
   // Supplier methods
   async getSuppliers(params = {}) {
     const queryString = new URLSearchParams(params).toString();
-    return this.request(`/finance/suppliers/${queryString ? '?' + queryString : ''}`);
+    return this.getList(`/finance/suppliers/${queryString ? '?' + queryString : ''}`);
   }
   
   async getSupplier(id) {
@@ -324,12 +371,12 @@ class ApiClient {
 
   // Cash flow forecasts
   async getCashFlowForecasts() {
-    return this.request('/finance/cash-flows/');
+    return this.getList('/finance/cash-flows/');
   }
 
   // Credit scores
   async getCreditScores() {
-    return this.request('/finance/credit-scores/');
+    return this.getList('/finance/credit-scores/');
   }
 
   async calculateCreditScore(businessId) {
@@ -342,7 +389,7 @@ class ApiClient {
   // Memberships
   async listMemberships(params = {}) {
     const qs = new URLSearchParams(params).toString();
-    return this.request(`/users/memberships/${qs ? '?' + qs : ''}`);
+    return this.getList(`/users/memberships/${qs ? '?' + qs : ''}`);
   }
 
   async createMembership(data) {
@@ -366,7 +413,7 @@ class ApiClient {
   // Invitations
   async listInvitations(params = {}) {
     const qs = new URLSearchParams(params).toString();
-    return this.request(`/users/invitations/${qs ? '?' + qs : ''}`);
+    return this.getList(`/users/invitations/${qs ? '?' + qs : ''}`);
   }
 
   async createInvitation(data) {
@@ -1,6 +1,6 @@
 import React, { useState } from "react";
 import apiClient from "../lib/apiClient";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import toast from "react-hot-toast";
 import { Button } from "@/components/ui/button";
 import { Plus, Upload } from "lucide-react";
@@ -22,21 +22,17 @@ export default function Invoices() {
   const businesses = getBusinesses();
   const businessId = activeBusinessId || businesses[0]?.id;
 
-  const { data: invoices = [], isLoading } = useQuery({
+  // Pages are loaded on demand with the "Load more" button
+  const { data, isLoading, hasNextPage, fetchNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['invoices', businessId],
-    queryFn: async () => {
-      if (!businessId) {
-        return [];
-      }
-      const params = { business: businessId };
-      return await apiClient.getInvoices(params);
-    },
+    queryFn: ({ pageParam }) => apiClient.getInvoicesPage({ business: businessId }, pageParam),
+    getNextPageParam: (lastPage) => lastPage.next || undefined,
     enabled: !!businessId,
-    initialData: [],
     refetchOnMount: true,
     refetchOnWindowFocus: true,
     staleTime: 0 // Always consider data stale to force refetch
   });
+  const invoices = data?.pages.flatMap((page) => page.results) ?? [];
   
   if (!businessId) {
     return (
@@ -222,6 +218,14 @@ export default function Invoices() {
         onUpdateStatus={({ id, status }) => updateMutation.mutate({ id, data: { status } })}
         onDownloadPDF={handleDownloadPDF}
       />
+
+      {hasNextPage && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+            {isFetchingNextPage ? 'Loading...' : 'Load more invoices'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
@@ -1,6 +1,6 @@
 import React, { useState } from "react";
 import apiClient from "../lib/apiClient";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import toast from "react-hot-toast";
 import { Button } from "@/components/ui/button";
 import { Plus, Download } from "lucide-react";
@@ -22,21 +22,17 @@ export default function Transactions() {
   const businesses = getBusinesses();
   const businessId = activeBusinessId || businesses[0]?.id;
 
-  const { data: transactions = [], isLoading } = useQuery({
+  // Pages are loaded on demand with the "Load more" button
+  const { data, isLoading, hasNextPage, fetchNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['transactions', businessId],
-    queryFn: async () => {
-      if (!businessId) {
-        return [];
-      }
-      const params = { business: businessId };
-      return await apiClient.getTransactions(params);
-    },
+    queryFn: ({ pageParam }) => apiClient.getTransactionsPage({ business: businessId }, pageParam),
+    getNextPageParam: (lastPage) => lastPage.next || undefined,
     enabled: !!businessId,
-    initialData: [],
     refetchOnMount: true,
     refetchOnWindowFocus: true,
     staleTime: 0 // Always consider data stale to force refetch
   });
+  const transactions = data?.pages.flatMap((page) => page.results) ?? [];
   
   if (!businessId) {
     return (
@@ -225,6 +221,14 @@ export default function Transactions() {
         onEdit={handleEdit}
         onDelete={deleteMutation.mutate}
       />
+
+      {hasNextPage && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+            {isFetchingNextPage ? 'Loading...' : 'Load more transactions'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
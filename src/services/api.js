@@ -9,7 +9,7 @@ export const authApi = {
 
 // Invoices API
 export const invoiceApi = {
-  getAll: (params = {}) => apiClient.get('/finance/invoices/', { params }),
+  getAll: (params = {}) => apiClient.getList('/finance/invoices/', { params }),
   getById: (id) => apiClient.get(`/finance/invoices/${id}/`),
   create: (data) => apiClient.post('/finance/invoices/', data),
   update: (id, data) => apiClient.put(`/finance/invoices/${id}/`, data),
@@ -19,18 +19,18 @@ export const invoiceApi = {
 
 // Transactions API
 export const transactionApi = {
-  getAll: (params = {}) => apiClient.get('/finance/transactions/', { params }),
+  getAll: (params = {}) => apiClient.getList('/finance/transactions/', { params }),
   getById: (id) => apiClient.get(`/finance/transactions/${id}/`),
   create: (data) => apiClient.post('/finance/transactions/', data),
   update: (id, data) => apiClient.put(`/finance/transactions/${id}/`, data),
   delete: (id) => apiClient.delete(`/finance/transactions/${id}/`),
   getByDateRange: (startDate, endDate) => 
-    apiClient.get(`/finance/transactions/?start_date=${startDate}&end_date=${endDate}`),
+    apiClient.getList(`/finance/transactions/?start_date=${startDate}&end_date=${endDate}`),
 };
 
 // Credit API
 export const creditApi = {
-  getScores: () => apiClient.get('/finance/credit-scores/'),
+  getScores: () => apiClient.getList('/finance/credit-scores/'),
   getScore: (id) => apiClient.get(`/finance/credit-scores/${id}/`),
   calculateScore: (businessId) => 
     apiClient.post('/finance/credit-scores/calculate/', { business_id: businessId }),
@@ -38,7 +38,7 @@ export const creditApi = {
 
 // Cash Flow API
 export const cashFlowApi = {
-  getForecasts: () => apiClient.get('/finance/forecasts/'),
+  getForecasts: () => apiClient.getList('/finance/forecasts/'),
   getProjections: (params = {}) => apiClient.get('/finance/cash-flows/projections/', { params }),
   createForecast: (data) => apiClient.post('/finance/forecasts/', data),
   updateForecast: (id, data) => apiClient.put(`/finance/forecasts/${id}/`, data),
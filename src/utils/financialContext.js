@@ -34,9 +34,11 @@ export async function buildFinancialContext() {
       }
     }
 
-    // Get transactions and invoices from cache first (what user sees in UI)
-    let transactions = queryClient.getQueryData(['transactions', businessId]) || [];
-    let invoices = queryClient.getQueryData(['invoices', businessId]) || [];
+    // Get transactions and invoices from cache first (what user sees in UI);
+    // those pages cache the loaded pages of each list
+    const cachedPages = (key) => queryClient.getQueryData(key)?.pages?.flatMap((page) => page.results) || [];
+    let transactions = cachedPages(['transactions', businessId]);
+    let invoices = cachedPages(['invoices', businessId]);
     
     // If not in cache, fetch them
     if (transactions.length === 0 && businessId) {